@@ -1,5 +1,5 @@
 # Copyright @ 2020 Thought Machine Group Limited. All rights reserved.
-api = "3.9.0"
+api = "3.12.0"
 version = "0.0.1"
 display_name = "CASA"
 summary = "Savings Account "
@@ -7,6 +7,64 @@ tside = Tside.LIABILITY
 supported_denominations = 'PHP'
 MONTHLY_MAINTENANCE_FEES = 'MONTHLY_MAINTENANCE_FEES'
 ACCRUED_INTEREST = 'ACCRUED_INCOMING_INTEREST'
+DAILY_BALANCE_SUM = 'DAILY_BALANCE_SUM'
+DAILY_BALANCE_COUNT = 'DAILY_BALANCE_COUNT'
+INTERNAL_CONTRA = 'INTERNAL_CONTRA'
+ACCRUED_INTEREST_CARRY = 'ACCRUED_INTEREST_CARRY'
+INTEREST_BALANCES_FETCHER = 'EFFECTIVE_DATE_INTEREST_BALANCES'
+FEE_BALANCES_FETCHER = 'EFFECTIVE_DATE_FEE_BALANCES'
+LIVE_BALANCES_FETCHER = 'LIVE_DEFAULT_BALANCES'
+LIVE_STATE_BALANCES_FETCHER = 'LIVE_RUNNING_STATE_BALANCES'
+ACCRUAL_CATCH_UP_FETCHER = 'ACCRUAL_CATCH_UP_BALANCES'
+
+# Parameters read by each hook, fetched once per run by _load_params
+HOOK_PARAMETERS = {
+    'DAILY_ACCRUE_INTEREST': [
+        'denomination',
+        'internal_account',
+        'internal_account_shards',
+        'base_interest_rate',
+        'bonus_interest_rate',
+        'bonus_interest_amount_threshold',
+        'minimum_accrual_posting_amount',
+    ],
+    'DAILY_APPLY_INTEREST': ['denomination', 'internal_account', 'internal_account_shards'],
+    'APPLY_ACCRUED_INTEREST': ['denomination', 'internal_account', 'internal_account_shards'],
+    'DAILY_ACCRUE_AND_APPLY_INTEREST': [
+        'denomination',
+        'internal_account',
+        'internal_account_shards',
+        'base_interest_rate',
+        'bonus_interest_rate',
+        'bonus_interest_amount_threshold',
+        'minimum_accrual_posting_amount',
+        'interest_application_frequency',
+        'interest_application_day',
+    ],
+    'MONTHLY_MAINTENANCE_FEE': [
+        'denomination',
+        'internal_account',
+        'internal_account_shards',
+        'minimum_balance_maintenance_fee_waive',
+        'flat_fee',
+        'fee_tiers',
+        'fee_tier_ranges',
+    ],
+    'pre_posting_code': ['denomination'],
+    'derived_parameters': [
+        'denomination',
+        'minimum_balance_maintenance_fee_waive',
+        'flat_fee',
+        'fee_tiers',
+        'fee_tier_ranges',
+    ],
+    'execution_schedules': [
+        'combine_daily_interest_schedules',
+        'interest_application_frequency',
+        'interest_application_day',
+        'schedule_spread_window',
+    ],
+}
 
 parameters = [
     #Template Params
@@ -39,6 +97,78 @@ parameters = [
         description='Internal account ID.',
         display_name='Internal account ID',
     ),
+    Parameter(
+        name='internal_account_shards',
+        shape=StringShape,
+        level=Level.TEMPLATE,
+        description='JSON list of internal account IDs that interest and fee postings are '
+                    'spread across. Each account always uses the same shard, picked from a '
+                    'hash of its account ID. An empty list uses internal_account.',
+        display_name='Internal account shards',
+        default_value='[]',
+    ),
+    Parameter(
+        name='combine_daily_interest_schedules',
+        shape=UnionShape(
+            UnionItem(key='true', display_name='True'),
+            UnionItem(key='false', display_name='False'),
+        ),
+        level=Level.TEMPLATE,
+        description='If true, daily interest is accrued and applied by a single '
+                    'DAILY_ACCRUE_AND_APPLY_INTEREST schedule in one posting batch.',
+        display_name='Combine daily interest schedules',
+        default_value=UnionItemValue(key='false'),
+    ),
+    Parameter(
+        name='interest_application_frequency',
+        shape=UnionShape(
+            UnionItem(key='daily', display_name='Daily'),
+            UnionItem(key='monthly', display_name='Monthly'),
+            UnionItem(key='quarterly', display_name='Quarterly'),
+        ),
+        level=Level.TEMPLATE,
+        description='How often accrued interest is applied to the account. '
+                    'Interest is accrued daily regardless.',
+        display_name='Interest application frequency',
+        default_value=UnionItemValue(key='daily'),
+    ),
+    Parameter(
+        name='interest_application_day',
+        shape=NumberShape(
+            min_value=1,
+            max_value=28,
+            step=1
+        ),
+        level=Level.TEMPLATE,
+        description='Day of the month on which monthly or quarterly interest is applied.',
+        display_name='Interest application day',
+        default_value=Decimal(1),
+    ),
+    Parameter(
+        name='schedule_spread_window',
+        shape=NumberShape(
+            min_value=0,
+            max_value=720,
+            step=1
+        ),
+        level=Level.TEMPLATE,
+        description='Window in minutes after midnight across which account schedules are '
+                    'spread. Each account gets a fixed offset derived from its account ID.',
+        display_name='Schedule spread window (minutes)',
+        default_value=Decimal(0),
+    ),
+    Parameter(
+        name='minimum_accrual_posting_amount',
+        shape=NumberShape(
+            kind=NumberKind.MONEY,
+            min_value=0,
+        ),
+        level=Level.TEMPLATE,
+        description='Smallest accrual that is posted to the account. Smaller daily accruals are '
+                    'carried forward and posted once their running total reaches this amount.',
+        display_name='Minimum accrual posting amount',
+        default_value=Decimal(0),
+    ),
     #Instance Params
     Parameter(
         name="base_interest_rate",
@@ -94,69 +224,208 @@ parameters = [
             kind=NumberKind.MONEY
         ),
         default_value="0"
-    )
+    ),
+    #Derived Params
+    Parameter(
+        name='month_to_date_mean_balance',
+        shape=NumberShape(
+            kind=NumberKind.MONEY
+        ),
+        level=Level.INSTANCE,
+        derived=True,
+        description='Mean daily balance so far in the current maintenance fee period.',
+        display_name='Month to date mean balance',
+    ),
+    Parameter(
+        name='projected_maintenance_fee_tier',
+        shape=StringShape,
+        level=Level.INSTANCE,
+        derived=True,
+        description='Maintenance fee tier the account would be charged at if the fee were '
+                    'applied now: a fee tier, flat, waived or none.',
+        display_name='Projected maintenance fee tier',
+    ),
+    Parameter(
+        name='projected_maintenance_fee',
+        shape=NumberShape(
+            kind=NumberKind.MONEY
+        ),
+        level=Level.INSTANCE,
+        derived=True,
+        description='Maintenance fee the account would be charged if the fee were applied now.',
+        display_name='Projected maintenance fee',
+    ),
+    Parameter(
+        name='accrued_interest_unapplied',
+        shape=NumberShape(
+            kind=NumberKind.MONEY
+        ),
+        level=Level.INSTANCE,
+        derived=True,
+        description='Interest accrued, including any carried accrual, not yet applied.',
+        display_name='Accrued interest not yet applied',
+    ),
+]
+
+# Hooks only observe the balances they read, at the time they run
+data_fetchers = [
+    BalancesObservationFetcher(
+        fetcher_id=INTEREST_BALANCES_FETCHER,
+        at=DefinedDateTime.EFFECTIVE_TIME,
+        filter=BalancesFilter(
+            addresses=[DEFAULT_ADDRESS, 'ACCRUED_INCOMING_INTEREST', ACCRUED_INTEREST_CARRY]
+        ),
+    ),
+    BalancesObservationFetcher(
+        fetcher_id=FEE_BALANCES_FETCHER,
+        at=DefinedDateTime.EFFECTIVE_TIME,
+        filter=BalancesFilter(
+            addresses=[DEFAULT_ADDRESS, DAILY_BALANCE_SUM, DAILY_BALANCE_COUNT]
+        ),
+    ),
+    BalancesObservationFetcher(
+        fetcher_id=LIVE_BALANCES_FETCHER,
+        at=DefinedDateTime.LIVE,
+        filter=BalancesFilter(addresses=[DEFAULT_ADDRESS]),
+    ),
+    # Balances since the previous DAILY_ACCRUE_INTEREST, to catch up on any missed executions
+    BalancesIntervalFetcher(
+        fetcher_id=ACCRUAL_CATCH_UP_FETCHER,
+        start=DefinedDateTime.INTERVAL_START,
+        end=DefinedDateTime.EFFECTIVE_TIME,
+        filter=BalancesFilter(addresses=[DEFAULT_ADDRESS]),
+    ),
+    BalancesObservationFetcher(
+        fetcher_id=LIVE_STATE_BALANCES_FETCHER,
+        at=DefinedDateTime.LIVE,
+        filter=BalancesFilter(
+            addresses=[
+                DEFAULT_ADDRESS,
+                DAILY_BALANCE_SUM,
+                DAILY_BALANCE_COUNT,
+                'ACCRUED_INCOMING_INTEREST',
+                ACCRUED_INTEREST_CARRY,
+            ]
+        ),
+    ),
 ]
 
 @requires(parameters=True)
 def execution_schedules():
     creation_date = vault.get_account_creation_date()
-    return [
-        (
-            'DAILY_ACCRUE_INTEREST',
-            {
-                'hour': '0',
-                'minute': '0',
-                'second': '1'
-            }
-        ),
-        (
-            'DAILY_APPLY_INTEREST',
-            {
-                'hour': '0',
-                'minute': '0',
-                'second': '5',
-            }
-        ),
+    params = _load_params(vault, 'execution_schedules')
+    offset = _schedule_offset(vault.account_id, params)
+
+    if _combine_daily_interest_schedules(params):
+        interest_schedules = [
+            ('DAILY_ACCRUE_AND_APPLY_INTEREST', _time_of_day(offset + 1)),
+        ]
+    elif _interest_application_frequency(params) == 'daily':
+        interest_schedules = [
+            ('DAILY_ACCRUE_INTEREST', _time_of_day(offset + 1)),
+            ('DAILY_APPLY_INTEREST', _time_of_day(offset + 5)),
+        ]
+    else:
+        interest_application_schedule = {
+            'day': str(int(params['interest_application_day'])),
+            **_time_of_day(offset + 5),
+        }
+        if _interest_application_frequency(params) == 'quarterly':
+            interest_application_schedule['month'] = ','.join(
+                str(month) for month in _quarterly_application_months(creation_date)
+            )
+
+        interest_schedules = [
+            ('DAILY_ACCRUE_INTEREST', _time_of_day(offset + 1)),
+            ('APPLY_ACCRUED_INTEREST', interest_application_schedule),
+        ]
+
+    return interest_schedules + [
         (
             'MONTHLY_MAINTENANCE_FEE',
             {
                 'day': str(creation_date.day),
-                'hour': '0',
-                'minute': '0',
-                'second': '0',
+                **_time_of_day(offset),
                 'start_date': str((creation_date + timedelta(months=1)).date())
             }
         )
     ]
 
-@requires(event_type='DAILY_ACCRUE_INTEREST', parameters=True, balances="1 day")
-@requires(event_type='DAILY_APPLY_INTEREST', parameters=True, balances="1 day")
-@requires(event_type='MONTHLY_MAINTENANCE_FEE', parameters=True, balances="1 day")
+@requires(
+    event_type='DAILY_ACCRUE_INTEREST',
+    parameters=True,
+    last_execution_time=['DAILY_ACCRUE_INTEREST', 'MONTHLY_MAINTENANCE_FEE'],
+)
+@requires(event_type='DAILY_APPLY_INTEREST', parameters=True)
+@requires(event_type='APPLY_ACCRUED_INTEREST', parameters=True)
+@requires(event_type='DAILY_ACCRUE_AND_APPLY_INTEREST', parameters=True)
+@requires(event_type='MONTHLY_MAINTENANCE_FEE', parameters=True)
+@fetch_account_data(
+    event_type='DAILY_ACCRUE_INTEREST',
+    balances=[INTEREST_BALANCES_FETCHER, ACCRUAL_CATCH_UP_FETCHER],
+)
+@fetch_account_data(event_type='DAILY_APPLY_INTEREST', balances=[INTEREST_BALANCES_FETCHER])
+@fetch_account_data(event_type='APPLY_ACCRUED_INTEREST', balances=[INTEREST_BALANCES_FETCHER])
+@fetch_account_data(
+    event_type='DAILY_ACCRUE_AND_APPLY_INTEREST', balances=[INTEREST_BALANCES_FETCHER]
+)
+@fetch_account_data(event_type='MONTHLY_MAINTENANCE_FEE', balances=[FEE_BALANCES_FETCHER])
 def scheduled_code(event_type, effective_date):
-    denomination = vault.get_parameter_timeseries(name='denomination').latest()
-    internal_account = vault.get_parameter_timeseries(name='internal_account').latest()
+    params = _load_params(vault, event_type)
+
+    denomination = params['denomination']
+    hook_execution_id = vault.get_hook_execution_id()
 
     if event_type == 'DAILY_ACCRUE_INTEREST':
-        balances = vault.get_balance_timeseries().before(timestamp=effective_date)
-        _accrue_interest(
-            vault, denomination, internal_account, effective_date, balances
-        )
+        balances = vault.get_balances_observation(fetcher_id=INTEREST_BALANCES_FETCHER).balances
+        missed_balances = _missed_accrual_balances(vault, effective_date)
+        posting_ins, _ = _accrue_interest(vault, params, balances, missed_balances)
+        if posting_ins:
+            vault.instruct_posting_batch(
+                posting_instructions=posting_ins, effective_date=effective_date
+            )
 
-    elif event_type == 'DAILY_APPLY_INTEREST':
-        balances = vault.get_balance_timeseries().latest()
-        _apply_interest(
-            vault, denomination, internal_account, effective_date, balances
-        )
+    elif event_type in ('DAILY_APPLY_INTEREST', 'APPLY_ACCRUED_INTEREST'):
+        balances = vault.get_balances_observation(fetcher_id=INTEREST_BALANCES_FETCHER).balances
+        interest_accrued = balances[
+            ('ACCRUED_INCOMING_INTEREST', DEFAULT_ASSET, denomination, Phase.COMMITTED)
+        ].net
+        posting_ins = _apply_interest(vault, params, interest_accrued)
+        if posting_ins:
+            vault.instruct_posting_batch(
+                posting_instructions=posting_ins,
+                effective_date=effective_date,
+                client_batch_id=f'APPLY_ACCRUED_INTEREST{hook_execution_id}_'
+                                f'{denomination}'
+            )
+
+    elif event_type == 'DAILY_ACCRUE_AND_APPLY_INTEREST':
+        balances = vault.get_balances_observation(fetcher_id=INTEREST_BALANCES_FETCHER).balances
+        posting_ins, amount_accrued = _accrue_interest(vault, params, balances)
+        creation_date = vault.get_account_creation_date()
+        if _is_interest_application_date(params, effective_date, creation_date):
+            # Today's accrual lands in the same batch, so it is applied alongside what is
+            # already sitting in ACCRUED_INCOMING_INTEREST
+            interest_accrued = balances[
+                ('ACCRUED_INCOMING_INTEREST', DEFAULT_ASSET, denomination, Phase.COMMITTED)
+            ].net + amount_accrued
+            posting_ins.extend(_apply_interest(vault, params, interest_accrued))
+        if posting_ins:
+            vault.instruct_posting_batch(
+                posting_instructions=posting_ins,
+                effective_date=effective_date,
+                client_batch_id=f'ACCRUE_AND_APPLY_INTEREST{hook_execution_id}_'
+                                f'{denomination}'
+            )
 
     elif event_type == 'MONTHLY_MAINTENANCE_FEE':
-        balances = vault.get_balance_timeseries().latest()
-        _apply_maintenance_fee(
-            vault, denomination, internal_account, effective_date, balances
-        )
+        balances = vault.get_balances_observation(fetcher_id=FEE_BALANCES_FETCHER).balances
+        _apply_maintenance_fee(vault, params, effective_date, balances)
 
-@requires(parameters=True, balances='latest', postings='1 day',)
+@requires(parameters=True)
+@fetch_account_data(balances=[LIVE_BALANCES_FETCHER])
 def pre_posting_code(postings, effective_date):
-    denomination = vault.get_parameter_timeseries(name='denomination').latest()
+    denomination = _load_params(vault, 'pre_posting_code')['denomination']
 
     if any(post.denomination != denomination for post in postings):
         raise Rejected(
@@ -165,72 +434,379 @@ def pre_posting_code(postings, effective_date):
             reason_code=RejectedReason.WRONG_DENOMINATION,
             )
 
-    balances = vault.get_balance_timeseries().latest()
-    
-    for post in postings: 
-        if post.credit == False: 
-            proposed_amount = sum(
-                post.amount for post in postings if post.account_address == DEFAULT_ADDRESS
-                and post.asset == DEFAULT_ASSET
-            )
+    # Credits cannot overdraw the account, so deposits skip the balance check entirely
+    if all(post.credit for post in postings):
+        return
 
-            total_balances = sum(
-                balance.net for ((address, asset, denomination, phase), balance) in balances.items() if
-                address == DEFAULT_ADDRESS
-            )
+    balances = vault.get_balances_observation(fetcher_id=LIVE_BALANCES_FETCHER).balances
+    proposed_debits = _proposed_debits(postings)
+    available_balances = _available_balances(balances)
 
-            #check for checking withdrawal amount is not greater than the balance
-            if proposed_amount > total_balances:
-                raise Rejected(
-                    'Cannot withdraw proposed amount.', 
-                    reason_code=RejectedReason.INSUFFICIENT_FUNDS
-                    )
-            else:
-                None
+    for key, proposed_amount in proposed_debits.items():
+        if key[0] != DEFAULT_ADDRESS or proposed_amount <= 0:
+            continue
+
+        #check for checking withdrawal amount is not greater than the balance
+        if proposed_amount > available_balances.get(key, Decimal(0)):
+            raise Rejected(
+                'Cannot withdraw proposed amount.', 
+                reason_code=RejectedReason.INSUFFICIENT_FUNDS
+                )
+
+@requires(parameters=True)
+@fetch_account_data(balances=[LIVE_STATE_BALANCES_FETCHER])
+def derived_parameters(effective_date):
+    params = _load_params(vault, 'derived_parameters')
+    denomination = params['denomination']
+    balances = vault.get_balances_observation(fetcher_id=LIVE_STATE_BALANCES_FETCHER).balances
 
-def _accrue_interest(vault, denomination, internal_account, effective_date, balances):
-    hook_execution_id = vault.get_hook_execution_id()
     effective_balance = balances[
         (DEFAULT_ADDRESS, DEFAULT_ASSET, denomination, Phase.COMMITTED)
     ].net
-    daily_rate = vault.get_parameter_timeseries(name='base_interest_rate').latest()
-    interest = effective_balance * _apply_interest_with_bonus(vault, effective_balance, daily_rate)
-    amount_to_accrue = _precision_accrual(interest)
+    mean_balance = _monthly_mean_balance(denomination, balances, effective_balance)
+    fee_tier, fee, _ = _maintenance_fee_due(params, mean_balance, effective_balance)
+    accrued_interest = sum(
+        balances[(address, DEFAULT_ASSET, denomination, Phase.COMMITTED)].net
+        for address in ('ACCRUED_INCOMING_INTEREST', ACCRUED_INTEREST_CARRY)
+    )
+
+    return {
+        'month_to_date_mean_balance': mean_balance.quantize(
+            Decimal('.01'), rounding=ROUND_HALF_UP
+        ),
+        'projected_maintenance_fee_tier': fee_tier,
+        'projected_maintenance_fee': fee,
+        'accrued_interest_unapplied': accrued_interest,
+    }
+
+@requires(parameters=True)
+def pre_parameter_change_code(parameters, effective_date):
+    if 'fee_tiers' in parameters or 'fee_tier_ranges' in parameters:
+        fee_tiers = (
+            parameters['fee_tiers'] if 'fee_tiers' in parameters
+            else vault.get_parameter_timeseries(name='fee_tiers').latest()
+        )
+        fee_tier_ranges = (
+            parameters['fee_tier_ranges'] if 'fee_tier_ranges' in parameters
+            else vault.get_parameter_timeseries(name='fee_tier_ranges').latest()
+        )
+        _validate_fee_tiers(fee_tiers, fee_tier_ranges)
+
+    return parameters
+
+def _load_params(vault, hook):
+    """
+    Fetches each parameter listed for `hook` in HOOK_PARAMETERS once and returns them keyed by
+    name, so helpers read the snapshot instead of the parameter timeseries. The
+    internal_account_shards JSON is parsed here, once per hook.
+    """
+    params = {
+        name: vault.get_parameter_timeseries(name=name).latest()
+        for name in HOOK_PARAMETERS[hook]
+    }
+    if 'internal_account_shards' in params:
+        params['internal_account_shards'] = _internal_account_shards(
+            params['internal_account_shards']
+        )
+    return params
+
+def _proposed_debits(postings):
+    """
+    Sums the batch once, returning the total debit proposed against each
+    (address, asset, denomination). Credits in the same batch do not offset the debits.
+    """
+    proposed_debits = {}
+    for post in postings:
+        if post.credit:
+            continue
+        key = (post.account_address, post.asset, post.denomination)
+        proposed_debits[key] = proposed_debits.get(key, Decimal(0)) + post.amount
+
+    return proposed_debits
+
+def _available_balances(balances):
+    """
+    Sums the committed and pending outgoing net balance once for each
+    (address, asset, denomination). Pending incoming funds are not available to withdraw.
+    """
+    available_balances = {}
+    for (address, asset, denomination, phase), balance in balances.items():
+        if phase not in (Phase.COMMITTED, Phase.PENDING_OUT):
+            continue
+        key = (address, asset, denomination)
+        available_balances[key] = available_balances.get(key, Decimal(0)) + balance.net
+
+    return available_balances
+
+def _account_hash(account_id):
+    """
+    32-bit FNV-1a hash of an account ID. The builtin hash() is salted per process, so it would
+    give an account a different value on every execution.
+    """
+    account_hash = 2166136261
+    for character in account_id:
+        account_hash = ((account_hash ^ ord(character)) * 16777619) % 4294967296
+    return account_hash
+
+def _internal_account_shards(internal_account_shards):
+    """
+    The internal account IDs in the internal_account_shards parameter. Template parameter
+    changes are not validated by any hook, so a value that is not a list of account IDs is
+    treated as an empty list, so that internal_account is used, rather than failing every
+    hook that posts against the shards.
+    """
+    try:
+        shards = json_loads(internal_account_shards)
+        # A list is the only JSON value equal to the list of its items
+        is_list = list(shards) == shards
+    except:  # noqa: E722
+        # The sandbox exposes no builtin exception types, so neither the JSON decode error nor
+        # the TypeError from list() of a number, boolean or null can be caught by name
+        return []
+    # A string is the only JSON value equal to its str()
+    if not is_list or not all(str(shard) == shard and shard for shard in shards):
+        return []
+    return shards
+
+def _internal_account(vault, params):
+    """
+    The internal account this account posts interest and fees against: one of the parsed
+    internal_account_shards picked by account hash, or internal_account if there are none.
+    """
+    shards = params['internal_account_shards']
+    if not shards:
+        return params['internal_account']
+    return shards[_account_hash(vault.account_id) % len(shards)]
+
+def _schedule_offset(account_id, params):
+    """
+    Seconds after midnight at which this account's schedules start, so that the book is spread
+    across schedule_spread_window instead of all firing at once. Every schedule is shifted by
+    the same offset, so their relative order within the day is unchanged.
+    """
+    window = int(params['schedule_spread_window']) * 60
+    if window <= 0:
+        return 0
+    return _account_hash(account_id) % window
+
+def _time_of_day(seconds):
+    return {
+        'hour': str(seconds // 3600),
+        'minute': str(seconds // 60 % 60),
+        'second': str(seconds % 60),
+    }
+
+def _combine_daily_interest_schedules(params):
+    return params['combine_daily_interest_schedules'].key == 'true'
+
+def _interest_application_frequency(params):
+    return params['interest_application_frequency'].key
+
+def _quarterly_application_months(creation_date):
+    """
+    The four months in which quarterly interest is applied, counted from the account's opening
+    month.
+    """
+    return sorted((creation_date.month + 3 * quarter - 1) % 12 + 1 for quarter in range(1, 5))
+
+def _is_interest_application_date(params, effective_date, creation_date):
+    frequency = _interest_application_frequency(params)
+    if frequency == 'daily':
+        return True
+    if effective_date.day != int(params['interest_application_day']):
+        return False
+    if frequency == 'quarterly':
+        return effective_date.month in _quarterly_application_months(creation_date)
+    return True
+
+def _missed_accrual_balances(vault, effective_date):
+    """
+    The balances at each daily accrual missed since the last DAILY_ACCRUE_INTEREST execution,
+    e.g. while schedules were paused, read from a single interval fetch. Each is returned with
+    whether it is tracked in DAILY_BALANCE_SUM, which only holds balances from after the last
+    MONTHLY_MAINTENANCE_FEE reset it. Interest is accrued on all of them regardless.
+    """
+    last_execution_time = vault.get_last_execution_time(event_type='DAILY_ACCRUE_INTEREST')
+    if not last_execution_time:
+        return []
+
+    last_fee_time = vault.get_last_execution_time(event_type='MONTHLY_MAINTENANCE_FEE')
+    balance_timeseries = vault.get_balances_timeseries(fetcher_id=ACCRUAL_CATCH_UP_FETCHER)
+    missed_balances = []
+    missed_date = last_execution_time + timedelta(days=1)
+    while missed_date.date() < effective_date.date():
+        missed_balances.append(
+            (
+                balance_timeseries.at(timestamp=missed_date),
+                not last_fee_time or missed_date > last_fee_time,
+            )
+        )
+        missed_date += timedelta(days=1)
+
+    return missed_balances
+
+def _accrue_interest(vault, params, balances, missed_balances=None):
+    """
+    Returns the posting instructions for the daily accrual and the daily balance tracking,
+    along with the amount posted to ACCRUED_INCOMING_INTEREST.
+    Any `missed_balances`, as returned by _missed_accrual_balances, are accrued alongside
+    today's balance, so missed days are caught up in the same batch. Only those tracked are
+    added to DAILY_BALANCE_SUM and DAILY_BALANCE_COUNT.
+    Accruals below minimum_accrual_posting_amount are carried in ACCRUED_INTEREST_CARRY
+    and posted, with the carry, once the running total reaches the minimum.
+    """
+    hook_execution_id = vault.get_hook_execution_id()
+    denomination = params['denomination']
+    internal_account = _internal_account(vault, params)
+    daily_rate = params['base_interest_rate']
+    missed_balances = missed_balances or []
+    daily_balances = [
+        daily_balance[(DEFAULT_ADDRESS, DEFAULT_ASSET, denomination, Phase.COMMITTED)].net
+        for daily_balance in [missed for missed, _ in missed_balances] + [balances]
+    ]
+    tracked_balances = [
+        daily_balance
+        for daily_balance, (_, tracked) in zip(daily_balances, missed_balances)
+        if tracked
+    ] + [daily_balances[-1]]
+    effective_balance = daily_balances[-1]
+    amount_to_accrue = sum(
+        _precision_accrual(
+            daily_balance * _apply_interest_with_bonus(params, daily_balance, daily_rate)
+        )
+        for daily_balance in daily_balances
+    )
+    carried_interest = balances[
+        (ACCRUED_INTEREST_CARRY, DEFAULT_ASSET, denomination, Phase.COMMITTED)
+    ].net
+    posting_ins = []
+
+    if 0 < amount_to_accrue + carried_interest < params['minimum_accrual_posting_amount']:
+        posting_ins.extend(
+            _update_tracking_address(
+                vault,
+                amount_to_accrue,
+                denomination,
+                ACCRUED_INTEREST_CARRY,
+                hook_execution_id + '_ACCRUED_INTEREST_CARRY',
+                'CARRY_ACCRUED_INTEREST'
+            )
+        )
+        amount_to_accrue = Decimal(0)
+    else:
+        amount_to_accrue += carried_interest
+        posting_ins.extend(
+            _update_tracking_address(
+                vault,
+                -carried_interest,
+                denomination,
+                ACCRUED_INTEREST_CARRY,
+                hook_execution_id + '_ACCRUED_INTEREST_CARRY',
+                'CARRY_ACCRUED_INTEREST'
+            )
+        )
+
+    if len(daily_balances) > 1:
+        accrual_description = (
+            f'Daily interest accrued at {daily_rate} on end of day balances of '
+            f'{", ".join(str(daily_balance) for daily_balance in daily_balances)} '
+            f'for {len(daily_balances)} days'
+        )
+    else:
+        accrual_description = (
+            f'Daily interest accrued at {daily_rate} on balance of {effective_balance}'
+        )
 
     if amount_to_accrue > 0:
-        posting_ins = vault.make_internal_transfer_instructions(
-            amount=amount_to_accrue,
-            denomination=denomination,
-            client_transaction_id=hook_execution_id + '_DAILY_INTEREST_ACCRUAL',
-            from_account_id=internal_account,
-            from_account_address='ACCRUED_OUTGOING',
-            to_account_id=vault.account_id,
-            to_account_address='ACCRUED_INCOMING_INTEREST',
-            instruction_details={
-                'description': f'Daily interest accrued at {daily_rate} on balance '
-                               f'of {effective_balance}',
-                'event': 'ACCRUE_INTEREST'
-            },
-            asset=DEFAULT_ASSET
+        posting_ins.extend(
+            vault.make_internal_transfer_instructions(
+                amount=amount_to_accrue,
+                denomination=denomination,
+                client_transaction_id=hook_execution_id + '_DAILY_INTEREST_ACCRUAL',
+                from_account_id=internal_account,
+                from_account_address='ACCRUED_OUTGOING',
+                to_account_id=vault.account_id,
+                to_account_address='ACCRUED_INCOMING_INTEREST',
+                instruction_details={
+                    'description': accrual_description,
+                    'event': 'ACCRUE_INTEREST'
+                },
+                asset=DEFAULT_ASSET
+            )
         )
-        vault.instruct_posting_batch(
-            posting_instructions=posting_ins, effective_date=effective_date
+
+    # The same end of day balances are added to the running sum used by the monthly
+    # maintenance fee, so the fee never has to look back over a month of history. The number
+    # of balances summed is tracked too, as it need not match the days since the last fee
+    posting_ins.extend(
+        _update_tracking_address(
+            vault,
+            sum(tracked_balances),
+            denomination,
+            DAILY_BALANCE_SUM,
+            hook_execution_id + '_DAILY_BALANCE_SUM',
+            'TRACK_DAILY_BALANCE'
+        )
+    )
+    posting_ins.extend(
+        _update_tracking_address(
+            vault,
+            Decimal(len(tracked_balances)),
+            denomination,
+            DAILY_BALANCE_COUNT,
+            hook_execution_id + '_DAILY_BALANCE_COUNT',
+            'TRACK_DAILY_BALANCE'
         )
+    )
+
+    return posting_ins, amount_to_accrue
+
+def _update_tracking_address(
+    vault, amount, denomination, tracking_address, client_transaction_id, event
+):
+    """
+    Moves `amount` between INTERNAL_CONTRA and a tracking address on the account itself.
+    A negative amount reduces the tracking address. Returns no instructions for a zero amount.
+    """
+    if amount == 0:
+        return []
+
+    if amount > 0:
+        from_account_address = INTERNAL_CONTRA
+        to_account_address = tracking_address
+    else:
+        from_account_address = tracking_address
+        to_account_address = INTERNAL_CONTRA
+
+    return vault.make_internal_transfer_instructions(
+        amount=abs(amount),
+        denomination=denomination,
+        client_transaction_id=client_transaction_id,
+        from_account_id=vault.account_id,
+        from_account_address=from_account_address,
+        to_account_id=vault.account_id,
+        to_account_address=to_account_address,
+        instruction_details={
+            'description': f'Tracking address {tracking_address} updated by {amount}',
+            'event': event
+        },
+        asset=DEFAULT_ASSET
+    )
 
-def _apply_interest_with_bonus(vault, effective_balance, interest):
-    bonus_interest_amount_threshold = vault.get_parameter_timeseries(name="bonus_interest_amount_threshold").latest()
+def _apply_interest_with_bonus(params, effective_balance, interest):
+    bonus_interest_amount_threshold = params['bonus_interest_amount_threshold']
 
     if effective_balance > bonus_interest_amount_threshold:
-        bonus_interest = vault.get_parameter_timeseries(name="bonus_interest_rate").latest()
+        bonus_interest = params['bonus_interest_rate']
         interest += bonus_interest
 
     return interest 
 
-def _apply_interest(vault, denomination, internal_account, effective_date, balances):
+def _apply_interest(vault, params, interest_accrued):
     hook_execution_id = vault.get_hook_execution_id()
-    interest_accrued = balances[
-        ('ACCRUED_INCOMING_INTEREST', DEFAULT_ASSET, denomination, Phase.COMMITTED)
-    ].net
+    denomination = params['denomination']
+    internal_account = _internal_account(vault, params)
+    posting_ins = []
 
     if interest_accrued > 0:
         posting_ins = vault.make_internal_transfer_instructions(
@@ -266,143 +842,168 @@ def _apply_interest(vault, denomination, internal_account, effective_date, balan
                 }
             )
         )
-        vault.instruct_posting_batch(
-                posting_instructions=posting_ins,
-                effective_date=effective_date,
-                client_batch_id=f'APPLY_ACCRUED_INTEREST{hook_execution_id}_'
-                                f'{denomination}'
-            )
+
+    return posting_ins
 
 def _precision_accrual(amount):
     return amount.copy_abs().quantize(Decimal('.0001'), rounding=ROUND_HALF_UP)
 
-def _apply_maintenance_fee(vault, denomination, internal_account, effective_date, balances):
+def _apply_maintenance_fee(vault, params, effective_date, balances):
     hook_execution_id = vault.get_hook_execution_id()
+    denomination = params['denomination']
+    internal_account = _internal_account(vault, params)
     effective_balance = balances[
         (DEFAULT_ADDRESS, DEFAULT_ASSET, denomination, Phase.COMMITTED)
     ].net
-    minimum_balance_maintenance_fee_waive = vault.get_parameter_timeseries(name="minimum_balance_maintenance_fee_waive").latest()
+    mean_balance = _monthly_mean_balance(denomination, balances, effective_balance)
 
-    if _monthly_mean_balance(vault, denomination, effective_date) < minimum_balance_maintenance_fee_waive: 
-        flat_fee = vault.get_parameter_timeseries(name="flat_fee").latest()
+    # The running sum and count restart every month, whether or not a fee is charged
+    posting_ins = []
+    for tracking_address in (DAILY_BALANCE_SUM, DAILY_BALANCE_COUNT):
+        posting_ins.extend(
+            _update_tracking_address(
+                vault,
+                -balances[(tracking_address, DEFAULT_ASSET, denomination, Phase.COMMITTED)].net,
+                denomination,
+                tracking_address,
+                f'RESET_{tracking_address}{hook_execution_id}_{denomination}',
+                'RESET_DAILY_BALANCE_SUM'
+            )
+        )
 
-        if flat_fee > 0:
-            posting_ins = vault.make_internal_transfer_instructions(
-                        amount=flat_fee,
-                        denomination=denomination,
-                        from_account_id=vault.account_id,
-                        from_account_address=MONTHLY_MAINTENANCE_FEES,
-                        to_account_id=internal_account,
-                        to_account_address='MONTHLY_FEE_ACCRUED',
-                        asset=DEFAULT_ASSET,
-                        client_transaction_id=f'APPLY_FEE'
-                                            f'{hook_execution_id}_{denomination}',
-                        instruction_details={
-                            'description': f'Monthly Maintenance Fee Applied to Account: {vault.account_id}' ,
-                            'event': 'APPLY_MONTHLY_FEE'
-                        }
-                    )
+    _, fee, internal_fee_address = _maintenance_fee_due(params, mean_balance, effective_balance)
+    if fee > 0:
+        posting_ins.extend(
+            _maintenance_fee_instructions(
+                vault, denomination, internal_account, hook_execution_id,
+                fee, internal_fee_address
+            )
+        )
 
-            posting_ins.extend(
-                vault.make_internal_transfer_instructions(
-                    amount=flat_fee,
-                    denomination=denomination,
-                    from_account_id=vault.account_id,
-                    from_account_address=DEFAULT_ADDRESS,
-                    to_account_id=internal_account,
-                    to_account_address=DEFAULT_ADDRESS  ,
-                    asset=DEFAULT_ASSET,
-                    client_transaction_id=f'APPLY_FEE'
-                                        f'{hook_execution_id}_{denomination}_INTERNAL',
-                    instruction_details={
-                        'description': f'Monthly Maintenance Fee Applied to Account: {vault.account_id}' ,
-                        'event': 'APPLY_MONTHLY_FEE'
-                    }
-                )
+    if posting_ins:
+        vault.instruct_posting_batch(
+            posting_instructions=posting_ins,
+            effective_date=effective_date,
+            client_batch_id=f'APPLY_MONTHLY_FEE{hook_execution_id}_')
+
+def _maintenance_fee_due(params, mean_balance, effective_balance):
+    """
+    Applies the maintenance fee rules, returning the fee tier, the fee and the internal address
+    the fee is accrued to. Shared by the fee schedule and the projected fee derived parameters.
+    """
+    if mean_balance >= params['minimum_balance_maintenance_fee_waive']:
+        return 'waived', Decimal(0), None
+
+    flat_fee = params['flat_fee']
+    if flat_fee > 0:
+        return 'flat', flat_fee, 'MONTHLY_FEE_ACCRUED'
+
+    fee_tier, fee = _fee_tier_for_balance(
+        effective_balance, params['fee_tiers'], params['fee_tier_ranges']
+    )
+    if fee_tier is None:
+        return 'none', Decimal(0), None
+    return fee_tier, fee, 'MONTHLY_MAINTENANCE_FEE_ACCRUED'
+
+def _maintenance_fee_instructions(
+    vault, denomination, internal_account, hook_execution_id, fee, internal_fee_address
+):
+    posting_ins = vault.make_internal_transfer_instructions(
+                amount=fee,
+                denomination=denomination,
+                from_account_id=vault.account_id,
+                from_account_address=MONTHLY_MAINTENANCE_FEES,
+                to_account_id=internal_account,
+                to_account_address=internal_fee_address,
+                asset=DEFAULT_ASSET,
+                client_transaction_id=f'APPLY_FEE'
+                                    f'{hook_execution_id}_{denomination}',
+                instruction_details={
+                    'description': f'Monthly Maintenance Fee Applied to Account: {vault.account_id}' ,
+                    'event': 'APPLY_MONTHLY_FEE'
+                }
             )
 
-            vault.instruct_posting_batch(
-                posting_instructions=posting_ins,
-                effective_date=effective_date,
-                client_batch_id=f'APPLY_MONTHLY_FEE{hook_execution_id}_')
-                 
-        else: 
-            fee_tiers = json_loads(vault.get_parameter_timeseries(name="fee_tiers").latest())
-            fee_tier_ranges = json_loads(vault.get_parameter_timeseries(name="fee_tier_ranges").latest())
-
-            applicable_monthly_fee =_get_tiered_monthly_fee (effective_balance, fee_tiers, fee_tier_ranges)
-
-            if applicable_monthly_fee > 0:
-                posting_ins = vault.make_internal_transfer_instructions(
-                            amount=applicable_monthly_fee,
-                            denomination=denomination,
-                            from_account_id=vault.account_id,
-                            from_account_address=MONTHLY_MAINTENANCE_FEES,
-                            to_account_id=internal_account,
-                            to_account_address='MONTHLY_MAINTENANCE_FEE_ACCRUED',
-                            asset=DEFAULT_ASSET,
-                            client_transaction_id=f'APPLY_FEE'
-                                                f'{hook_execution_id}_{denomination}',
-                            instruction_details={
-                                'description': f'Monthly Maintenance Fee Applied to Account: {vault.account_id}' ,
-                                'event': 'APPLY_MONTHLY_FEE'
-                            }
-                        )
-
-                posting_ins.extend(
-                    vault.make_internal_transfer_instructions(
-                        amount=applicable_monthly_fee,
-                        denomination=denomination,
-                        from_account_id=vault.account_id,
-                        from_account_address=DEFAULT_ADDRESS,
-                        to_account_id=internal_account,
-                        to_account_address=DEFAULT_ADDRESS  ,
-                        asset=DEFAULT_ASSET,
-                        client_transaction_id=f'APPLY_FEE'
-                                            f'{hook_execution_id}_{denomination}_INTERNAL',
-                        instruction_details={
-                            'description': f'Monthly Maintenance Fee Applied to Account: {vault.account_id}' ,
-                            'event': 'APPLY_MONTHLY_FEE'
-                        }
-                    )
-                )
+    posting_ins.extend(
+        vault.make_internal_transfer_instructions(
+            amount=fee,
+            denomination=denomination,
+            from_account_id=vault.account_id,
+            from_account_address=DEFAULT_ADDRESS,
+            to_account_id=internal_account,
+            to_account_address=DEFAULT_ADDRESS  ,
+            asset=DEFAULT_ASSET,
+            client_transaction_id=f'APPLY_FEE'
+                                f'{hook_execution_id}_{denomination}_INTERNAL',
+            instruction_details={
+                'description': f'Monthly Maintenance Fee Applied to Account: {vault.account_id}' ,
+                'event': 'APPLY_MONTHLY_FEE'
+            }
+        )
+    )
 
-                vault.instruct_posting_batch(
-                    posting_instructions=posting_ins,
-                    effective_date=effective_date,
-                    client_batch_id=f'APPLY_MONTHLY_FEE{hook_execution_id}_')
-    else:
-        return
+    return posting_ins
+
+def _validate_fee_tiers(fee_tiers, fee_tier_ranges):
+    """
+    Raises InvalidContractParameter if a fee tier range is malformed, has its min above its max,
+    overlaps another range or has no fee defined for it.
+    """
+    fees = json_loads(fee_tiers)
+    bounds_by_tier = []
+    for tier, bounds in json_loads(fee_tier_ranges).items():
+        if tier not in fees:
+            raise InvalidContractParameter(f'No fee defined for fee tier {tier}')
+        if 'min' not in bounds or 'max' not in bounds:
+            raise InvalidContractParameter(f'Fee tier {tier} must define a min and a max')
+
+        lower_bound = Decimal(str(bounds['min']))
+        upper_bound = Decimal(str(bounds['max']))
+        if lower_bound > upper_bound:
+            raise InvalidContractParameter(f'Fee tier {tier} min is greater than its max')
+        bounds_by_tier.append((lower_bound, upper_bound, tier))
+
+    bounds_by_tier = sorted(bounds_by_tier, key=lambda row: row[0])
+    for previous_row, row in zip(bounds_by_tier, bounds_by_tier[1:]):
+        if row[0] <= previous_row[1]:
+            raise InvalidContractParameter(
+                f'Fee tier {row[2]} overlaps with fee tier {previous_row[2]}'
+            )
 
-def _get_tiered_monthly_fee(effective_balance, fee_tiers, fee_tier_ranges):
-    tier = None
-    for fee_tier in fee_tier_ranges: 
-        bounds = fee_tier_ranges[fee_tier]
-        if bounds['min'] <= effective_balance <= bounds['max']:
-            tier = fee_tier
-    
-    if tier: 
-        fee = Decimal(fee_tiers[tier])
-    else: 
-        fee = 0
-
-    return fee
-
-def _monthly_mean_balance(vault, denomination, effective_date):
-    creation_date = vault.get_account_creation_date()
-    period_start = effective_date - timedelta(months=1)
-    if period_start < creation_date:
-        period_start += timedelta(days=1)
-    num_days = (effective_date - period_start).days
-    total = sum(
-        [
-            vault.get_balance_timeseries()
-            .at(timestamp=period_start + timedelta(days=i))[
-                (DEFAULT_ADDRESS, DEFAULT_ASSET, denomination, Phase.COMMITTED)
-            ]
-            .net
-            for i in range(num_days)
-        ]
-    )
-    mean_balance = total / num_days
-    return mean_balance
\ No newline at end of file
+def _fee_tier_for_balance(effective_balance, fee_tiers, fee_tier_ranges):
+    """
+    Finds the fee tier and fee for `effective_balance` in one pass over the ranges. A table that
+    passed _validate_fee_tiers has at most one range containing the balance. Template parameter
+    changes are not validated by any hook though, so where ranges overlap the last match wins,
+    and ranges without a min, a max or a fee are skipped.
+    """
+    fees = json_loads(fee_tiers)
+    fee_tier = None
+    for tier, bounds in json_loads(fee_tier_ranges).items():
+        if tier not in fees or 'min' not in bounds or 'max' not in bounds:
+            continue
+        if Decimal(str(bounds['min'])) <= effective_balance <= Decimal(str(bounds['max'])):
+            fee_tier = tier
+
+    if fee_tier is None:
+        return None, Decimal(0)
+    return fee_tier, Decimal(str(fees[fee_tier]))
+
+def _monthly_mean_balance(denomination, balances, effective_balance):
+    """
+    The mean of the daily balances added to DAILY_BALANCE_SUM by DAILY_ACCRUE_INTEREST since
+    the previous fee, divided by the number of balances added as tracked in
+    DAILY_BALANCE_COUNT. If none have been added, e.g. for an account upgraded from a version
+    that did not track them, the effective balance is used. Shared by the fee schedule and the
+    month to date mean balance derived parameter, so the projected fee matches the charge.
+    """
+    num_samples = balances[
+        (DAILY_BALANCE_COUNT, DEFAULT_ASSET, denomination, Phase.COMMITTED)
+    ].net
+    if num_samples <= 0:
+        return effective_balance
+
+    total = balances[
+        (DAILY_BALANCE_SUM, DEFAULT_ASSET, denomination, Phase.COMMITTED)
+    ].net
+    return total / num_samples
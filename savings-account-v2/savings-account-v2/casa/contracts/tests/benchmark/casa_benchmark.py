@@ -0,0 +1,405 @@
+# Copyright @ 2020 Thought Machine Group Limited. All rights reserved.
+"""
+Micro-benchmarks for the CASA contract hooks, run through the unit test runner.
+
+Each case runs one hook against a mock vault holding a synthetic balance history or posting
+batch, and records the time per call and the memory allocated by a call. DAILY_ACCRUE_INTEREST
+last ran at the start of the history, so it catches up on every day of it. The other scheduled
+events only observe the balances at their effective date, so they are run once.
+
+Results are compared against the committed baseline, so that a change in how a hook scales is
+caught before it reaches the contract engine, and a run without a baseline fails. Timings depend
+on the machine they were taken on, which the default threshold allows for. Refresh the baseline
+with --update-baseline when a change is intended, or when the machine running the comparison
+changes, and commit it with the change.
+
+Usage, from the repository root:
+    python -m casa.contracts.tests.benchmark.casa_benchmark --update-baseline
+    python -m casa.contracts.tests.benchmark.casa_benchmark
+"""
+# standard libs
+import argparse
+import gc
+import json
+import os
+import sys
+import time
+import tracemalloc
+from dataclasses import asdict, dataclass
+from datetime import datetime, timedelta
+from decimal import Decimal
+from typing import Callable, Dict, List, Tuple
+
+# common
+from common.test_utils.contracts.unit import compile_contract, run
+from common.test_utils.contracts.unit.common import ContractTest
+from common.test_utils.contracts.unit.types_extension import (
+    DEFAULT_ADDRESS,
+    BalancesObservation,
+    Tside,
+    UnionItemValue,
+)
+
+CONTRACT_FILE = "casa/contracts/casa.py"
+BASELINE_FILE = "casa/contracts/tests/benchmark/casa_benchmark_baseline.json"
+DEFAULT_THRESHOLD = 2.0
+DEFAULT_MIN_TIME = 0.2
+DEFAULT_REPEATS = 3
+
+HISTORY_DAYS = [1, 7, 30, 90, 365]
+BATCH_SIZES = [1, 10, 100, 1000]
+# The scheduled event that reads the balance history, to catch up on missed executions
+HISTORY_EVENT = "DAILY_ACCRUE_INTEREST"
+SCHEDULED_EVENTS = [
+    "DAILY_APPLY_INTEREST",
+    "APPLY_ACCRUED_INTEREST",
+    "DAILY_ACCRUE_AND_APPLY_INTEREST",
+    "MONTHLY_MAINTENANCE_FEE",
+]
+BALANCE_FETCHERS = [
+    "EFFECTIVE_DATE_INTEREST_BALANCES",
+    "EFFECTIVE_DATE_FEE_BALANCES",
+    "LIVE_DEFAULT_BALANCES",
+    "LIVE_RUNNING_STATE_BALANCES",
+]
+HISTORY_START = datetime(2019, 1, 1)
+
+DEFAULT_PARAMETERS = {
+    "denomination": "PHP",
+    "fee_tiers": '{"tier1": "135", "tier2": "98", "tier3": "45", "tier4": "35", "tier5": "3"}',
+    "fee_tier_ranges": '{"tier1": {"min": 1000, "max": 2999},'
+    '"tier2": {"min": 3000, "max": 4999},'
+    '"tier3": {"min": 5000, "max": 7499},'
+    '"tier4": {"min": 7500, "max": 14999},'
+    '"tier5": {"min": 15000, "max": 20000}}',
+    "internal_account": "Internal account",
+    "internal_account_shards": "[]",
+    "base_interest_rate": Decimal("0.002"),
+    "bonus_interest_rate": Decimal("0.005"),
+    "bonus_interest_amount_threshold": Decimal("5000"),
+    "minimum_balance_maintenance_fee_waive": Decimal("1000000"),
+    "flat_fee": Decimal("0"),
+    "minimum_accrual_posting_amount": Decimal("0"),
+    "combine_daily_interest_schedules": UnionItemValue(key="true"),
+    "interest_application_frequency": UnionItemValue(key="daily"),
+    "interest_application_day": Decimal("1"),
+    "schedule_spread_window": Decimal("0"),
+}
+
+
+@dataclass
+class BenchmarkResult:
+    name: str
+    time_per_call_us: float
+    peak_memory_bytes: int
+    allocated_bytes: int
+
+
+class CASABenchmark(ContractTest):
+    contract_file = CONTRACT_FILE
+    side = Tside.LIABILITY
+
+    def runTest(self):
+        pass
+
+    def balance_history(self, history_days: int) -> List[Tuple[datetime, Dict]]:
+        """
+        One balance entry per day, with a DEFAULT balance that moves every day and the
+        tracking addresses CASA maintains, reset every 31 days as by the maintenance fee.
+        """
+        balance_ts = []
+        for day in range(history_days):
+            balance_ts.extend(
+                self.init_balances(
+                    dt=HISTORY_START + timedelta(days=day),
+                    balance_defs=[
+                        {
+                            "address": DEFAULT_ADDRESS,
+                            "denomination": "PHP",
+                            "net": str(2000 + day),
+                        },
+                        {
+                            "address": "ACCRUED_INCOMING_INTEREST",
+                            "denomination": "PHP",
+                            "net": "4",
+                        },
+                        {
+                            "address": "DAILY_BALANCE_SUM",
+                            "denomination": "PHP",
+                            "net": str(2000 * (day % 31)),
+                        },
+                        {
+                            "address": "DAILY_BALANCE_COUNT",
+                            "denomination": "PHP",
+                            "net": str(day % 31),
+                        },
+                    ],
+                )
+            )
+        return balance_ts
+
+    def history_mock(self, history_days: int, effective_date: datetime):
+        """
+        A mock vault with `history_days` of balance history, whose DAILY_ACCRUE_INTEREST last
+        ran at the start of the history. Balance observations are of the latest balances.
+        """
+        balance_ts = self.balance_history(history_days)
+        observation = BalancesObservation(
+            value_datetime=balance_ts[-1][0], balances=balance_ts[-1][1]
+        )
+        return self.create_mock(
+            balance_ts=balance_ts,
+            parameter_ts=self.param_map_to_timeseries(
+                {name: {"value": value} for name, value in DEFAULT_PARAMETERS.items()},
+                HISTORY_START,
+            ),
+            creation_date=HISTORY_START,
+            balances_observation_fetchers_mapping={
+                fetcher_id: observation for fetcher_id in BALANCE_FETCHERS
+            },
+            balances_interval_fetchers_mapping={"ACCRUAL_CATCH_UP_BALANCES": balance_ts},
+            DAILY_ACCRUE_INTEREST=HISTORY_START,
+        )
+
+    def debit_batch(self, batch_size: int):
+        return self.mock_posting_instruction_batch(
+            posting_instructions=[
+                self.mock_posting_instruction(
+                    amount=Decimal("1"), credit=False, denomination="PHP"
+                )
+                for _ in range(batch_size)
+            ]
+        )
+
+
+def _time_per_call(call: Callable, min_time: float, repeats: int) -> float:
+    """
+    Calls `call` until at least `min_time` seconds have passed, `repeats` times, and returns
+    the fastest mean time per call in microseconds. As with timeit, garbage collection is
+    disabled while timing.
+    """
+    gc.collect()
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        best = _fastest_time_per_call(call, min_time, repeats)
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+    return best * 1e6
+
+
+def _fastest_time_per_call(call: Callable, min_time: float, repeats: int) -> float:
+    best = None
+    for _ in range(repeats):
+        iterations = 0
+        started_at = time.perf_counter()
+        while True:
+            call()
+            iterations += 1
+            elapsed = time.perf_counter() - started_at
+            if elapsed >= min_time:
+                break
+        per_call = elapsed / iterations
+        best = per_call if best is None else min(best, per_call)
+    return best
+
+
+def _allocations(call: Callable) -> Tuple[int, int]:
+    """
+    Returns the peak traced memory during one call and the memory still allocated after it
+    """
+    tracemalloc.start()
+    try:
+        before, _ = tracemalloc.get_traced_memory()
+        call()
+        after, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak - before, after - before
+
+
+def benchmark_cases(benchmark: CASABenchmark) -> Dict[str, Callable[[], Callable]]:
+    """
+    Each case maps its name to a factory, which builds the mock vault outside the measured
+    region and returns the call to measure.
+    """
+    code = compile_contract(benchmark.smart_contract, benchmark.contract_file)
+    cases = {}
+
+    def scheduled_case(event_type: str, history_days: int) -> Callable[[], Callable]:
+        def case():
+            effective_date = HISTORY_START + timedelta(days=history_days, seconds=1)
+            mock_vault = benchmark.history_mock(history_days, effective_date)
+            return lambda: run(code, "scheduled_code", mock_vault, event_type, effective_date)
+
+        return case
+
+    for history_days in HISTORY_DAYS:
+        cases[f"scheduled_code[{HISTORY_EVENT}][history={history_days}d]"] = scheduled_case(
+            HISTORY_EVENT, history_days
+        )
+    for event_type in SCHEDULED_EVENTS:
+        cases[f"scheduled_code[{event_type}]"] = scheduled_case(event_type, 1)
+
+    for batch_size in BATCH_SIZES:
+
+        def pre_posting_case(batch_size=batch_size):
+            effective_date = HISTORY_START + timedelta(days=30)
+            mock_vault = benchmark.history_mock(30, effective_date)
+            postings = benchmark.debit_batch(batch_size)
+            return lambda: run(
+                code, "pre_posting_code", mock_vault, postings, effective_date
+            )
+
+        cases[f"pre_posting_code[batch={batch_size}]"] = pre_posting_case
+
+    return cases
+
+
+def run_benchmarks(
+    min_time: float = DEFAULT_MIN_TIME,
+    repeats: int = DEFAULT_REPEATS,
+    name_filter: str = "",
+) -> List[BenchmarkResult]:
+    CASABenchmark.setUpClass()
+    benchmark = CASABenchmark()
+    results = []
+    for name, case in benchmark_cases(benchmark).items():
+        if name_filter not in name:
+            continue
+        call = case()
+        # The first run of a contract executes it in the unit runner's sandbox, which is then
+        # reused, so it is kept out of the measurements
+        call()
+        peak_memory, allocated = _allocations(case())
+        results.append(
+            BenchmarkResult(
+                name=name,
+                time_per_call_us=round(_time_per_call(call, min_time, repeats), 1),
+                peak_memory_bytes=peak_memory,
+                allocated_bytes=allocated,
+            )
+        )
+    return results
+
+
+def compare_to_baseline(
+    results: List[BenchmarkResult],
+    baseline: Dict[str, Dict],
+    threshold: float = DEFAULT_THRESHOLD,
+) -> List[str]:
+    """
+    Returns a description of every case whose time per call or peak memory exceeds the
+    baseline by more than `threshold` times. Cases missing from the baseline are ignored.
+    """
+    regressions = []
+    for result in results:
+        if result.name not in baseline:
+            continue
+        for metric in ("time_per_call_us", "peak_memory_bytes"):
+            baseline_value = baseline[result.name][metric]
+            value = getattr(result, metric)
+            if baseline_value and value > baseline_value * threshold:
+                regressions.append(
+                    f"{result.name}: {metric} {value} is {value / baseline_value:.2f}x "
+                    f"the baseline {baseline_value}"
+                )
+    return regressions
+
+
+def load_baseline(path: str = BASELINE_FILE) -> Dict[str, Dict]:
+    with open(path, "r", encoding="utf-8") as baseline_file:
+        return json.load(baseline_file)
+
+
+def save_baseline(results: List[BenchmarkResult], path: str = BASELINE_FILE) -> None:
+    with open(path, "w", encoding="utf-8") as baseline_file:
+        json.dump(
+            {result.name: asdict(result) for result in results},
+            baseline_file,
+            indent=2,
+            sort_keys=True,
+        )
+        baseline_file.write("\n")
+
+
+def print_results(results: List[BenchmarkResult]) -> None:
+    width = max(len(result.name) for result in results)
+    print(f"{'case':<{width}}  {'us/call':>10}  {'peak KiB':>9}  {'retained KiB':>12}")
+    for result in results:
+        print(
+            f"{result.name:<{width}}  {result.time_per_call_us:>10.1f}  "
+            f"{result.peak_memory_bytes / 1024:>9.1f}  {result.allocated_bytes / 1024:>12.1f}"
+        )
+
+
+def process_args(args: list) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Benchmarks the CASA contract hooks through the unit test runner and "
+        "compares the results against a stored baseline."
+    )
+    parser.add_argument(
+        "--baseline",
+        default=BASELINE_FILE,
+        help=f"Baseline results file [Default: {BASELINE_FILE}]",
+    )
+    parser.add_argument(
+        "--update-baseline",
+        action="store_true",
+        help="Store the results as the new baseline instead of comparing against it",
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=DEFAULT_THRESHOLD,
+        help="Ratio to the baseline above which a case is reported as a regression "
+        f"[Default: {DEFAULT_THRESHOLD}]",
+    )
+    parser.add_argument(
+        "--min-time",
+        type=float,
+        default=DEFAULT_MIN_TIME,
+        help=f"Minimum seconds spent timing each repeat of a case [Default: {DEFAULT_MIN_TIME}]",
+    )
+    parser.add_argument(
+        "--repeats",
+        type=int,
+        default=DEFAULT_REPEATS,
+        help=f"Timing repeats per case, the fastest is kept [Default: {DEFAULT_REPEATS}]",
+    )
+    parser.add_argument(
+        "--filter",
+        default="",
+        help="Only run cases whose name contains this string",
+    )
+    return parser.parse_args(args)
+
+
+def main(args: list) -> int:
+    known_args = process_args(args)
+    results = run_benchmarks(known_args.min_time, known_args.repeats, known_args.filter)
+    print_results(results)
+
+    if known_args.update_baseline:
+        save_baseline(results, known_args.baseline)
+        print(f"Baseline written to {known_args.baseline}")
+        return 0
+
+    if not os.path.exists(known_args.baseline):
+        print(
+            f"ERROR: No baseline at {known_args.baseline}. Run with --update-baseline to store "
+            "these results as the baseline to compare later runs against"
+        )
+        return 1
+
+    regressions = compare_to_baseline(
+        results, load_baseline(known_args.baseline), known_args.threshold
+    )
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
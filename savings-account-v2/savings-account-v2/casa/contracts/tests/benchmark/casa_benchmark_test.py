@@ -0,0 +1,103 @@
+# Copyright @ 2020 Thought Machine Group Limited. All rights reserved.
+# standard libs
+import os
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
+from unittest import TestCase
+
+# casa
+# The ContractTest subclass is used through its module, so it is not collected as a test here
+from casa.contracts.tests.benchmark import casa_benchmark
+from casa.contracts.tests.benchmark.casa_benchmark import (
+    BASELINE_FILE,
+    HISTORY_START,
+    BenchmarkResult,
+    compare_to_baseline,
+    load_baseline,
+    main,
+    run_benchmarks,
+    save_baseline,
+)
+from common.test_utils.contracts.unit import run
+
+
+class CASABenchmarkTest(TestCase):
+    def test_compare_to_baseline_reports_cases_over_threshold(self):
+        baseline = {
+            "fast": {"time_per_call_us": 100.0, "peak_memory_bytes": 1000},
+            "slow": {"time_per_call_us": 100.0, "peak_memory_bytes": 1000},
+        }
+        results = [
+            BenchmarkResult("fast", 140.0, 1000, 0),
+            BenchmarkResult("slow", 160.0, 2000, 0),
+            BenchmarkResult("new", 1000.0, 1000, 0),
+        ]
+
+        regressions = compare_to_baseline(results, baseline, threshold=1.5)
+
+        self.assertEqual(len(regressions), 2)
+        self.assertTrue(all(regression.startswith("slow:") for regression in regressions))
+
+    def test_baseline_round_trip(self):
+        results = run_benchmarks(min_time=0, repeats=1, name_filter="history=1d")
+
+        with tempfile.TemporaryDirectory() as baseline_dir:
+            baseline_file = os.path.join(baseline_dir, "baseline.json")
+            save_baseline(results, baseline_file)
+            baseline = load_baseline(baseline_file)
+
+        self.assertEqual(
+            sorted(baseline), ["scheduled_code[DAILY_ACCRUE_INTEREST][history=1d]"]
+        )
+        self.assertEqual(compare_to_baseline(results, baseline), [])
+        for result in results:
+            self.assertGreater(result.time_per_call_us, 0)
+            self.assertGreater(result.peak_memory_bytes, 0)
+
+    def test_accrual_catches_up_on_whole_history(self):
+        casa_benchmark.CASABenchmark.setUpClass()
+        benchmark = casa_benchmark.CASABenchmark()
+        effective_date = HISTORY_START + timedelta(days=30, seconds=1)
+        mock_vault = benchmark.history_mock(30, effective_date)
+
+        run(
+            benchmark.smart_contract,
+            "scheduled_code",
+            mock_vault,
+            "DAILY_ACCRUE_INTEREST",
+            effective_date,
+        )
+
+        tracked_count = [
+            recorded_call.kwargs["amount"]
+            for recorded_call in mock_vault.make_internal_transfer_instructions.call_args_list
+            if recorded_call.kwargs["to_account_address"] == "DAILY_BALANCE_COUNT"
+        ]
+        self.assertEqual(tracked_count, [Decimal(30)])
+
+    def test_committed_baseline_covers_every_case(self):
+        CASABenchmark = casa_benchmark.CASABenchmark
+        CASABenchmark.setUpClass()
+
+        self.assertEqual(
+            sorted(load_baseline(BASELINE_FILE)),
+            sorted(casa_benchmark.benchmark_cases(CASABenchmark())),
+        )
+
+    def test_missing_baseline_fails(self):
+        with tempfile.TemporaryDirectory() as baseline_dir:
+            exit_code = main(
+                [
+                    "--baseline",
+                    os.path.join(baseline_dir, "baseline.json"),
+                    "--min-time",
+                    "0",
+                    "--repeats",
+                    "1",
+                    "--filter",
+                    "history=1d",
+                ]
+            )
+
+        self.assertEqual(exit_code, 1)
@@ -48,6 +48,13 @@ from common.test_utils.contracts.simulation.helper import (
     update_account_status_pending_closure,
 )
 
+# internal_accounts
+from internal_accounts.internal_account_shards import (
+    internal_account_shard_for_account,
+    internal_account_shard_ids,
+    internal_account_shards_param,
+)
+
 CONTRACT_FILE = "casa/contracts/casa.py"
 CONTRACT_FILES = [CONTRACT_FILE]
 DEFAULT_DIMENSIONS = BalanceDimensions()
@@ -55,6 +62,10 @@ DEFAULT_DIMENSIONS = BalanceDimensions()
 ACCRUED_INCOMING_INTEREST_DIMENSIONS = BalanceDimensions(address="ACCRUED_INCOMING_INTEREST")
 ACCRUED_INTEREST_DIMENSIONS = BalanceDimensions(address="ACCRUED_INTEREST")
 MONTHLY_MAINTENANCE_FEE_DIMENSIONS = BalanceDimensions(address="MONTHLY_MAINTENANCE_FEES")
+DAILY_BALANCE_SUM_DIMENSIONS = BalanceDimensions(address="DAILY_BALANCE_SUM")
+DAILY_BALANCE_COUNT_DIMENSIONS = BalanceDimensions(address="DAILY_BALANCE_COUNT")
+ACCRUED_INTEREST_CARRY_DIMENSIONS = BalanceDimensions(address="ACCRUED_INTEREST_CARRY")
+ACCRUED_OUTGOING_DIMENSIONS = BalanceDimensions(address="ACCRUED_OUTGOING")
 
 INTERNAL_ACCOUNT = "Internal account"
 MAIN_ACCOUNT = "Main account"
@@ -265,6 +276,236 @@ class CASATest(SimulationTestCase):
         )
         self.run_test_scenario(test_scenario)
 
+    def test_combined_interest_accrual_application(self):
+        start = default_simulation_start_date
+        end = start + relativedelta(days=2, hours=2)
+
+        test_template_params = {
+            **default_template_params,
+            'combine_daily_interest_schedules': 'true',
+        }
+
+        sub_tests = [
+            SubTest(
+                description="test base interest accrued and applied by one daily schedule",
+                events=[
+                    create_inbound_hard_settlement_instruction(
+                        "1500", start + relativedelta(hours=1), target_account_id = MAIN_ACCOUNT, internal_account_id = INTERNAL_ACCOUNT, denomination="PHP"
+                    ),
+                ],
+                expected_balances_at_ts={
+                    start
+                    + relativedelta(days=2, hours=1, seconds=1): {
+                        MAIN_ACCOUNT : [
+                            (DEFAULT_DIMENSIONS, "1506.006"),
+                            (ACCRUED_INCOMING_INTEREST_DIMENSIONS, "0"),
+                        ]
+                    },
+                },
+            ),
+        ]
+
+        test_scenario = self._get_simulation_test_scenario(
+            start=start,
+            end=end,
+            sub_tests=sub_tests,
+            template_params=test_template_params,
+        )
+        self.run_test_scenario(test_scenario)
+
+    def test_monthly_interest_application(self):
+        start = default_simulation_start_date
+        end = start + relativedelta(months=1, hours=2)
+
+        test_template_params = {
+            **default_template_params,
+            'interest_application_frequency': 'monthly',
+            'interest_application_day': '1',
+        }
+
+        sub_tests = [
+            SubTest(
+                description="test interest accrued daily but not applied before application day",
+                events=[
+                    create_inbound_hard_settlement_instruction(
+                        "1500", start + relativedelta(hours=1), target_account_id = MAIN_ACCOUNT, internal_account_id = INTERNAL_ACCOUNT, denomination="PHP"
+                    ),
+                ],
+                expected_balances_at_ts={
+                    start
+                    + relativedelta(days=2, hours=1, seconds=1): {
+                        MAIN_ACCOUNT : [
+                            (DEFAULT_DIMENSIONS, "1500"),
+                            (ACCRUED_INCOMING_INTEREST_DIMENSIONS, "6"),
+                        ]
+                    },
+                },
+            ),
+            SubTest(
+                description="test accrued interest applied on application day",
+                expected_balances_at_ts={
+                    start
+                    + relativedelta(months=1, seconds=10): {
+                        MAIN_ACCOUNT : [(ACCRUED_INCOMING_INTEREST_DIMENSIONS, "0")]
+                    },
+                },
+            ),
+        ]
+
+        test_scenario = self._get_simulation_test_scenario(
+            start=start,
+            end=end,
+            sub_tests=sub_tests,
+            template_params=test_template_params,
+        )
+        self.run_test_scenario(test_scenario)
+
+    def test_minimum_accrual_posting_amount(self):
+        start = default_simulation_start_date
+        end = start + relativedelta(days=2, hours=2)
+
+        test_template_params = {
+            **default_template_params,
+            'interest_application_frequency': 'monthly',
+            'minimum_accrual_posting_amount': '5',
+        }
+
+        sub_tests = [
+            SubTest(
+                description="test accrual below minimum is carried forward",
+                events=[
+                    create_inbound_hard_settlement_instruction(
+                        "1500", start + relativedelta(hours=1), target_account_id = MAIN_ACCOUNT, internal_account_id = INTERNAL_ACCOUNT, denomination="PHP"
+                    ),
+                ],
+                expected_balances_at_ts={
+                    start
+                    + relativedelta(days=1, hours=1, seconds=1): {
+                        MAIN_ACCOUNT : [
+                            (ACCRUED_INCOMING_INTEREST_DIMENSIONS, "0"),
+                            (ACCRUED_INTEREST_CARRY_DIMENSIONS, "3"),
+                        ]
+                    },
+                },
+            ),
+            SubTest(
+                description="test carried accrual posted once total reaches minimum",
+                expected_balances_at_ts={
+                    start
+                    + relativedelta(days=2, hours=1, seconds=1): {
+                        MAIN_ACCOUNT : [
+                            (ACCRUED_INCOMING_INTEREST_DIMENSIONS, "6"),
+                            (ACCRUED_INTEREST_CARRY_DIMENSIONS, "0"),
+                        ]
+                    },
+                },
+            ),
+        ]
+
+        test_scenario = self._get_simulation_test_scenario(
+            start=start,
+            end=end,
+            sub_tests=sub_tests,
+            template_params=test_template_params,
+        )
+        self.run_test_scenario(test_scenario)
+
+    def test_running_state_derived_parameters(self):
+        start = default_simulation_start_date
+        end = start + relativedelta(days=2, hours=2)
+
+        test_instance_params = {
+            **default_instance_params,
+            'minimum_balance_maintenance_fee_waive': '2000',
+        }
+
+        sub_tests = [
+            SubTest(
+                description="test month to date mean balance and projected fee",
+                events=[
+                    create_inbound_hard_settlement_instruction(
+                        "1500", start + relativedelta(hours=1), target_account_id = MAIN_ACCOUNT, internal_account_id = INTERNAL_ACCOUNT, denomination="PHP"
+                    ),
+                ],
+                expected_derived_parameters=[
+                    ExpectedDerivedParameter(
+                        timestamp=start + relativedelta(days=2, hours=1),
+                        account_id=MAIN_ACCOUNT,
+                        name="month_to_date_mean_balance",
+                        # The creation day's zero balance, 1500 and 1500 plus accrued interest
+                        value="1001.00",
+                    ),
+                    ExpectedDerivedParameter(
+                        timestamp=start + relativedelta(days=2, hours=1),
+                        account_id=MAIN_ACCOUNT,
+                        name="projected_maintenance_fee_tier",
+                        value="flat",
+                    ),
+                    ExpectedDerivedParameter(
+                        timestamp=start + relativedelta(days=2, hours=1),
+                        account_id=MAIN_ACCOUNT,
+                        name="projected_maintenance_fee",
+                        value="50",
+                    ),
+                    ExpectedDerivedParameter(
+                        timestamp=start + relativedelta(days=2, hours=1),
+                        account_id=MAIN_ACCOUNT,
+                        name="accrued_interest_unapplied",
+                        value="0",
+                    ),
+                ],
+            ),
+        ]
+
+        test_scenario = self._get_simulation_test_scenario(
+            start=start,
+            end=end,
+            sub_tests=sub_tests,
+            instance_params=test_instance_params,
+        )
+        self.run_test_scenario(test_scenario)
+
+    def test_sharded_internal_account_accrual(self):
+        start = default_simulation_start_date
+        end = start + relativedelta(days=1, hours=2)
+
+        shard_ids = internal_account_shard_ids(INTERNAL_ACCOUNT, 2)
+        account_shard = internal_account_shard_for_account(MAIN_ACCOUNT, shard_ids)
+        other_shard = [shard_id for shard_id in shard_ids if shard_id != account_shard][0]
+        test_template_params = {
+            **default_template_params,
+            'internal_account_shards': internal_account_shards_param(shard_ids),
+        }
+
+        sub_tests = [
+            SubTest(
+                description="test interest accrued and applied against the account's shard only",
+                events=[
+                    create_inbound_hard_settlement_instruction(
+                        "1500", start + relativedelta(hours=1), target_account_id = MAIN_ACCOUNT, internal_account_id = INTERNAL_ACCOUNT, denomination="PHP"
+                    ),
+                ],
+                expected_balances_at_ts={
+                    start
+                    + relativedelta(days=1, hours=1): {
+                        MAIN_ACCOUNT : [(DEFAULT_DIMENSIONS, "1503")],
+                        account_shard : [(ACCRUED_OUTGOING_DIMENSIONS, "-3")],
+                        other_shard : [(ACCRUED_OUTGOING_DIMENSIONS, "0")],
+                        INTERNAL_ACCOUNT : [(ACCRUED_OUTGOING_DIMENSIONS, "0")],
+                    },
+                },
+            ),
+        ]
+
+        test_scenario = self._get_simulation_test_scenario(
+            start=start,
+            end=end,
+            sub_tests=sub_tests,
+            template_params=test_template_params,
+            internal_accounts=[INTERNAL_ACCOUNT, *shard_ids],
+        )
+        self.run_test_scenario(test_scenario)
+
     def test_flat_maintenance_fee(self):
         start = default_simulation_start_date
         end = start + relativedelta(months=2, hours=2)
@@ -307,6 +548,49 @@ class CASATest(SimulationTestCase):
         )
         self.run_test_scenario(test_scenario)
 
+    def test_daily_balance_sum_tracking(self):
+        start = default_simulation_start_date
+        end = start + relativedelta(months=1, hours=2)
+
+        sub_tests = [
+            SubTest(
+                description="test daily balance sum updated by daily accrual",
+                events=[
+                    create_inbound_hard_settlement_instruction(
+                        "1500", start + relativedelta(hours=1), target_account_id = MAIN_ACCOUNT, internal_account_id = INTERNAL_ACCOUNT, denomination="PHP"
+                    ),
+                ],
+                expected_balances_at_ts={
+                    start
+                    + relativedelta(days=2, hours=1): {
+                        MAIN_ACCOUNT : [
+                            (DAILY_BALANCE_SUM_DIMENSIONS, "3003"),
+                            (DAILY_BALANCE_COUNT_DIMENSIONS, "3"),
+                        ]
+                    },
+                },
+            ),
+            SubTest(
+                description="test daily balance sum reset by monthly maintenance fee",
+                expected_balances_at_ts={
+                    start
+                    + relativedelta(months=1): {
+                        MAIN_ACCOUNT : [
+                            (DAILY_BALANCE_SUM_DIMENSIONS, "0"),
+                            (DAILY_BALANCE_COUNT_DIMENSIONS, "0"),
+                        ]
+                    },
+                },
+            ),
+        ]
+
+        test_scenario = self._get_simulation_test_scenario(
+            start=start,
+            end=end,
+            sub_tests=sub_tests,
+        )
+        self.run_test_scenario(test_scenario)
+
     def test_tier_maintenance_fee(self):
         test_instance_params = {
             'base_interest_rate': '.002',
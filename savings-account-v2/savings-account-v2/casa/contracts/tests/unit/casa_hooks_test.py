@@ -0,0 +1,539 @@
+# Copyright @ 2020 Thought Machine Group Limited. All rights reserved.
+# standard libs
+from datetime import datetime
+from decimal import Decimal
+
+# common
+from common.test_utils.contracts.unit.common import ContractTest
+from common.test_utils.contracts.unit.types_extension import (
+    DEFAULT_ADDRESS,
+    InvalidContractParameter,
+    Phase,
+    Rejected,
+    RejectedReason,
+    Tside,
+    UnionItemValue,
+)
+
+# internal_accounts
+from internal_accounts.internal_account_shards import (
+    internal_account_shard_for_account,
+    internal_account_shard_ids,
+)
+
+CONTRACT_FILE = "casa/contracts/casa.py"
+DEFAULT_DATE = datetime(2019, 1, 1)
+DEFAULT_DENOMINATION = "PHP"
+
+DEFAULT_PARAMETERS = {
+    "denomination": DEFAULT_DENOMINATION,
+    "fee_tiers": '{"tier1": "135", "tier2": "98", "tier3": "45", "tier4": "35", "tier5": "3"}',
+    "fee_tier_ranges": '{"tier1": {"min": 1000, "max": 2999},'
+    '"tier2": {"min": 3000, "max": 4999},'
+    '"tier3": {"min": 5000, "max": 7499},'
+    '"tier4": {"min": 7500, "max": 14999},'
+    '"tier5": {"min": 15000, "max": 20000}}',
+    "internal_account": "Internal account",
+    "internal_account_shards": "[]",
+    "base_interest_rate": Decimal("0.002"),
+    "bonus_interest_rate": Decimal("0.005"),
+    "bonus_interest_amount_threshold": Decimal("5000"),
+    "minimum_balance_maintenance_fee_waive": Decimal("1000"),
+    "flat_fee": Decimal("50"),
+    "minimum_accrual_posting_amount": Decimal("0"),
+    "combine_daily_interest_schedules": UnionItemValue(key="false"),
+    "interest_application_frequency": UnionItemValue(key="daily"),
+    "interest_application_day": Decimal("1"),
+    "schedule_spread_window": Decimal("0"),
+}
+
+
+class CASAHooksTest(ContractTest):
+    contract_file = CONTRACT_FILE
+    side = Tside.LIABILITY
+
+    def create_casa_mock(
+        self,
+        balances=None,
+        creation_date=DEFAULT_DATE,
+        parameters=None,
+        balance_defs=None,
+        **kwargs,
+    ):
+        """
+        Creates a mock vault whose balance fetchers all observe `balances`
+        :param balances: dict of address to committed net balance
+        :param parameters: parameter values overriding DEFAULT_PARAMETERS
+        :param balance_defs: further balances observed, as per `init_balances`
+        """
+        observation = self.init_balances_observation(
+            dt=creation_date,
+            balance_defs=[
+                {"address": address, "denomination": DEFAULT_DENOMINATION, "net": net}
+                for address, net in (balances or {}).items()
+            ]
+            + (balance_defs or []),
+        )
+        return self.create_mock(
+            parameter_ts=self.param_map_to_timeseries(
+                {
+                    name: {"value": value}
+                    for name, value in {**DEFAULT_PARAMETERS, **(parameters or {})}.items()
+                },
+                creation_date,
+            ),
+            creation_date=creation_date,
+            balances_observation_fetchers_mapping={
+                fetcher_id: observation
+                for fetcher_id in (
+                    "EFFECTIVE_DATE_INTEREST_BALANCES",
+                    "EFFECTIVE_DATE_FEE_BALANCES",
+                    "LIVE_DEFAULT_BALANCES",
+                    "LIVE_RUNNING_STATE_BALANCES",
+                )
+            },
+            **kwargs,
+        )
+
+    def posted_instructions(self, mock_vault):
+        """
+        The client transaction ids of the instructions in the batch the hook instructed, which the
+        mock vault returns in place of posting instructions
+        """
+        mock_vault.instruct_posting_batch.assert_called_once()
+        return mock_vault.instruct_posting_batch.call_args.kwargs["posting_instructions"]
+
+    def tracking_amounts(self, mock_vault, event):
+        """
+        Each tracking address updated by `event` to the amount it was updated by
+        """
+        amounts = {}
+        for recorded_call in mock_vault.make_internal_transfer_instructions.call_args_list:
+            kwargs = recorded_call.kwargs
+            if kwargs["instruction_details"]["event"] != event:
+                continue
+            if kwargs["from_account_address"] == "INTERNAL_CONTRA":
+                amounts[kwargs["to_account_address"]] = kwargs["amount"]
+            else:
+                amounts[kwargs["from_account_address"]] = -kwargs["amount"]
+        return amounts
+
+
+class PrePostingCodeTest(CASAHooksTest):
+    def posting_batch(self, *amounts):
+        """
+        A batch with a DEFAULT address posting per amount, positive amounts being debits and
+        negative amounts credits
+        """
+        return self.mock_posting_instruction_batch(
+            posting_instructions=[
+                self.mock_posting_instruction(
+                    amount=abs(Decimal(amount)),
+                    credit=Decimal(amount) < 0,
+                    denomination=DEFAULT_DENOMINATION,
+                )
+                for amount in amounts
+            ]
+        )
+
+    def test_credit_only_batch_accepted_without_fetching_balances(self):
+        mock_vault = self.create_casa_mock(balances={DEFAULT_ADDRESS: "0"})
+
+        result = self.run_function(
+            "pre_posting_code", mock_vault, self.posting_batch("-100", "-50"), DEFAULT_DATE
+        )
+
+        self.assertIsNone(result)
+        mock_vault.get_balances_observation.assert_not_called()
+
+    def test_debit_within_balance_accepted(self):
+        mock_vault = self.create_casa_mock(balances={DEFAULT_ADDRESS: "100"})
+
+        result = self.run_function(
+            "pre_posting_code", mock_vault, self.posting_batch("100"), DEFAULT_DATE
+        )
+
+        self.assertIsNone(result)
+        mock_vault.get_balances_observation.assert_called_once()
+
+    def test_mixed_batch_within_balance_accepted(self):
+        mock_vault = self.create_casa_mock(balances={DEFAULT_ADDRESS: "100"})
+
+        result = self.run_function(
+            "pre_posting_code", mock_vault, self.posting_batch("60", "-50", "40"), DEFAULT_DATE
+        )
+
+        self.assertIsNone(result)
+
+    def test_debit_over_balance_rejected(self):
+        mock_vault = self.create_casa_mock(balances={DEFAULT_ADDRESS: "100"})
+
+        with self.assertRaises(Rejected) as context:
+            self.run_function(
+                "pre_posting_code", mock_vault, self.posting_batch("100.01"), DEFAULT_DATE
+            )
+
+        self.assertEqual(context.exception.reason_code, RejectedReason.INSUFFICIENT_FUNDS)
+
+    def test_credits_do_not_offset_debits_in_same_batch(self):
+        mock_vault = self.create_casa_mock(balances={DEFAULT_ADDRESS: "60"})
+
+        with self.assertRaises(Rejected):
+            self.run_function(
+                "pre_posting_code", mock_vault, self.posting_batch("100", "-50"), DEFAULT_DATE
+            )
+
+    def test_pending_incoming_funds_not_available(self):
+        mock_vault = self.create_casa_mock(
+            balances={DEFAULT_ADDRESS: "60"},
+            balance_defs=[
+                {
+                    "address": DEFAULT_ADDRESS,
+                    "denomination": DEFAULT_DENOMINATION,
+                    "phase": Phase.PENDING_IN,
+                    "net": "100",
+                }
+            ],
+        )
+
+        with self.assertRaises(Rejected):
+            self.run_function(
+                "pre_posting_code", mock_vault, self.posting_batch("100"), DEFAULT_DATE
+            )
+
+    def test_pending_outgoing_funds_reduce_available_balance(self):
+        mock_vault = self.create_casa_mock(
+            balances={DEFAULT_ADDRESS: "100"},
+            balance_defs=[
+                {
+                    "address": DEFAULT_ADDRESS,
+                    "denomination": DEFAULT_DENOMINATION,
+                    "phase": Phase.PENDING_OUT,
+                    "net": "-50",
+                }
+            ],
+        )
+
+        with self.assertRaises(Rejected):
+            self.run_function(
+                "pre_posting_code", mock_vault, self.posting_batch("60"), DEFAULT_DATE
+            )
+
+
+class FeeTierTest(CASAHooksTest):
+    def fee_tier_for_balance(self, balance, fee_tier_ranges):
+        return self.run_function(
+            "_fee_tier_for_balance",
+            self.create_casa_mock(),
+            Decimal(balance),
+            DEFAULT_PARAMETERS["fee_tiers"],
+            fee_tier_ranges,
+        )
+
+    def test_fee_tier_lookup_at_range_boundaries(self):
+        expected_tiers = {
+            "999.99": (None, Decimal("0")),
+            "1000": ("tier1", Decimal("135")),
+            "2999": ("tier1", Decimal("135")),
+            # Between tier1's max and tier2's min
+            "2999.5": (None, Decimal("0")),
+            "3000": ("tier2", Decimal("98")),
+            "7500": ("tier4", Decimal("35")),
+            "20000": ("tier5", Decimal("3")),
+            "20000.01": (None, Decimal("0")),
+        }
+
+        for balance, expected_tier in expected_tiers.items():
+            with self.subTest(balance=balance):
+                self.assertEqual(
+                    self.fee_tier_for_balance(balance, DEFAULT_PARAMETERS["fee_tier_ranges"]),
+                    expected_tier,
+                )
+
+    def test_valid_fee_tier_change_accepted(self):
+        parameters = {
+            "fee_tier_ranges": '{"tier2": {"min": 3000, "max": 4999},'
+            '"tier1": {"min": 1000, "max": 2999}}'
+        }
+
+        self.assertEqual(
+            self.run_function(
+                "pre_parameter_change_code", self.create_casa_mock(), parameters, DEFAULT_DATE
+            ),
+            parameters,
+        )
+
+    def test_invalid_fee_tier_changes_rejected(self):
+        invalid_parameters = {
+            "overlapping": {
+                "fee_tier_ranges": '{"tier1": {"min": 1000, "max": 3000},'
+                '"tier2": {"min": 3000, "max": 4999}}'
+            },
+            "min above max": {"fee_tier_ranges": '{"tier1": {"min": 2999, "max": 1000}}'},
+            "missing max": {"fee_tier_ranges": '{"tier1": {"min": 1000}}'},
+            "no fee for range": {"fee_tier_ranges": '{"tier6": {"min": 1000, "max": 2999}}'},
+            "fee removed": {"fee_tiers": '{"tier1": "135"}'},
+        }
+
+        for description, parameters in invalid_parameters.items():
+            with self.subTest(description):
+                with self.assertRaises(InvalidContractParameter):
+                    self.run_function(
+                        "pre_parameter_change_code",
+                        self.create_casa_mock(),
+                        parameters,
+                        DEFAULT_DATE,
+                    )
+
+    def test_unvalidated_overlapping_ranges_charge_last_match(self):
+        mock_vault = self.create_casa_mock(
+            balances={
+                DEFAULT_ADDRESS: "3000",
+                "DAILY_BALANCE_SUM": "3000",
+                "DAILY_BALANCE_COUNT": "1",
+            },
+            parameters={
+                "flat_fee": Decimal("0"),
+                "minimum_balance_maintenance_fee_waive": Decimal("5000"),
+                "fee_tier_ranges": '{"tier1": {"min": 1000, "max": 3000},'
+                '"tier2": {"min": 3000, "max": 4999}}',
+            },
+        )
+
+        self.run_function(
+            "scheduled_code", mock_vault, "MONTHLY_MAINTENANCE_FEE", datetime(2019, 2, 1)
+        )
+
+        # Template parameter changes bypass validation, so the last matching tier is charged
+        self.assertEqual(
+            mock_vault.make_internal_transfer_instructions.call_args.kwargs["amount"],
+            Decimal("98"),
+        )
+
+
+class MonthlyMaintenanceFeeTest(CASAHooksTest):
+    def test_mean_balance_divides_by_tracked_sample_count(self):
+        # 20 samples averaging 1500 since the last fee, although a month has 31 days
+        mock_vault = self.create_casa_mock(
+            balances={
+                DEFAULT_ADDRESS: "1500",
+                "DAILY_BALANCE_SUM": "30000",
+                "DAILY_BALANCE_COUNT": "20",
+            }
+        )
+
+        self.run_function(
+            "scheduled_code", mock_vault, "MONTHLY_MAINTENANCE_FEE", datetime(2019, 2, 1)
+        )
+
+        self.assertEqual(
+            self.posted_instructions(mock_vault),
+            [
+                "RESET_DAILY_BALANCE_SUMMOCK_HOOK_PHP",
+                "RESET_DAILY_BALANCE_COUNTMOCK_HOOK_PHP",
+            ],
+        )
+        self.assertEqual(
+            self.tracking_amounts(mock_vault, "RESET_DAILY_BALANCE_SUM"),
+            {"DAILY_BALANCE_SUM": Decimal("-30000"), "DAILY_BALANCE_COUNT": Decimal("-20")},
+        )
+
+    def test_fee_charged_when_mean_below_waive_threshold(self):
+        mock_vault = self.create_casa_mock(
+            balances={
+                DEFAULT_ADDRESS: "1500",
+                "DAILY_BALANCE_SUM": "9000",
+                "DAILY_BALANCE_COUNT": "10",
+            }
+        )
+
+        self.run_function(
+            "scheduled_code", mock_vault, "MONTHLY_MAINTENANCE_FEE", datetime(2019, 2, 1)
+        )
+
+        self.assertIn("APPLY_FEEMOCK_HOOK_PHP", self.posted_instructions(mock_vault))
+
+    def test_mean_balance_without_samples_uses_effective_balance(self):
+        # e.g. an account upgraded from a version that did not track daily balances
+        mock_vault = self.create_casa_mock(balances={DEFAULT_ADDRESS: "1500"})
+
+        self.run_function(
+            "scheduled_code", mock_vault, "MONTHLY_MAINTENANCE_FEE", datetime(2019, 2, 1)
+        )
+
+        mock_vault.instruct_posting_batch.assert_not_called()
+
+
+class DailyAccrueInterestTest(CASAHooksTest):
+    def test_daily_balance_tracked_with_sample_count(self):
+        mock_vault = self.create_casa_mock(balances={DEFAULT_ADDRESS: "1500"})
+
+        self.run_function(
+            "scheduled_code", mock_vault, "DAILY_ACCRUE_INTEREST", datetime(2019, 1, 2, 0, 0, 1)
+        )
+
+        self.assertEqual(
+            self.tracking_amounts(mock_vault, "TRACK_DAILY_BALANCE"),
+            {"DAILY_BALANCE_SUM": Decimal("1500"), "DAILY_BALANCE_COUNT": Decimal("1")},
+        )
+
+    def test_missed_accruals_before_last_fee_not_tracked(self):
+        # Schedules were paused from 31 January until 3 February, over the fee on 1 February
+        balance_history = [
+            (timestamp, balances)
+            for net, dt in (
+                ("1000", DEFAULT_DATE),
+                ("2000", datetime(2019, 1, 31, 12)),
+                ("3000", datetime(2019, 2, 2, 12)),
+            )
+            for timestamp, balances in self.init_balances(
+                dt=dt,
+                balance_defs=[{"denomination": DEFAULT_DENOMINATION, "net": net}],
+            )
+        ]
+        mock_vault = self.create_casa_mock(
+            balances={DEFAULT_ADDRESS: "3000"},
+            balances_interval_fetchers_mapping={"ACCRUAL_CATCH_UP_BALANCES": balance_history},
+            DAILY_ACCRUE_INTEREST=datetime(2019, 1, 30, 0, 0, 1),
+            MONTHLY_MAINTENANCE_FEE=datetime(2019, 2, 1),
+        )
+
+        self.run_function(
+            "scheduled_code", mock_vault, "DAILY_ACCRUE_INTEREST", datetime(2019, 2, 3, 0, 0, 1)
+        )
+
+        # 31 January's balance of 1000 belonged to the period the fee already charged
+        self.assertEqual(
+            self.tracking_amounts(mock_vault, "TRACK_DAILY_BALANCE"),
+            {"DAILY_BALANCE_SUM": Decimal("7000"), "DAILY_BALANCE_COUNT": Decimal("3")},
+        )
+        accrual = [
+            recorded_call.kwargs
+            for recorded_call in mock_vault.make_internal_transfer_instructions.call_args_list
+            if recorded_call.kwargs["instruction_details"]["event"] == "ACCRUE_INTEREST"
+        ]
+        self.assertEqual(len(accrual), 1)
+        self.assertEqual(
+            accrual[0]["instruction_details"]["description"],
+            "Daily interest accrued at 0.002 on end of day balances of 1000, 2000, 2000, 3000 "
+            "for 4 days",
+        )
+
+    def test_missed_accruals_tracked_without_fee_execution(self):
+        balance_history = self.init_balances(
+            dt=DEFAULT_DATE, balance_defs=[{"denomination": DEFAULT_DENOMINATION, "net": "1000"}]
+        )
+        mock_vault = self.create_casa_mock(
+            balances={DEFAULT_ADDRESS: "1000"},
+            balances_interval_fetchers_mapping={"ACCRUAL_CATCH_UP_BALANCES": balance_history},
+            DAILY_ACCRUE_INTEREST=datetime(2019, 1, 2, 0, 0, 1),
+        )
+
+        self.run_function(
+            "scheduled_code", mock_vault, "DAILY_ACCRUE_INTEREST", datetime(2019, 1, 5, 0, 0, 1)
+        )
+
+        self.assertEqual(
+            self.tracking_amounts(mock_vault, "TRACK_DAILY_BALANCE"),
+            {"DAILY_BALANCE_SUM": Decimal("3000"), "DAILY_BALANCE_COUNT": Decimal("3")},
+        )
+
+
+class DerivedParametersTest(CASAHooksTest):
+    def derived_parameters(self, balances):
+        mock_vault = self.create_casa_mock(balances=balances)
+        return self.run_function("derived_parameters", mock_vault, datetime(2019, 1, 20, 1))
+
+    def test_mean_balance_divides_by_tracked_sample_count(self):
+        derived_parameters = self.derived_parameters(
+            {DEFAULT_ADDRESS: "500", "DAILY_BALANCE_SUM": "3003", "DAILY_BALANCE_COUNT": "3"}
+        )
+
+        self.assertEqual(derived_parameters["month_to_date_mean_balance"], Decimal("1001.00"))
+        self.assertEqual(derived_parameters["projected_maintenance_fee_tier"], "waived")
+
+    def test_projected_fee_matches_fee_charged(self):
+        balances = {
+            "without samples": {DEFAULT_ADDRESS: "5000"},
+            "mean above waive threshold": {
+                DEFAULT_ADDRESS: "500",
+                "DAILY_BALANCE_SUM": "2400",
+                "DAILY_BALANCE_COUNT": "2",
+            },
+            "mean below waive threshold": {
+                DEFAULT_ADDRESS: "5000",
+                "DAILY_BALANCE_SUM": "1800",
+                "DAILY_BALANCE_COUNT": "2",
+            },
+        }
+
+        for description, account_balances in balances.items():
+            with self.subTest(description):
+                projected_fee = self.derived_parameters(account_balances)[
+                    "projected_maintenance_fee"
+                ]
+                mock_vault = self.create_casa_mock(balances=account_balances)
+                self.run_function(
+                    "scheduled_code", mock_vault, "MONTHLY_MAINTENANCE_FEE", datetime(2019, 2, 1)
+                )
+                charged_fees = [
+                    recorded_call.kwargs["amount"]
+                    for recorded_call in (
+                        mock_vault.make_internal_transfer_instructions.call_args_list
+                    )
+                    if recorded_call.kwargs["client_transaction_id"] == "APPLY_FEEMOCK_HOOK_PHP"
+                ]
+
+                self.assertEqual(charged_fees or [Decimal("0")], [projected_fee])
+
+
+class InternalAccountShardTest(CASAHooksTest):
+    def accrual_internal_account(self, internal_account_shards):
+        mock_vault = self.create_casa_mock(
+            balances={DEFAULT_ADDRESS: "1500"},
+            parameters={"internal_account_shards": internal_account_shards},
+        )
+
+        self.run_function(
+            "scheduled_code", mock_vault, "DAILY_ACCRUE_INTEREST", datetime(2019, 1, 2, 0, 0, 1)
+        )
+
+        accrual = [
+            recorded_call.kwargs
+            for recorded_call in mock_vault.make_internal_transfer_instructions.call_args_list
+            if recorded_call.kwargs["instruction_details"]["event"] == "ACCRUE_INTEREST"
+        ]
+        self.assertEqual(len(accrual), 1)
+        return accrual[0]["from_account_id"]
+
+    def test_accrual_posted_against_account_shard(self):
+        shard_ids = internal_account_shard_ids("Internal account", 3)
+
+        internal_account = self.accrual_internal_account(
+            '["Internal account_SHARD_0", "Internal account_SHARD_1", '
+            '"Internal account_SHARD_2"]'
+        )
+
+        self.assertEqual(
+            internal_account, internal_account_shard_for_account("Main account", shard_ids)
+        )
+
+    def test_invalid_shards_use_internal_account(self):
+        invalid_shards = {
+            "empty list": "[]",
+            "not a list": '"Internal account_SHARD_0"',
+            "object": '{"shard": "Internal account_SHARD_0"}',
+            "number": "2",
+            "non string ID": '["Internal account_SHARD_0", 1]',
+            "empty ID": '["Internal account_SHARD_0", ""]',
+            "malformed JSON": '["Internal account_SHARD_0"',
+            "unquoted ID": "[abc",
+            "null": "null",
+            "boolean": "true",
+        }
+
+        for description, internal_account_shards in invalid_shards.items():
+            with self.subTest(description):
+                self.assertEqual(
+                    self.accrual_internal_account(internal_account_shards), "Internal account"
+                )
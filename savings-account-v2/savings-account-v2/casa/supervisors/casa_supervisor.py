@@ -0,0 +1,163 @@
+# Copyright @ 2020 Thought Machine Group Limited. All rights reserved.
+"""
+Optional plan supervisor for customers holding several CASA accounts. One plan-level daily
+schedule accrues and applies interest for every supervised CASA account, instead of each
+account running its own daily schedule.
+
+Supervised CASA accounts must set combine_daily_interest_schedules to true, as only their
+DAILY_ACCRUE_AND_APPLY_INTEREST event is overridden by the supervisor. The overridden event only
+produces the hook directives the supervisor instructs when it runs with the plan event, so an
+account joining the plan has its interest and fee schedules moved to the plan's time of day, with
+the fee one second before the interest as on the account's own schedules. That is done once, on
+the first plan execution that finds no directives from the account.
+
+The plan's time of day is offset within the plan's schedule_spread_window by a hash of the plan
+ID, as each CASA account offsets its schedules by a hash of its account ID.
+"""
+api = "3.9.0"
+version = "1.0.0"
+
+CASA_SMART_CONTRACT_VERSION_ID = "1000"
+SUPERVISEE_INTEREST_EVENT = "DAILY_ACCRUE_AND_APPLY_INTEREST"
+SUPERVISEE_FEE_EVENT = "MONTHLY_MAINTENANCE_FEE"
+
+parameters = [
+    Parameter(
+        name="schedule_spread_window",
+        shape=NumberShape(min_value=0, max_value=720, step=1),
+        level=Level.TEMPLATE,
+        description="Window in minutes after midnight across which plan schedules are "
+        "spread. Each plan gets a fixed offset derived from its plan ID.",
+        display_name="Schedule spread window (minutes)",
+        default_value=Decimal(0),
+    ),
+]
+
+supervised_smart_contracts = [
+    SmartContractDescriptor(
+        alias="casa", smart_contract_version_id=CASA_SMART_CONTRACT_VERSION_ID
+    ),
+]
+
+event_types = [
+    EventType(
+        name="PLAN_ACCRUE_AND_APPLY_INTEREST",
+        overrides_event_types=[
+            ("casa", SUPERVISEE_INTEREST_EVENT),
+        ],
+    ),
+]
+
+
+@requires(parameters=True)
+def execution_schedules():
+    offset = _schedule_offset(vault)
+    return [
+        ("PLAN_ACCRUE_AND_APPLY_INTEREST", _time_of_day(offset + 1)),
+    ]
+
+
+@requires(
+    event_type="PLAN_ACCRUE_AND_APPLY_INTEREST",
+    data_scope="all",
+    supervisee_hook_directives="all",
+    parameters=True,
+)
+def scheduled_code(event_type, effective_date):
+    if event_type == "PLAN_ACCRUE_AND_APPLY_INTEREST":
+        offset = _schedule_offset(vault)
+        for supervisee in _get_supervisees_for_alias(vault, "casa"):
+            hook_directives = supervisee.get_hook_directives()
+            if hook_directives is None:
+                _align_supervisee_schedules(supervisee, offset)
+            else:
+                _instruct_supervisee_posting_batches(
+                    supervisee, hook_directives, effective_date
+                )
+
+
+def _instruct_supervisee_posting_batches(supervisee, hook_directives, effective_date):
+    """
+    Instructs the posting batches the supervisee's overridden scheduled_code produced, as the
+    supervisee no longer runs the event itself.
+    :param supervisee: vault, supervisee vault object
+    :param hook_directives: HookDirectives, the directives the supervisee's event produced
+    :param effective_date: datetime, the supervisor event's effective date
+    """
+    for directive in hook_directives.posting_instruction_batch_directives or []:
+        pib = directive.posting_instruction_batch
+        supervisee.instruct_posting_batch(
+            posting_instructions=pib,
+            effective_date=effective_date,
+            client_batch_id=pib.client_batch_id,
+            batch_details=pib.batch_details,
+        )
+
+
+def _align_supervisee_schedules(supervisee, offset):
+    """
+    Moves the supervisee's interest schedule to the plan's time of day, so that its overridden
+    event runs with the plan event, and its fee schedule to the second before, so that the fee
+    still closes the month before the day's balance is added to the new month's mean.
+    :param supervisee: vault, supervisee vault object
+    :param offset: int, the plan's offset in seconds after midnight
+    """
+    supervisee.update_event_type(
+        event_type=SUPERVISEE_FEE_EVENT,
+        schedule=EventTypeSchedule(
+            day=str(supervisee.get_account_creation_date().day), **_time_of_day(offset)
+        ),
+    )
+    supervisee.update_event_type(
+        event_type=SUPERVISEE_INTEREST_EVENT,
+        schedule=EventTypeSchedule(**_time_of_day(offset + 1)),
+    )
+
+
+def _schedule_offset(vault):
+    """
+    Seconds after midnight at which the plan's schedules start, so that plans are spread across
+    schedule_spread_window instead of all firing at once.
+    :param vault: vault, supervisor vault object
+    :return: int, the offset in seconds
+    """
+    window = int(vault.get_parameter_timeseries(name="schedule_spread_window").latest()) * 60
+    if window <= 0:
+        return 0
+    return _plan_hash(vault.plan_id) % window
+
+
+def _plan_hash(plan_id):
+    """
+    32-bit FNV-1a hash of a plan ID, as CASA's _account_hash. The builtin hash() is salted per
+    process, so it would give a plan a different value on every execution.
+    """
+    plan_hash = 2166136261
+    for character in plan_id:
+        plan_hash = ((plan_hash ^ ord(character)) * 16777619) % 4294967296
+    return plan_hash
+
+
+def _time_of_day(seconds):
+    return {
+        "hour": str(seconds // 3600),
+        "minute": str(seconds // 60 % 60),
+        "second": str(seconds % 60),
+    }
+
+
+def _get_supervisees_for_alias(vault, alias):
+    """
+    Returns a list of supervisee vault objects for the given alias, ordered by account creation date
+    :param vault: vault, supervisor vault object
+    :param alias: str, the supervisee alias to filter for
+    :return: list, supervisee vault objects for given alias, ordered by account creation date
+    """
+    return sorted(
+        [
+            supervisee
+            for supervisee in vault.supervisees.values()
+            if supervisee.get_alias() == alias
+        ],
+        key=lambda supervisee: supervisee.get_account_creation_date(),
+    )
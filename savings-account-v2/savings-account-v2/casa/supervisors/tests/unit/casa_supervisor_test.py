@@ -0,0 +1,276 @@
+# Copyright @ 2020 Thought Machine Group Limited. All rights reserved.
+# standard libs
+from datetime import datetime
+from decimal import Decimal
+
+# common
+from common.test_utils.contracts.unit import run as run_contract
+from common.test_utils.contracts.unit.common import ContractTest
+from common.test_utils.contracts.unit.supervisor.common import (
+    SupervisorContractTest,
+    create_hook_directive,
+    create_posting_instruction_batch_directive,
+)
+from common.test_utils.contracts.unit.supervisor.types_extension import (
+    PostingInstructionBatch,
+    PostingInstructionBatchDirective,
+    Tside,
+)
+from common.test_utils.contracts.unit.types_extension import UnionItemValue
+
+# casa
+from casa.contracts.tests.unit.casa_hooks_test import DEFAULT_PARAMETERS
+
+SUPERVISOR_CONTRACT_FILE = "casa/supervisors/casa_supervisor.py"
+CASA_CONTRACT_FILE = "casa/contracts/casa.py"
+DEFAULT_DATE = datetime(2019, 1, 10, 0, 0, 1)
+CASA_BALANCE_FETCHERS = (
+    "EFFECTIVE_DATE_INTEREST_BALANCES",
+    "EFFECTIVE_DATE_FEE_BALANCES",
+    "LIVE_DEFAULT_BALANCES",
+    "LIVE_RUNNING_STATE_BALANCES",
+)
+
+
+class CASASupervisorTest(SupervisorContractTest):
+    contract_files = {
+        "supervisor": SUPERVISOR_CONTRACT_FILE,
+        "casa": CASA_CONTRACT_FILE,
+    }
+
+    def create_plan_mock(self, schedule_spread_window=Decimal("0"), **kwargs):
+        mock_vault = self.create_supervisor_mock(**kwargs)
+        mock_vault.get_parameter_timeseries.return_value.latest.return_value = (
+            schedule_spread_window
+        )
+        return mock_vault
+
+    def create_casa_supervisee_mock(self, account_id, creation_date=datetime(2019, 1, 1)):
+        """
+        Creates a supervisee mock that the CASA contract's own hooks can run against, with its
+        interest schedules combined as the plan requires
+        """
+        casa_test = ContractTest()
+        casa_test.side = Tside.LIABILITY
+        observation = casa_test.init_balances_observation(
+            dt=creation_date,
+            balance_defs=[{"address": "DEFAULT", "denomination": "PHP", "net": "1500"}],
+        )
+        return self.create_supervisee_mock(
+            alias="casa",
+            account_id=account_id,
+            creation_date=creation_date,
+            parameter_ts=casa_test.param_map_to_timeseries(
+                {
+                    name: {"value": value}
+                    for name, value in {
+                        **DEFAULT_PARAMETERS,
+                        "combine_daily_interest_schedules": UnionItemValue(key="true"),
+                    }.items()
+                },
+                creation_date,
+            ),
+            balances_observation_fetchers_mapping={
+                fetcher_id: observation for fetcher_id in CASA_BALANCE_FETCHERS
+            },
+        )
+
+    def casa_hook_directives(self, account_id, effective_date):
+        """
+        The hook directives the CASA contract's DAILY_ACCRUE_AND_APPLY_INTEREST produces for a
+        supervisee, as the supervisor receives them when the overridden event runs with its own
+        """
+        casa_vault = self.create_casa_supervisee_mock(account_id)
+        run_contract(
+            self.smart_contracts["casa"],
+            "scheduled_code",
+            casa_vault,
+            "DAILY_ACCRUE_AND_APPLY_INTEREST",
+            effective_date,
+        )
+        return create_hook_directive(
+            posting_instruction_batch_directives=[
+                PostingInstructionBatchDirective(
+                    posting_instruction_batch=PostingInstructionBatch(
+                        posting_instructions=recorded_call.kwargs["posting_instructions"],
+                        client_batch_id=recorded_call.kwargs["client_batch_id"],
+                        batch_details=recorded_call.kwargs.get("batch_details"),
+                    )
+                )
+                for recorded_call in casa_vault.instruct_posting_batch.call_args_list
+            ]
+        )
+
+    def _interest_directive(self, account_id, amount):
+        return create_posting_instruction_batch_directive(
+            tside=Tside.LIABILITY,
+            amount=Decimal(amount),
+            denomination="PHP",
+            from_account_address="ACCRUED_OUTGOING",
+            from_account_id="Internal account",
+            to_account_address="ACCRUED_INCOMING_INTEREST",
+            to_account_id=account_id,
+            value_timestamp=DEFAULT_DATE,
+            client_batch_id=f"ACCRUE_AND_APPLY_INTERESTMOCK_HOOK_{account_id}",
+        )
+
+    def test_execution_schedules_single_plan_level_schedule(self):
+        mock_vault = self.create_plan_mock()
+
+        schedules = self.run_function("execution_schedules", mock_vault)
+
+        self.assertEqual(
+            schedules,
+            [
+                (
+                    "PLAN_ACCRUE_AND_APPLY_INTEREST",
+                    {"hour": "0", "minute": "0", "second": "1"},
+                )
+            ],
+        )
+
+    def test_execution_schedules_spread_across_plan_window(self):
+        mock_vault = self.create_plan_mock(schedule_spread_window=Decimal("60"))
+
+        schedules = self.run_function("execution_schedules", mock_vault)
+
+        # FNV-1a of "MOCK_PLAN" is 3588877103, which is 1103 seconds into the hour long window
+        self.assertEqual(
+            schedules,
+            [
+                (
+                    "PLAN_ACCRUE_AND_APPLY_INTEREST",
+                    {"hour": "0", "minute": "18", "second": "24"},
+                )
+            ],
+        )
+        mock_vault.get_parameter_timeseries.assert_called_once_with(
+            name="schedule_spread_window"
+        )
+
+    def test_supervisee_interest_batches_instructed_in_one_execution(self):
+        directive_1 = self._interest_directive("casa_1", "3")
+        directive_2 = self._interest_directive("casa_2", "5")
+        casa_1 = self.create_supervisee_mock(
+            alias="casa",
+            account_id="casa_1",
+            creation_date=datetime(2019, 1, 1),
+            hook_directives=create_hook_directive(
+                posting_instruction_batch_directives=[directive_1]
+            ),
+        )
+        casa_2 = self.create_supervisee_mock(
+            alias="casa",
+            account_id="casa_2",
+            creation_date=datetime(2019, 1, 2),
+            hook_directives=create_hook_directive(
+                posting_instruction_batch_directives=[directive_2]
+            ),
+        )
+        mock_vault = self.create_plan_mock(supervisees={"casa_1": casa_1, "casa_2": casa_2})
+
+        self.run_function(
+            "scheduled_code", mock_vault, "PLAN_ACCRUE_AND_APPLY_INTEREST", DEFAULT_DATE
+        )
+
+        for supervisee, directive in ((casa_1, directive_1), (casa_2, directive_2)):
+            pib = directive.posting_instruction_batch
+            supervisee.instruct_posting_batch.assert_called_once_with(
+                posting_instructions=pib,
+                effective_date=DEFAULT_DATE,
+                client_batch_id=pib.client_batch_id,
+                batch_details=pib.batch_details,
+            )
+            supervisee.update_event_type.assert_not_called()
+        self.assert_no_side_effects(mock_vault)
+
+    def test_casa_interest_directives_instructed(self):
+        hook_directives = self.casa_hook_directives("casa_1", DEFAULT_DATE)
+        casa_1 = self.create_supervisee_mock(
+            alias="casa", account_id="casa_1", hook_directives=hook_directives
+        )
+        mock_vault = self.create_plan_mock(supervisees={"casa_1": casa_1})
+
+        self.run_function(
+            "scheduled_code", mock_vault, "PLAN_ACCRUE_AND_APPLY_INTEREST", DEFAULT_DATE
+        )
+
+        batches = hook_directives.posting_instruction_batch_directives
+        self.assertEqual(len(batches), 1)
+        pib = batches[0].posting_instruction_batch
+        self.assertTrue(pib.posting_instructions)
+        casa_1.instruct_posting_batch.assert_called_once_with(
+            posting_instructions=pib,
+            effective_date=DEFAULT_DATE,
+            client_batch_id=pib.client_batch_id,
+            batch_details=pib.batch_details,
+        )
+        casa_1.update_event_type.assert_not_called()
+
+    def test_supervisee_without_directives_aligned_to_plan_schedule(self):
+        # Added to the plan since its last execution, so its own event ran at another time
+        casa_1 = self.create_casa_supervisee_mock("casa_1", creation_date=datetime(2019, 1, 5))
+        mock_vault = self.create_plan_mock(
+            schedule_spread_window=Decimal("60"), supervisees={"casa_1": casa_1}
+        )
+
+        self.run_function(
+            "scheduled_code", mock_vault, "PLAN_ACCRUE_AND_APPLY_INTEREST", DEFAULT_DATE
+        )
+
+        casa_1.instruct_posting_batch.assert_not_called()
+        schedules = {
+            recorded_call.kwargs["event_type"]: vars(recorded_call.kwargs["schedule"])
+            for recorded_call in casa_1.update_event_type.call_args_list
+        }
+        plan_schedule = self.run_function("execution_schedules", mock_vault)[0][1]
+        self.assertEqual(casa_1.update_event_type.call_count, 2)
+        self.assertEqual(
+            schedules,
+            {
+                "MONTHLY_MAINTENANCE_FEE": {
+                    "day": "5",
+                    "day_of_week": None,
+                    "hour": "0",
+                    "minute": "18",
+                    "second": "23",
+                    "month": None,
+                    "year": None,
+                },
+                "DAILY_ACCRUE_AND_APPLY_INTEREST": {
+                    "day": None,
+                    "day_of_week": None,
+                    "month": None,
+                    "year": None,
+                    **plan_schedule,
+                },
+            },
+        )
+
+    def test_aligned_schedules_keep_casa_event_order(self):
+        # Without spread windows the plan and an account run their events at the same times
+        casa_1 = self.create_casa_supervisee_mock("casa_1", creation_date=datetime(2019, 1, 5))
+        mock_vault = self.create_plan_mock(supervisees={"casa_1": casa_1})
+
+        self.run_function(
+            "scheduled_code", mock_vault, "PLAN_ACCRUE_AND_APPLY_INTEREST", DEFAULT_DATE
+        )
+
+        casa_schedules = dict(
+            run_contract(self.smart_contracts["casa"], "execution_schedules", casa_1)
+        )
+        self.assertEqual(casa_1.update_event_type.call_count, 2)
+        for recorded_call in casa_1.update_event_type.call_args_list:
+            event_type = recorded_call.kwargs["event_type"]
+            schedule = recorded_call.kwargs["schedule"]
+            with self.subTest(event_type):
+                casa_schedule = casa_schedules[event_type]
+                self.assertEqual(
+                    (schedule.day, schedule.hour, schedule.minute, schedule.second),
+                    (
+                        casa_schedule.get("day"),
+                        casa_schedule["hour"],
+                        casa_schedule["minute"],
+                        casa_schedule["second"],
+                    ),
+                )
@@ -0,0 +1,329 @@
+# standard libs
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+from datetime import datetime, timedelta
+from decimal import Decimal
+from itertools import compress
+from operator import mul, sub
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Tuple
+
+# common
+from common.test_utils.common.balance_helpers import Balance
+
+BALANCE_FIELDS = ("net", "credit", "debit")
+
+
+class _BalanceColumn:
+    """
+    The history of a single balance dimension, as parallel timestamp, net, credit and debit lists
+    """
+
+    __slots__ = ("timestamps", "net", "credit", "debit")
+
+    def __init__(self) -> None:
+        self.timestamps: List[datetime] = []
+        self.net: List[Decimal] = []
+        self.credit: List[Decimal] = []
+        self.debit: List[Decimal] = []
+
+    def append(self, timestamp: datetime, net: Decimal, credit: Decimal, debit: Decimal) -> None:
+        """
+        Adds the balance from `timestamp` onwards, replacing the latest balance if it is at the
+        same timestamp
+        """
+        if self.timestamps and timestamp <= self.timestamps[-1]:
+            if timestamp < self.timestamps[-1]:
+                raise ValueError(
+                    f"Balance at {timestamp} is before the latest balance at "
+                    f"{self.timestamps[-1]}"
+                )
+            self.net[-1], self.credit[-1], self.debit[-1] = net, credit, debit
+            return
+        self.timestamps.append(timestamp)
+        self.net.append(net)
+        self.credit.append(credit)
+        self.debit.append(debit)
+
+    def position(self, timestamp: datetime, inclusive: bool = True) -> int:
+        """
+        The index after the last entry at (or before, if not inclusive) `timestamp`
+        """
+        if inclusive:
+            return bisect_right(self.timestamps, timestamp)
+        return bisect_left(self.timestamps, timestamp)
+
+
+class BalanceTimeseries:
+    """
+    A balance timeseries stored per balance dimension as columns of timestamps and net, credit
+    and debit amounts, instead of a list of (timestamp, full balances snapshot) entries. Only
+    changes to a dimension are stored, so long histories cost memory in proportion to the number
+    of balance updates rather than timestamps x dimensions.
+
+    Point lookups bisect the dimension's timestamps. Window aggregations sample the balance at a
+    fixed interval: they bisect the window's bounds and work out how many samples each update in
+    between gives, so that sum, min and max run over slices of the column rather than over every
+    sample.
+
+    at, before, latest and all return snapshots like the list-based TimeSeries of balances, so a
+    BalanceTimeseries can be used wherever those are expected.
+    """
+
+    def __init__(
+        self,
+        balance_class: Callable[..., Any] = Balance,
+        snapshot_class: Callable[[Callable], Dict] = defaultdict,
+    ) -> None:
+        self.balance_class = balance_class
+        self.snapshot_class = snapshot_class
+        self._columns: Dict[Hashable, _BalanceColumn] = {}
+
+    @classmethod
+    def from_timeseries(
+        cls,
+        timeseries: Iterable[Tuple[datetime, Dict[Hashable, Any]]],
+        balance_class: Callable[..., Any] = Balance,
+        snapshot_class: Callable[[Callable], Dict] = defaultdict,
+    ) -> "BalanceTimeseries":
+        """
+        Builds a BalanceTimeseries from (timestamp, balances snapshot) entries in timestamp order,
+        e.g. the output of init_balances. Dimensions missing from a snapshot are zero.
+        """
+        balance_timeseries = cls(balance_class=balance_class, snapshot_class=snapshot_class)
+        zero = balance_class()
+        for timestamp, balances in timeseries:
+            updates = dict(balances)
+            for dimensions in balance_timeseries._columns.keys() - updates.keys():
+                updates[dimensions] = zero
+            balance_timeseries.update(timestamp, updates)
+        return balance_timeseries
+
+    @classmethod
+    def from_deltas(
+        cls,
+        deltas: Iterable[Tuple[datetime, Hashable, Any]],
+        balance_class: Callable[..., Any] = Balance,
+        snapshot_class: Callable[[Callable], Dict] = defaultdict,
+    ) -> "BalanceTimeseries":
+        """
+        Builds a BalanceTimeseries from balance changes, without building a balances snapshot for
+        each timestamp. Balances start at zero.
+        :param deltas: (timestamp, dimensions, balance change) entries, in timestamp order for
+        each dimension. The change is any object with net, credit and debit amounts
+        """
+        balance_timeseries = cls(balance_class=balance_class, snapshot_class=snapshot_class)
+        columns = balance_timeseries._columns
+        for timestamp, dimensions, delta in deltas:
+            column = columns.get(dimensions)
+            if column is None:
+                column = columns[dimensions] = _BalanceColumn()
+                net = credit = debit = Decimal("0")
+            else:
+                net, credit, debit = column.net[-1], column.credit[-1], column.debit[-1]
+            column.append(
+                timestamp,
+                net + Decimal(delta.net),
+                credit + Decimal(delta.credit),
+                debit + Decimal(delta.debit),
+            )
+        return balance_timeseries
+
+    def update(self, timestamp: datetime, balances: Dict[Hashable, Any]) -> None:
+        """
+        Records the balances of the given dimensions from `timestamp` onwards. Balances equal to
+        the dimension's current balance are not stored.
+        :param timestamp: must not be before the dimension's latest update
+        :param balances: balance dimensions to their balance objects
+        """
+        for dimensions, balance in balances.items():
+            column = self._columns.get(dimensions)
+            if column is None:
+                column = self._columns[dimensions] = _BalanceColumn()
+            elif (
+                column.net[-1] == balance.net
+                and column.credit[-1] == balance.credit
+                and column.debit[-1] == balance.debit
+            ):
+                continue
+            column.append(
+                timestamp,
+                Decimal(balance.net),
+                Decimal(balance.credit),
+                Decimal(balance.debit),
+            )
+
+    @property
+    def dimensions(self) -> List[Hashable]:
+        return list(self._columns)
+
+    def values(self, dimensions: Hashable, field: str = "net") -> List[Decimal]:
+        """
+        The stored `field` amounts of a dimension, one per update
+        """
+        if field not in BALANCE_FIELDS:
+            raise ValueError(f'Unknown balance field "{field}"')
+        column = self._columns.get(dimensions)
+        return list(getattr(column, field)) if column else []
+
+    def balance_at(
+        self, dimensions: Hashable, timestamp: datetime, inclusive: bool = True
+    ) -> Any:
+        """
+        The balance of a single dimension at (or before, if not inclusive) `timestamp`
+        """
+        column = self._columns.get(dimensions)
+        if column is None:
+            return self.balance_class()
+        position = column.position(timestamp, inclusive)
+        if not position:
+            return self.balance_class()
+        return self._balance(column, position - 1)
+
+    def at(self, timestamp: datetime, inclusive: bool = True) -> Dict[Hashable, Any]:
+        snapshot = self.snapshot_class(self.balance_class)
+        for dimensions, column in self._columns.items():
+            position = column.position(timestamp, inclusive)
+            if position:
+                snapshot[dimensions] = self._balance(column, position - 1)
+        return snapshot
+
+    def before(self, timestamp: datetime) -> Dict[Hashable, Any]:
+        return self.at(timestamp, inclusive=False)
+
+    def latest(self) -> Dict[Hashable, Any]:
+        snapshot = self.snapshot_class(self.balance_class)
+        for dimensions, column in self._columns.items():
+            snapshot[dimensions] = self._balance(column, -1)
+        return snapshot
+
+    def all(self) -> List[Tuple[datetime, Dict[Hashable, Any]]]:  # noqa: A003
+        timestamps = sorted(
+            {timestamp for column in self._columns.values() for timestamp in column.timestamps}
+        )
+        return [(timestamp, self.at(timestamp)) for timestamp in timestamps]
+
+    def sample(
+        self,
+        dimensions: Hashable,
+        start: datetime,
+        end: datetime,
+        interval: timedelta = timedelta(days=1),
+        field: str = "net",
+    ) -> List[Decimal]:
+        """
+        The dimension's `field` amount at `start` and every `interval` after it, up to but
+        excluding `end`. A daily sample by default.
+        """
+        amounts, counts, zeros = self._sample_counts(dimensions, start, end, interval, field)
+        samples = [Decimal("0")] * zeros
+        for amount, count in zip(amounts, counts):
+            samples.extend([amount] * count)
+        return samples
+
+    def mean(
+        self,
+        dimensions: Hashable,
+        start: datetime,
+        end: datetime,
+        interval: timedelta = timedelta(days=1),
+        field: str = "net",
+    ) -> Decimal:
+        """
+        The mean of the dimension's sampled `field` amounts from `start` up to `end`
+        """
+        amounts, counts, zeros = self._window(dimensions, start, end, interval, field)
+        return sum(map(mul, amounts, counts), Decimal("0")) / (sum(counts) + zeros)
+
+    def min(  # noqa: A003
+        self,
+        dimensions: Hashable,
+        start: datetime,
+        end: datetime,
+        interval: timedelta = timedelta(days=1),
+        field: str = "net",
+    ) -> Decimal:
+        """
+        The lowest of the dimension's sampled `field` amounts from `start` up to `end`
+        """
+        return min(self._sampled_amounts(dimensions, start, end, interval, field))
+
+    def max(  # noqa: A003
+        self,
+        dimensions: Hashable,
+        start: datetime,
+        end: datetime,
+        interval: timedelta = timedelta(days=1),
+        field: str = "net",
+    ) -> Decimal:
+        """
+        The highest of the dimension's sampled `field` amounts from `start` up to `end`
+        """
+        return max(self._sampled_amounts(dimensions, start, end, interval, field))
+
+    def _sample_counts(
+        self,
+        dimensions: Hashable,
+        start: datetime,
+        end: datetime,
+        interval: timedelta,
+        field: str,
+    ) -> Tuple[List[Decimal], List[int], int]:
+        """
+        The dimension's `field` amounts in effect at some time from `start` up to `end`, the
+        number of samples taken every `interval` from `start` that each of them gives, and the
+        number of samples taken before the dimension's first update, which are zero
+        """
+        if field not in BALANCE_FIELDS:
+            raise ValueError(f'Unknown balance field "{field}"')
+        num_samples = max(-((start - end) // interval), 0)
+        column = self._columns.get(dimensions)
+        if column is None or not column.timestamps or column.timestamps[0] >= end:
+            return [], [], num_samples
+
+        def first_sample_at_or_after(timestamp: datetime) -> int:
+            return min(max(-((start - timestamp) // interval), 0), num_samples)
+
+        timestamps = column.timestamps
+        low = max(column.position(start) - 1, 0)
+        high = column.position(end, inclusive=False)
+        sample_starts = [first_sample_at_or_after(timestamps[low])] + [
+            first_sample_at_or_after(timestamp) for timestamp in timestamps[low + 1 : high]
+        ]
+        counts = list(map(sub, sample_starts[1:] + [num_samples], sample_starts))
+        return getattr(column, field)[low:high], counts, sample_starts[0]
+
+    def _window(
+        self,
+        dimensions: Hashable,
+        start: datetime,
+        end: datetime,
+        interval: timedelta,
+        field: str,
+    ) -> Tuple[List[Decimal], List[int], int]:
+        amounts, counts, zeros = self._sample_counts(dimensions, start, end, interval, field)
+        if not zeros and not any(counts):
+            raise ValueError(f"No samples between {start} and {end}")
+        return amounts, counts, zeros
+
+    def _sampled_amounts(
+        self,
+        dimensions: Hashable,
+        start: datetime,
+        end: datetime,
+        interval: timedelta,
+        field: str,
+    ) -> List[Decimal]:
+        """
+        The amounts sampled at least once. An update overwritten before the next sample is not
+        one of them.
+        """
+        amounts, counts, zeros = self._window(dimensions, start, end, interval, field)
+        sampled = list(compress(amounts, counts))
+        if zeros:
+            sampled.append(Decimal("0"))
+        return sampled
+
+    def _balance(self, column: _BalanceColumn, index: int) -> Any:
+        return self.balance_class(
+            credit=column.credit[index], debit=column.debit[index], net=column.net[index]
+        )
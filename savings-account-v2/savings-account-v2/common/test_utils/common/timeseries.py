@@ -1,18 +1,75 @@
+from bisect import bisect_left, bisect_right
+
+
+def _invalidates_index(method):
+    def mutator(self, *args, **kwargs):
+        self._index_cache = None
+        return method(self, *args, **kwargs)
+
+    mutator.__name__ = method.__name__
+    mutator.__doc__ = method.__doc__
+    return mutator
+
+
 class TimeSeries(list):
-    def __init__(self, items, return_on_empty=None):
+    """
+    A list of (timestamp, value) entries, mirroring the timeseries objects the vault object
+    returns to Smart Contracts. A lookup returns the value of the last entry in the list at or
+    before the timestamp, as if scanning the entries in reverse.
+
+    Rather than scanning, lookups and ranges bisect a private copy of the entries' timestamps,
+    sorted and paired with each entry's position and the position of the last entry in the list
+    up to each of them. The entries themselves are never reordered. The copy is built on the first lookup and discarded whenever
+    the list is modified.
+    """
+
+    def __init__(self, items=(), return_on_empty=None):
         super().__init__(items)
         self.return_on_empty = return_on_empty
+        self._index_cache = None
+
+    append = _invalidates_index(list.append)
+    extend = _invalidates_index(list.extend)
+    insert = _invalidates_index(list.insert)
+    pop = _invalidates_index(list.pop)
+    remove = _invalidates_index(list.remove)
+    clear = _invalidates_index(list.clear)
+    sort = _invalidates_index(list.sort)
+    reverse = _invalidates_index(list.reverse)
+    __setitem__ = _invalidates_index(list.__setitem__)
+    __delitem__ = _invalidates_index(list.__delitem__)
+    __iadd__ = _invalidates_index(list.__iadd__)
+    __imul__ = _invalidates_index(list.__imul__)
+
+    def _index(self):
+        """
+        The sorted timestamps, and for each of them the position of its entry and the position
+        of the last entry in the list whose timestamp is no later
+        """
+        if self._index_cache is None:
+            positions = sorted(range(len(self)), key=lambda position: self[position][0])
+            timestamps = [self[position][0] for position in positions]
+            last_positions = []
+            last_position = -1
+            for position in positions:
+                last_position = max(last_position, position)
+                last_positions.append(last_position)
+            self._index_cache = (timestamps, positions, last_positions)
+        return self._index_cache
 
     def at(self, timestamp, inclusive=True):
-        for entry in reversed(self):
-            if entry[0] <= timestamp:
-                if inclusive or entry[0] < timestamp:
-                    return entry[1]
+        timestamps, _, last_positions = self._index()
+        if inclusive:
+            position = bisect_right(timestamps, timestamp)
+        else:
+            position = bisect_left(timestamps, timestamp)
+        if position:
+            return self[last_positions[position - 1]][1]
 
         if self.return_on_empty is not None:
             return self.return_on_empty
 
-        raise ValueError("No value in timeseries")
+        raise ValueError(f"No value in timeseries at {timestamp}")
 
     def before(self, timestamp):
         return self.at(timestamp, inclusive=False)
@@ -24,5 +81,17 @@ class TimeSeries(list):
             raise ValueError("No value in timeseries")
         return self[-1][1]
 
-    def all(self):
+    def range(self, start, end):  # noqa: A003
+        """
+        Returns the entries from `start` (inclusive) up to `end` (exclusive) as a new TimeSeries,
+        in their order in this one
+        """
+        timestamps, positions, _ = self._index()
+        in_range = positions[bisect_left(timestamps, start) : bisect_left(timestamps, end)]
+        return TimeSeries(
+            [self[position] for position in sorted(in_range)],
+            return_on_empty=self.return_on_empty,
+        )
+
+    def all(self):  # noqa: A003
         return [item for item in self]
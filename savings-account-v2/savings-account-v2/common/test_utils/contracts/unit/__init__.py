@@ -1,9 +1,9 @@
 # Copyright @ 2020 Thought Machine Group Limited. All rights reserved.
-import builtins
-from types import FunctionType
+from types import CodeType
+from typing import Union
 from unittest.mock import Mock
-from inspect import isfunction
 
+from .sandbox import ContractSandbox, compile_contract
 from .types_extension import _ALL_TYPES, _WHITELISTED_BUILTINS, _SUPPORTED_HOOK_NAMES
 
 
@@ -23,8 +23,29 @@ def _mock_requires_decorator(
     return inner
 
 
+def _mock_fetch_account_data_decorator(balances=None, postings=None, event_type=None):
+    def inner(func):
+        return func
+
+    return inner
+
+
+# The sandbox Smart Contracts and Contract Modules run in, built once per process
+CONTRACT_SANDBOX = ContractSandbox(
+    types=_ALL_TYPES,
+    whitelisted_builtins=_WHITELISTED_BUILTINS,
+    decorators={
+        "requires": _mock_requires_decorator,
+        "fetch_account_data": _mock_fetch_account_data_decorator,
+    },
+)
+
 def run(
-    smart_contract_code: str, function_name: str, vault_object: Mock, *args, **kwargs
+    smart_contract_code: Union[str, CodeType],
+    function_name: str,
+    vault_object: Mock,
+    *args,
+    **kwargs,
 ):
     """Runs function `function_name` that is defined in the `smart_contract_code`.
 
@@ -34,8 +55,11 @@ def run(
       This will only happen for hooks (i.e. a helper function wouldn't have access to it).
     - Types (see Vault Smart Contract documentation for full list) are globally available.
 
+    The contract is only executed the first time it is run; later calls reuse its namespace and
+    only bind `vault` into a per-call copy of the globals.
+
     Args:
-        smart_contract_code: The source code of the Smart Contract.
+        smart_contract_code: The source code of the Smart Contract, or its compiled code.
         function_name: The name of the function to run, this must be defined in the Smart Contract
             code. It can be either a Vault Smart Contract hook, or any other defined function.
         vault_object: The mock Vault object to make available to the function being run. Will only
@@ -43,17 +67,7 @@ def run(
         *args: Additional arguments to call `function_name` with.
         **kwargs: Additional named arguments to call `function_name` with.
     """
-    # The function we will execute will only have access to symbols defined in the sandbox and the
-    # symbols defined by the Smart Contract itself.
-    sandbox = {
-        "__builtins__": {
-            name: getattr(builtins, name) for name in _WHITELISTED_BUILTINS
-        },
-        "requires": _mock_requires_decorator,
-        **_ALL_TYPES,
-    }
-
-    exec(smart_contract_code, sandbox, sandbox)
+    sandbox = CONTRACT_SANDBOX.execute(smart_contract_code)
 
     func = sandbox.get(function_name)
     if func is None:
@@ -64,20 +78,13 @@ def run(
     # Make sure `vault` is only accessible to `function_name` if it is a known hook, and not any
     # function it calls or non-hook functions, unless the function is a contract module. That is
     # why we don't put it directly in the sandbox and do this checking here.
-    function_globals = {**sandbox}
     if function_name in _SUPPORTED_HOOK_NAMES or kwargs.get("contract_module", False):
-        function_globals["vault"] = vault_object
+        function_globals = CONTRACT_SANDBOX.fork(sandbox, vault=vault_object)
         kwargs.pop("contract_module", None)
+    else:
+        function_globals = CONTRACT_SANDBOX.fork(sandbox)
 
-    func = FunctionType(
-        func.__code__,
-        function_globals,
-        func.__name__,
-        func.__defaults__,
-        func.__closure__,
-    )
-
-    return func(*args, **kwargs)
+    return CONTRACT_SANDBOX.bind(func, function_globals)(*args, **kwargs)
 
 
 class ContractModuleRunner:
@@ -91,30 +98,12 @@ class ContractModuleRunner:
 
     def __init__(self, module_code: str) -> None:
         # The functions will only have access to symbols defined in the sandbox
-        # and the symbols defined by the Smart Contract itself.
-        sandbox = {
-            "__builtins__": {
-                name: getattr(builtins, name) for name in _WHITELISTED_BUILTINS
-            },
-            "requires": _mock_requires_decorator,
-            # TODO(Contracts SDK) - Use distinct set of types supported in Contract Modules
-            **_ALL_TYPES,
-        }
-        sandbox_built_ins = sandbox.copy()
-
-        exec(module_code, sandbox, sandbox)
-
-        for attr_name, attr in sandbox.items():
-            # We only want the functions defined in the Contract Module
-            if attr_name in sandbox_built_ins or not isfunction(attr):
-                continue
-            func, function_name = attr, attr_name
-            func = FunctionType(
-                func.__code__,
-                {**sandbox},
-                func.__name__,
-                func.__defaults__,
-                func.__closure__,
-            )
-            # Set each function as an attribute of the ContractModuleRunner instance
-            setattr(self, function_name, func)
+        # and the symbols defined by the Contract Module itself.
+        # TODO(Contracts SDK) - Use distinct set of types supported in Contract Modules
+        namespace = CONTRACT_SANDBOX.execute(module_code)
+        function_globals = CONTRACT_SANDBOX.fork(namespace)
+
+        # Set each function defined in the Contract Module as an attribute of the
+        # ContractModuleRunner instance
+        for function_name, func in CONTRACT_SANDBOX.defined_functions(namespace).items():
+            setattr(self, function_name, CONTRACT_SANDBOX.bind(func, function_globals))
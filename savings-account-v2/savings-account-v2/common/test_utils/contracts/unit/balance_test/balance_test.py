@@ -0,0 +1,147 @@
+from datetime import datetime
+from decimal import Decimal
+from unittest import TestCase
+
+from common.test_utils.contracts.unit.common import ContractTest
+from common.test_utils.contracts.unit.types import Balance as BaseBalance
+from common.test_utils.contracts.unit.types_extension import (
+    DEFAULT_ASSET,
+    Balance,
+    BalanceDefaultDict,
+    Phase,
+    Tside,
+)
+
+CONTRACT_FILE = "common/test_utils/contracts/unit/run_cache_test/run_cache_test_contract.py"
+DEFAULT_DIMENSIONS = ("DEFAULT", DEFAULT_ASSET, "GBP", Phase.COMMITTED)
+ACCRUED_DIMENSIONS = ("ACCRUED_INCOMING_INTEREST", DEFAULT_ASSET, "GBP", Phase.COMMITTED)
+DAY_1 = datetime(2019, 1, 1)
+DAY_2 = datetime(2019, 1, 2)
+DAY_3 = datetime(2019, 1, 3)
+
+
+class BalanceTest(TestCase):
+    def test_balance_is_slotted(self):
+        with self.assertRaises(AttributeError):
+            Balance().value_timestamp = DAY_1
+
+    def test_in_place_arithmetic_keeps_object(self):
+        balance = Balance(credit=Decimal(10), net=Decimal(10))
+
+        same_balance = balance.add(credit=Decimal(5), net=Decimal(5))
+        same_balance += Balance(debit=Decimal(1), net=Decimal(-1))
+        same_balance -= Balance(credit=Decimal(2), net=Decimal(2))
+
+        self.assertIs(same_balance, balance)
+        self.assertEqual(
+            (balance.credit, balance.debit, balance.net), (Decimal(13), Decimal(1), Decimal(12))
+        )
+
+    def test_subtraction_returns_new_balance(self):
+        balance = Balance(credit=Decimal(10), debit=Decimal(2), net=Decimal(8))
+
+        difference = balance - Balance(credit=Decimal(3), net=Decimal(3))
+
+        self.assertIsNot(difference, balance)
+        self.assertEqual(
+            (difference.credit, difference.debit, difference.net),
+            (Decimal(7), Decimal(2), Decimal(5)),
+        )
+        self.assertEqual(balance.net, Decimal(8))
+
+    def test_dict_addition_does_not_alias_balances(self):
+        first = BalanceDefaultDict(lambda: Balance(), {DEFAULT_DIMENSIONS: Balance(net=Decimal(1))})
+        second = BalanceDefaultDict(
+            lambda: Balance(),
+            {
+                DEFAULT_DIMENSIONS: Balance(net=Decimal(2)),
+                ACCRUED_DIMENSIONS: Balance(net=Decimal(3)),
+            },
+        )
+
+        total = first + second
+        total[ACCRUED_DIMENSIONS] += Balance(net=Decimal(1))
+        first += second
+
+        self.assertEqual(total[DEFAULT_DIMENSIONS].net, Decimal(3))
+        self.assertEqual(second[ACCRUED_DIMENSIONS].net, Decimal(3))
+        self.assertIsNot(first[ACCRUED_DIMENSIONS], second[ACCRUED_DIMENSIONS])
+        self.assertEqual(total["missing"].net, Decimal(0))
+
+    def test_dict_arithmetic_with_base_balances(self):
+        base_balance = BaseBalance(credit=Decimal(1), debit=Decimal(0), net=Decimal(1))
+        first = BalanceDefaultDict(lambda: Balance(), {DEFAULT_DIMENSIONS: base_balance})
+        second = {
+            DEFAULT_DIMENSIONS: BaseBalance(credit=Decimal(2), debit=Decimal(0), net=Decimal(2)),
+            ACCRUED_DIMENSIONS: BaseBalance(credit=Decimal(3), debit=Decimal(0), net=Decimal(3)),
+        }
+
+        total = first + second
+        first += second
+
+        for balances in (total, first):
+            self.assertEqual(balances[DEFAULT_DIMENSIONS].net, Decimal(3))
+            self.assertEqual(balances[ACCRUED_DIMENSIONS].credit, Decimal(3))
+            self.assertIsInstance(balances[ACCRUED_DIMENSIONS], Balance)
+        self.assertIsNot(total[DEFAULT_DIMENSIONS], base_balance)
+        self.assertIs(first[DEFAULT_DIMENSIONS], base_balance)
+
+    def test_in_place_addition_updates_existing_balances(self):
+        owned_balance = Balance(net=Decimal(1))
+        balances = BalanceDefaultDict(lambda: Balance(), {DEFAULT_DIMENSIONS: owned_balance})
+        other = BalanceDefaultDict(
+            lambda: Balance(),
+            {
+                DEFAULT_DIMENSIONS: Balance(net=Decimal(2)),
+                ACCRUED_DIMENSIONS: Balance(net=Decimal(3)),
+            },
+        )
+
+        balances += other
+        balances[ACCRUED_DIMENSIONS] += Balance(net=Decimal(1))
+
+        self.assertIs(balances[DEFAULT_DIMENSIONS], owned_balance)
+        self.assertEqual(owned_balance.net, Decimal(3))
+        self.assertEqual(balances[ACCRUED_DIMENSIONS].net, Decimal(4))
+        self.assertEqual(other[ACCRUED_DIMENSIONS].net, Decimal(3))
+
+    def test_accumulate_updates_own_balances_in_place(self):
+        owned_balance = Balance(net=Decimal(1))
+        balances = BalanceDefaultDict(lambda: Balance(), {DEFAULT_DIMENSIONS: owned_balance})
+        other = BalanceDefaultDict(lambda: Balance(), {ACCRUED_DIMENSIONS: Balance(net=Decimal(3))})
+
+        balances.accumulate({DEFAULT_DIMENSIONS: Balance(net=Decimal(2))}).accumulate(other)
+
+        self.assertIs(balances[DEFAULT_DIMENSIONS], owned_balance)
+        self.assertEqual(owned_balance.net, Decimal(3))
+        self.assertIsNot(balances[ACCRUED_DIMENSIONS], other[ACCRUED_DIMENSIONS])
+
+
+class BalanceHistoryTest(ContractTest):
+    contract_file = CONTRACT_FILE
+    side = Tside.LIABILITY
+
+    def test_init_balance_history_accumulates_deltas(self):
+        balance_ts = self.init_balance_history(
+            [
+                (DAY_1, [{"net": "100"}]),
+                (DAY_2, [{"address": "accrued_incoming_interest", "net": "0.5"}]),
+                (DAY_3, [{"net": "-40"}, {"address": "accrued_incoming_interest", "net": "0.5"}]),
+            ]
+        )
+        mock_vault = self.create_mock(account_id="casa_1", balance_ts=balance_ts)
+
+        self.assertEqual(
+            self.run_function("pre_posting_code", mock_vault, [], DAY_3)[0], "casa_1"
+        )
+        balances = mock_vault.get_balance_timeseries().at(DAY_2)
+        latest = mock_vault.get_balance_timeseries().latest()
+
+        self.assertIsInstance(balances, BalanceDefaultDict)
+        self.assertEqual(balances[DEFAULT_DIMENSIONS].net, Decimal("100"))
+        self.assertEqual(balances[ACCRUED_DIMENSIONS].net, Decimal("0.5"))
+        self.assertEqual(balances["missing"].net, Decimal("0"))
+        self.assertEqual(latest[DEFAULT_DIMENSIONS].net, Decimal("60"))
+        self.assertEqual(latest[DEFAULT_DIMENSIONS].credit, Decimal("60"))
+        self.assertEqual(latest[ACCRUED_DIMENSIONS].net, Decimal("1"))
+        self.assertEqual(balance_ts.values(DEFAULT_DIMENSIONS), [Decimal("100"), Decimal("60")])
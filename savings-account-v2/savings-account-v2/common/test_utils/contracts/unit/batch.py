@@ -0,0 +1,130 @@
+# Copyright @ 2021 Thought Machine Group Limited. All rights reserved.
+"""
+Runs a contract function against many vault objects, e.g. to sweep pricing parameters.
+"""
+# standard libs
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from multiprocessing import get_all_start_methods, get_context
+from types import CodeType
+from typing import Any, Callable, Dict, List, Optional, Tuple, Type
+
+# common
+from common.test_utils.contracts.unit import run
+from common.test_utils.contracts.unit.types_extension import InvalidContractParameter, Rejected
+
+# The vault methods that create postings, workflows, notes or change schedules
+SIDE_EFFECT_METHODS = (
+    "add_account_note",
+    "amend_schedule",
+    "instruct_posting_batch",
+    "make_internal_transfer_instructions",
+    "remove_schedule",
+    "start_workflow",
+    "update_event_type",
+)
+# The exceptions contracts raise as an outcome of a hook, recorded per case rather than raised
+CONTRACT_ERRORS = (InvalidContractParameter, Rejected)
+CHUNKS_PER_WORKER = 4
+
+# The function being run by a worker process, set when the worker is forked
+_worker_function: Optional[Callable[[Dict[str, Any]], "CaseResult"]] = None
+
+
+@dataclass
+class CaseResult:
+    """
+    The outcome of running a contract function for one case
+    :param case: the keyword arguments the vault object was created with
+    :param result: the function's return value, if it returned
+    :param error: the expected exception the function raised, formatted as
+    `ExceptionType: message`
+    :param side_effects: vault method name to the (args, kwargs) of each call to it, only for the
+    SIDE_EFFECT_METHODS that were called
+    """
+
+    case: Dict[str, Any]
+    result: Any = None
+    error: Optional[str] = None
+    side_effects: Dict[str, List[Tuple[tuple, dict]]] = field(default_factory=dict)
+
+
+def run_many(
+    code: CodeType,
+    function_name: str,
+    vault_factory: Callable[..., Any],
+    cases: List[Dict[str, Any]],
+    *args,
+    workers: Optional[int] = None,
+    expected_errors: Tuple[Type[Exception], ...] = CONTRACT_ERRORS,
+    **kwargs,
+) -> List[CaseResult]:
+    """
+    Runs `function_name` from the compiled contract `code` once per case, with a vault object
+    created by `vault_factory(**case)`. The contract is executed once and its namespace reused.
+
+    Cases are run in the current process unless `workers` is given, in which case they are split
+    across that many forked processes. The vault factory and arguments are inherited through the
+    fork, so only the cases and results need to be picklable. Platforms that cannot fork run the
+    cases in the current process regardless.
+
+    Only `expected_errors` are recorded in the case's result. Any other exception, including a
+    failed assertion in the vault factory or a side effect, is raised.
+    :return: a CaseResult per case, in the order of `cases`
+    """
+
+    def run_case(case: Dict[str, Any]) -> CaseResult:
+        vault = vault_factory(**case)
+        case_result = CaseResult(case=case)
+        try:
+            case_result.result = run(code, function_name, vault, *args, **kwargs)
+        except expected_errors as e:
+            case_result.error = f"{type(e).__name__}: {e}"
+        case_result.side_effects = _side_effects(vault)
+        return case_result
+
+    cases = list(cases)
+    if (
+        not workers
+        or workers < 2
+        or len(cases) < 2
+        or "fork" not in get_all_start_methods()
+    ):
+        return [run_case(case) for case in cases]
+
+    global _worker_function
+    _worker_function = run_case
+    try:
+        chunks = _chunks(cases, workers * CHUNKS_PER_WORKER)
+        with ProcessPoolExecutor(
+            max_workers=workers, mp_context=get_context("fork")
+        ) as executor:
+            return [
+                case_result
+                for chunk_results in executor.map(_run_chunk, chunks)
+                for case_result in chunk_results
+            ]
+    finally:
+        _worker_function = None
+
+
+def _run_chunk(cases: List[Dict[str, Any]]) -> List[CaseResult]:
+    return [_worker_function(case) for case in cases]
+
+
+def _chunks(cases: List[Dict[str, Any]], num_chunks: int) -> List[List[Dict[str, Any]]]:
+    chunk_size = max(1, -(-len(cases) // num_chunks))
+    return [cases[start : start + chunk_size] for start in range(0, len(cases), chunk_size)]
+
+
+def _side_effects(vault: Any) -> Dict[str, List[Tuple[tuple, dict]]]:
+    side_effects = {}
+    for method_name in SIDE_EFFECT_METHODS:
+        method = getattr(vault, method_name, None)
+        calls = getattr(method, "call_args_list", None)
+        if calls:
+            side_effects[method_name] = [
+                (tuple(recorded_call.args), dict(recorded_call.kwargs))
+                for recorded_call in calls
+            ]
+    return side_effects
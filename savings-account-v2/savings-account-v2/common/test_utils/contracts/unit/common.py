@@ -5,7 +5,7 @@ from collections import defaultdict, namedtuple
 from datetime import datetime
 from decimal import Decimal
 from os import getenv
-from typing import DefaultDict, Dict, List, Optional, Tuple, Union
+from typing import DefaultDict, Dict, List, Optional, Tuple, Type, Union
 from unittest import TestCase
 from unittest.mock import Mock, DEFAULT, ANY
 from pathlib import Path
@@ -14,12 +14,24 @@ from pathlib import Path
 import coverage
 
 # common
-from common.test_utils.contracts.unit import run, ContractModuleRunner
+from common.test_utils.common.balance_timeseries import BalanceTimeseries
+from common.test_utils.common.timeseries import TimeSeries
+from common.test_utils.contracts.unit import (
+    CONTRACT_SANDBOX,
+    compile_contract,
+    run,
+    ContractModuleRunner,
+)
+from common.test_utils.contracts.unit.batch import CONTRACT_ERRORS, CaseResult, run_many
+from common.test_utils.contracts.unit.contract_coverage import ContractCoverage
+from common.test_utils.contracts.unit.fake_vault import FakeVault
+from common.test_utils.contracts.unit.timing import TIMING_RECORDER
 from common.test_utils.contracts.unit.types_extension import (
     DEFAULT_ADDRESS,
     DEFAULT_ASSET,
     Balance,
     BalanceDefaultDict,
+    BalancesObservation,
     CalendarEvent,
     CalendarEvents,
     ClientTransaction,
@@ -47,9 +59,18 @@ DEFAULT_DENOM = "GBP"
 # Thought Machine set this in the build system configuration file (.plzconfig)
 ENABLE_COVERAGE = getenv("INCEPTION_UNIT_TEST_COVERAGE", False)
 
+# By default coverage.py traces every line run while a test class runs. Setting this environment
+# variable to "contract" only traces the contract under test (see ContractCoverage), which is much
+# faster and produces the same reports.
+COVERAGE_MODE = getenv("INCEPTION_UNIT_TEST_COVERAGE_MODE", "")
+
 # Base directory below which coverage information will be saved, when enabled
 COVERAGE_TOP_DIR = "/tmp"
 
+# When set, coverage data is saved for each test class instead of writing its reports, so that a
+# runner can combine the data from several processes and write the reports once (see parallel.py)
+DEFER_COVERAGE_REPORTS = False
+
 BalanceDimensions = namedtuple(
     "BalanceDimensions",
     ["address", "asset", "denomination", "phase"],
@@ -57,6 +78,52 @@ BalanceDimensions = namedtuple(
 )
 
 
+def coverage_report_path(source_file: str) -> Path:
+    """
+    The path of the coverage report for a Smart Contract or Contract Module. Coverage data files
+    are saved next to it.
+    """
+    dir_name = str(Path(source_file).stem) + "_coverage_reports"
+    return Path(COVERAGE_TOP_DIR) / dir_name / "report"
+
+
+def start_coverage(source_file: str) -> Union[coverage.Coverage, ContractCoverage]:
+    # Contracts executed before coverage started would not have their module level lines traced
+    CONTRACT_SANDBOX.clear()
+    data_file = str(coverage_report_path(source_file).parent / ".coverage")
+    if COVERAGE_MODE == "contract":
+        cov = ContractCoverage(source_file, data_file=data_file, data_suffix=True)
+    else:
+        cov = coverage.Coverage(
+            data_file=data_file,
+            data_suffix=True,
+            # Dont show coverage for files other than the source file
+            include=[source_file],
+        )
+    cov.start()
+    return cov
+
+
+def stop_coverage(
+    cov: Union[coverage.Coverage, ContractCoverage], source_file: str
+) -> None:
+    cov.stop()
+    if DEFER_COVERAGE_REPORTS:
+        cov.save()
+    else:
+        write_coverage_report(cov, source_file)
+
+
+def write_coverage_report(
+    cov: Union[coverage.Coverage, ContractCoverage], source_file: str
+) -> None:
+    report_path = coverage_report_path(source_file)
+    report_path.parent.mkdir(parents=True, exist_ok=True)
+    with report_path.open(mode="w", encoding="utf-8") as report:
+        cov.report(file=report)
+    cov.xml_report(outfile=str(report_path) + ".xml")
+
+
 def balance(tside, net=None, debit=None, credit=None):
     """
     Given a net, or a debit/credit pair, return an equivalent Balance object
@@ -361,11 +428,7 @@ class ContractTest(TestCase):
         cls.setUpContractModules()
 
         if ENABLE_COVERAGE:
-            cls.cov = coverage.Coverage(
-                # Dont show coverage for files other than the SC
-                include=[cls.contract_file]
-            )
-            cls.cov.start()
+            cls.cov = start_coverage(cls.contract_file)
 
     @classmethod
     def setUpContractModules(cls):
@@ -386,8 +449,10 @@ class ContractTest(TestCase):
 
     def setUp(self):
         self._started_at = time.time()
+        TIMING_RECORDER.start_test(self.id())
 
     def tearDown(self):
+        TIMING_RECORDER.stop_test()
         self._elapsed_time = time.time() - self._started_at
         print(
             "{} ({}s)".format(
@@ -398,15 +463,7 @@ class ContractTest(TestCase):
     @classmethod
     def tearDownClass(cls):
         if ENABLE_COVERAGE:
-            cls.cov.stop()
-
-            dir_name = str(Path(cls.contract_file).stem) + "_coverage_reports"
-            report_path = Path(COVERAGE_TOP_DIR) / dir_name / "report"
-
-            report_path.parent.mkdir(parents=True, exist_ok=True)
-            with report_path.open(mode="w", encoding="utf-8") as report:
-                cls.cov.report(file=report)
-            cls.cov.xml_report(outfile=str(report_path) + ".xml")
+            stop_coverage(cls.cov, cls.contract_file)
 
     def create_mock(
         self,
@@ -420,14 +477,21 @@ class ContractTest(TestCase):
         ] = None,
         account_id: str = "Main account",
         calendar_events: Optional[List[CalendarEvent]] = None,
+        balances_observation_fetchers_mapping: Optional[
+            Dict[str, BalancesObservation]
+        ] = None,
+        balances_interval_fetchers_mapping: Optional[
+            Dict[str, List[Tuple[datetime, BalanceDefaultDict]]]
+        ] = None,
         **kwargs,
-    ) -> Mock:
+    ) -> FakeVault:
         """
         Create mock Vault object for the test
 
         All parameters are optional apart from account_id and creation_date.
 
-        :param balance_ts: Balance time series
+        :param balance_ts: Balance time series, either as (datetime, balances) entries or a
+        BalanceTimeseries
         :param parameter_ts: dict where key is param name and entry is list of (dt, value) tuples
         :param postings: Posting instruction batch
         :param creation_date: Account creation date
@@ -437,6 +501,10 @@ class ContractTest(TestCase):
         True for active and False for inactive.
         :param account_id: Account ID
         :param calendar_events: A list of calendar events
+        :param balances_observation_fetchers_mapping: dict where key is a
+        BalancesObservationFetcher fetcher_id and entry is the BalancesObservation it returns
+        :param balances_interval_fetchers_mapping: dict where key is a BalancesIntervalFetcher
+        fetcher_id and entry is the balance time series it returns
         :param kwargs: Remaining arguments are interpreted flexibly e.g. parameter name+value etc.
         """
 
@@ -446,12 +514,35 @@ class ContractTest(TestCase):
         postings = postings or []
         client_transaction = client_transaction or {}
         calendar_events = calendar_events or []
+        balances_observation_fetchers_mapping = (
+            balances_observation_fetchers_mapping or {}
+        )
+        balances_interval_fetchers_mapping = balances_interval_fetchers_mapping or {}
 
-        def mock_get_balance_timeseries() -> TimeSeries:
+        def mock_get_balance_timeseries() -> Union[TimeSeries, BalanceTimeseries]:
+            if isinstance(balance_ts, BalanceTimeseries):
+                return balance_ts
             return TimeSeries(
                 balance_ts, return_on_empty=BalanceDefaultDict(lambda: Balance())
             )
 
+        def mock_get_balances_observation(fetcher_id: str) -> BalancesObservation:
+            if fetcher_id not in balances_observation_fetchers_mapping:
+                raise ValueError(
+                    f'No balances observation provided for fetcher "{fetcher_id}"'
+                )
+            return balances_observation_fetchers_mapping[fetcher_id]
+
+        def mock_get_balances_timeseries(fetcher_id: str) -> TimeSeries:
+            if fetcher_id not in balances_interval_fetchers_mapping:
+                raise ValueError(
+                    f'No balance timeseries provided for fetcher "{fetcher_id}"'
+                )
+            return TimeSeries(
+                balances_interval_fetchers_mapping[fetcher_id],
+                return_on_empty=BalanceDefaultDict(lambda: Balance()),
+            )
+
         def mock_get_parameter_timeseries(
             name: str,
         ) -> TimeSeries:
@@ -489,34 +580,73 @@ class ContractTest(TestCase):
         def mock_internal_transfer_instruction_side_effect(*args, **kwargs):
             return [kwargs["client_transaction_id"]]
 
-        mock_vault = Mock()
+        mock_vault = FakeVault(
+            account_id=account_id, modules=self.contract_module_runners
+        )
         mock_vault.make_internal_transfer_instructions.side_effect = (
             mock_internal_transfer_instruction_side_effect
         )
         mock_vault.get_postings.return_value = postings
         mock_vault.get_balance_timeseries.side_effect = mock_get_balance_timeseries
+        mock_vault.get_balances_observation.side_effect = mock_get_balances_observation
+        mock_vault.get_balances_timeseries.side_effect = mock_get_balances_timeseries
         mock_vault.get_parameter_timeseries.side_effect = mock_get_parameter_timeseries
         mock_vault.get_flag_timeseries.side_effect = mock_get_flag_timeseries
         mock_vault.get_client_transactions.return_value = client_transaction
         mock_vault.get_account_creation_date.return_value = creation_date
-        mock_vault.get_last_execution_time = mock_get_last_execution_time
+        mock_vault.get_last_execution_time.side_effect = mock_get_last_execution_time
         mock_vault.get_hook_execution_id.return_value = "MOCK_HOOK"
         mock_vault.instruct_posting_batch.return_value = ANY
-        mock_vault.account_id = account_id
         mock_vault.get_calendar_events.side_effect = mock_get_calendar_events
         mock_vault.get_alias.return_value = kwargs.get("alias")
-        mock_vault.modules = self.contract_module_runners
 
         return mock_vault
 
     def run_function(self, function_name: str, vault_object, *args, **kwargs):
-        return run(
-            compile(self.smart_contract, self.contract_file, "exec"),
-            function_name,
-            vault_object,
-            *args,
-            **kwargs,
-        )
+        with TIMING_RECORDER.time_hook(function_name):
+            return run(
+                compile_contract(self.smart_contract, self.contract_file),
+                function_name,
+                vault_object,
+                *args,
+                **kwargs,
+            )
+
+    def run_function_many(
+        self,
+        function_name: str,
+        vault_factory,
+        cases: List[Dict],
+        *args,
+        workers: Optional[int] = None,
+        expected_errors: Tuple[Type[Exception], ...] = CONTRACT_ERRORS,
+        **kwargs,
+    ) -> List[CaseResult]:
+        """
+        Runs `function_name` once per case, against the vault object `vault_factory(**case)`
+        returns, e.g. to sweep balances or parameters through a hook.
+        :param function_name: the function to run, as per run_function
+        :param vault_factory: creates a vault object from a case, e.g. self.create_mock
+        :param cases: the keyword arguments to create each case's vault object with
+        :param args: additional arguments to call `function_name` with for every case
+        :param workers: number of processes to split the cases across. Cases are run in this
+        process if not set
+        :param expected_errors: the exceptions recorded as a case's error. Any other exception
+        is raised
+        :param kwargs: additional named arguments to call `function_name` with for every case
+        :return: the return value or error, and the side effects recorded, for each case
+        """
+        with TIMING_RECORDER.time_hook(function_name):
+            return run_many(
+                compile_contract(self.smart_contract, self.contract_file),
+                function_name,
+                vault_factory,
+                cases,
+                *args,
+                workers=workers,
+                expected_errors=expected_errors,
+                **kwargs,
+            )
 
     def balance(self, net=None, debit=None, credit=None):
         """
@@ -891,11 +1021,60 @@ class ContractTest(TestCase):
         )
         return [(dt, balance_dict)]
 
+    def init_balance_history(
+        self, deltas: List[Tuple[datetime, List[Dict[str, str]]]]
+    ) -> BalanceTimeseries:
+        """
+        Creates a balance timeseries from the balance changes at each date, storing only the
+        changes rather than every dimension's balance at every date
+        :param deltas: List of (datetime, balance_defs) tuples in date order. Each balance def is
+        as per `init_balances`, but its net/dr/cr amounts are added to the dimension's balance
+        :return: BalanceTimeseries of the accumulated balances, usable as create_mock's balance_ts
+        """
+        return BalanceTimeseries.from_deltas(
+            (
+                (
+                    dt,
+                    balance_dimensions(
+                        address=balance_def.get("address", DEFAULT_ADDRESS).upper(),
+                        denomination=balance_def.get("denomination", DEFAULT_DENOMINATION),
+                        phase=balance_def.get("phase", Phase.COMMITTED),
+                        asset=balance_def.get("asset", DEFAULT_ASSET),
+                    ),
+                    balance(
+                        self.side,
+                        net=balance_def.get("net"),
+                        debit=balance_def.get("dr"),
+                        credit=balance_def.get("cr"),
+                    ),
+                )
+                for dt, balance_defs in deltas
+                for balance_def in balance_defs
+            ),
+            balance_class=Balance,
+            snapshot_class=BalanceDefaultDict,
+        )
+
+    def init_balances_observation(
+        self,
+        dt: Optional[datetime] = datetime(2019, 1, 1),
+        balance_defs: Optional[List[Dict[str, str]]] = None,
+    ) -> BalancesObservation:
+        """
+        Creates a balances observation, as returned by a BalancesObservationFetcher
+        :param dt: the value datetime of the observation
+        :param balance_defs: List(dict) the balances observed, as per `init_balances`
+        :return: BalancesObservation for the given balances
+        """
+        return BalancesObservation(
+            value_datetime=dt, balances=self.init_balances(dt, balance_defs)[0][1]
+        )
+
     @staticmethod
     def assert_no_side_effects(mock_vault):
         """
         Asserts that no postings, workflows or schedules were created/amended/deleted
-        param mock_vault: Mock, vault mock after test has run
+        param mock_vault: FakeVault, vault mock after test has run
         return:
         """
         mock_vault.make_internal_transfer_instructions.assert_not_called()
@@ -940,60 +1119,44 @@ class ContractModuleTest(ContractTest):
             cls.contract_module = content_file.read()
 
         if ENABLE_COVERAGE:
-            cls.cov = coverage.Coverage(
-                # Dont show coverage for files other than the contract module
-                include=[cls.contract_module_file]
-            )
-            cls.cov.start()
+            cls.cov = start_coverage(cls.contract_module_file)
 
     @classmethod
     def tearDownClass(cls):
         if ENABLE_COVERAGE:
-            cls.cov.stop()
-
-            dir_name = str(Path(cls.contract_module_file).stem) + "_coverage_reports"
-            report_path = Path(COVERAGE_TOP_DIR) / dir_name / "report"
-
-            report_path.parent.mkdir(parents=True, exist_ok=True)
-            with report_path.open(mode="w", encoding="utf-8") as report:
-                cls.cov.report(file=report)
-            cls.cov.xml_report(outfile=str(report_path) + ".xml")
+            stop_coverage(cls.cov, cls.contract_module_file)
 
     def run_function(self, function_name: str, vault_object, *args, **kwargs):
-        return run(
-            compile(self.contract_module, self.contract_module_file, "exec"),
-            function_name,
-            vault_object,
-            contract_module=True,
-            *args,
-            **kwargs,
-        )
-
-
-class TimeSeries(list):
-    def __init__(self, items, return_on_empty=None):
-        super().__init__(items)
-        self.return_on_empty = return_on_empty
-
-    def at(self, timestamp, inclusive=True):
-        for entry in reversed(self):
-            if entry[0] <= timestamp:
-                if inclusive or entry[0] < timestamp:
-                    return entry[1]
-
-        if self.return_on_empty is not None:
-            return self.return_on_empty
-
-        raise ValueError(f"No value in timeseries at {timestamp}")
-
-    def before(self, timestamp):
-        return self.at(timestamp, inclusive=False)
+        with TIMING_RECORDER.time_hook(function_name):
+            return run(
+                compile_contract(self.contract_module, self.contract_module_file),
+                function_name,
+                vault_object,
+                contract_module=True,
+                *args,
+                **kwargs,
+            )
 
-    def latest(self):
-        if not self:
-            if self.return_on_empty is not None:
-                return self.return_on_empty
-        return self[-1][1]
+    def run_function_many(
+        self,
+        function_name: str,
+        vault_factory,
+        cases: List[Dict],
+        *args,
+        workers: Optional[int] = None,
+        expected_errors: Tuple[Type[Exception], ...] = CONTRACT_ERRORS,
+        **kwargs,
+    ) -> List[CaseResult]:
+        with TIMING_RECORDER.time_hook(function_name):
+            return run_many(
+                compile_contract(self.contract_module, self.contract_module_file),
+                function_name,
+                vault_factory,
+                cases,
+                *args,
+                workers=workers,
+                expected_errors=expected_errors,
+                contract_module=True,
+                **kwargs,
+            )
 
-    def all(self):  # noqa: A003
-        return [item for item in self]
@@ -0,0 +1,122 @@
+# Copyright @ 2021 Thought Machine Group Limited. All rights reserved.
+import os
+import sys
+from types import CodeType
+from typing import Iterable, Optional, Set, TextIO
+
+# third party
+import coverage
+from coverage import CoverageData
+
+from common.test_utils.contracts.unit import CONTRACT_SANDBOX, compile_contract
+
+# sys.monitoring is only available from Python 3.12
+_MONITORING = getattr(sys, "monitoring", None)
+
+
+class ContractCoverage:
+    """
+    Measures line coverage of a single Smart Contract or Contract Module, without tracing any other
+    code in the process.
+
+    On Python 3.12+ line events are only enabled on the contract's compiled code objects through
+    sys.monitoring, and each line is disabled once it has been seen. On older versions a trace
+    function is installed that only traces frames of the contract file.
+
+    The executed lines are written as coverage.py data, so reports, XML reports and combining data
+    from several processes work exactly as they do for coverage.Coverage, which this mirrors.
+    """
+
+    def __init__(self, source_file: str, data_file: str, data_suffix: bool = False) -> None:
+        self.source_file = source_file
+        self.data_file = data_file
+        self.data_suffix = data_suffix
+        self._lines: Set[int] = set()
+        self._code_objects: Set[CodeType] = set()
+        self._tool_id: Optional[int] = None
+        self._previous_trace = None
+
+    def start(self) -> None:
+        with open(self.source_file, "r", encoding="utf-8") as content_file:
+            # The unit runner caches compiled contracts, so this is the code object tests run
+            code = compile_contract(content_file.read(), self.source_file)
+        self._code_objects = set(_code_objects(code))
+        # Have the contract executed again, so its module level lines are seen
+        CONTRACT_SANDBOX.clear()
+
+        if _MONITORING is not None:
+            self._tool_id = _free_tool_id()
+            _MONITORING.use_tool_id(self._tool_id, "contract_coverage")
+            _MONITORING.register_callback(
+                self._tool_id, _MONITORING.events.LINE, self._monitor_line
+            )
+            for code_object in self._code_objects:
+                _MONITORING.set_local_events(
+                    self._tool_id, code_object, _MONITORING.events.LINE
+                )
+            # Lines disabled by a previous collector would otherwise not be reported again
+            _MONITORING.restart_events()
+        else:
+            self._previous_trace = sys.gettrace()
+            sys.settrace(self._trace_call)
+
+    def stop(self) -> None:
+        if self._tool_id is not None:
+            for code_object in self._code_objects:
+                _MONITORING.set_local_events(self._tool_id, code_object, 0)
+            _MONITORING.register_callback(self._tool_id, _MONITORING.events.LINE, None)
+            _MONITORING.free_tool_id(self._tool_id)
+            self._tool_id = None
+        else:
+            sys.settrace(self._previous_trace)
+            self._previous_trace = None
+
+    def save(self) -> None:
+        self._write_data(suffix=self.data_suffix)
+
+    def report(self, file: Optional[TextIO] = None) -> float:
+        return self._coverage().report(file=file)
+
+    def xml_report(self, outfile: Optional[str] = None) -> float:
+        return self._coverage().xml_report(outfile=outfile)
+
+    def _coverage(self) -> coverage.Coverage:
+        self._write_data(suffix=False)
+        cov = coverage.Coverage(data_file=self.data_file, include=[self.source_file])
+        cov.load()
+        return cov
+
+    def _write_data(self, suffix: bool) -> None:
+        os.makedirs(os.path.dirname(os.path.abspath(self.data_file)), exist_ok=True)
+        data = CoverageData(basename=self.data_file, suffix=suffix)
+        data.add_lines({os.path.abspath(self.source_file): sorted(self._lines)})
+        data.write()
+
+    def _monitor_line(self, code: CodeType, line_number: int):
+        self._lines.add(line_number)
+        return _MONITORING.DISABLE
+
+    def _trace_call(self, frame, event, arg):
+        if frame.f_code.co_filename == self.source_file:
+            return self._trace_line
+        return None
+
+    def _trace_line(self, frame, event, arg):
+        if event == "line":
+            self._lines.add(frame.f_lineno)
+        return self._trace_line
+
+
+def _code_objects(code: CodeType) -> Iterable[CodeType]:
+    yield code
+    for const in code.co_consts:
+        if isinstance(const, CodeType):
+            yield from _code_objects(const)
+
+
+def _free_tool_id() -> int:
+    # Prefer the id reserved for coverage tools, unless coverage.py is already using it
+    for tool_id in sorted(range(6), key=lambda tool_id: tool_id != _MONITORING.COVERAGE_ID):
+        if _MONITORING.get_tool(tool_id) is None:
+            return tool_id
+    raise RuntimeError("No free sys.monitoring tool id to measure contract coverage")
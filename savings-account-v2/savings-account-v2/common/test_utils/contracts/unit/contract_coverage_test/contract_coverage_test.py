@@ -0,0 +1,58 @@
+import os
+from datetime import datetime
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+
+from common.test_utils.contracts.unit import compile_contract, run
+from common.test_utils.contracts.unit.contract_coverage import ContractCoverage
+from common.test_utils.contracts.unit.fake_vault import FakeVault
+
+CONTRACT_FILE = (
+    "common/test_utils/contracts/unit/contract_coverage_test/"
+    "contract_coverage_test_contract.py"
+)
+DEFAULT_DATE = datetime(2019, 1, 1)
+
+
+class ContractCoverageTest(TestCase):
+    def test_reports_executed_contract_lines_only(self):
+        with open(CONTRACT_FILE, "r", encoding="utf-8") as content_file:
+            code = compile_contract(content_file.read(), CONTRACT_FILE)
+
+        with TemporaryDirectory() as data_dir:
+            cov = ContractCoverage(CONTRACT_FILE, data_file=os.path.join(data_dir, ".coverage"))
+            cov.start()
+            result = run(code, "pre_posting_code", FakeVault(), ["posting"], DEFAULT_DATE)
+            cov.stop()
+
+            report_path = os.path.join(data_dir, "report.xml")
+            cov.xml_report(outfile=report_path)
+            with open(report_path, "r", encoding="utf-8") as report:
+                xml_report = report.read()
+
+        self.assertEqual(result, 3)
+        # Module level, pre_posting_code's credit branch and _add were run
+        for line in (3, 6, 12, 13, 15, 21):
+            self.assertIn(f'<line number="{line}" hits="1"/>', xml_report)
+        self.assertIn('<line number="17" hits="0"/>', xml_report)
+        self.assertNotIn("contract_coverage_test.py", xml_report)
+
+    def test_reports_module_lines_of_already_executed_contract(self):
+        with open(CONTRACT_FILE, "r", encoding="utf-8") as content_file:
+            code = compile_contract(content_file.read(), CONTRACT_FILE)
+        # e.g. run by a test class before this one
+        run(code, "pre_posting_code", FakeVault(), [], DEFAULT_DATE)
+
+        with TemporaryDirectory() as data_dir:
+            cov = ContractCoverage(CONTRACT_FILE, data_file=os.path.join(data_dir, ".coverage"))
+            cov.start()
+            run(code, "pre_posting_code", FakeVault(), [], DEFAULT_DATE)
+            cov.stop()
+
+            report_path = os.path.join(data_dir, "report.xml")
+            cov.xml_report(outfile=report_path)
+            with open(report_path, "r", encoding="utf-8") as report:
+                xml_report = report.read()
+
+        for line in (3, 6, 12):
+            self.assertIn(f'<line number="{line}" hits="1"/>', xml_report)
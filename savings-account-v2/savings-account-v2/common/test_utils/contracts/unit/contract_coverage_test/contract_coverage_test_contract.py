@@ -0,0 +1,21 @@
+# A sample contract to test that ContractCoverage reports
+# the same lines as coverage.py.
+display_name = "Contract Coverage Product"
+api = "3.9.0"
+version = "0.1.0"
+tside = Tside.LIABILITY
+supported_denominations = ["GBP"]
+parameters = []
+
+
+def pre_posting_code(postings, effective_date):
+    if postings:
+        x = 1
+        y = 2
+        return _add(x, y)
+    else:
+        return
+
+
+def _add(x, y):
+    return x + y
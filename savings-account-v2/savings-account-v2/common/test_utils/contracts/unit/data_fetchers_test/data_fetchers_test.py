@@ -0,0 +1,57 @@
+from datetime import datetime
+from decimal import Decimal
+
+from common.test_utils.contracts.unit.common import ContractTest
+from common.test_utils.contracts.unit.types_extension import DEFAULT_ADDRESS
+
+CONTRACT_FILE = (
+    "common/test_utils/contracts/unit/data_fetchers_test/data_fetchers_test_contract.py"
+)
+DEFAULT_DATE = datetime(2019, 1, 1)
+
+
+class DataFetchersTest(ContractTest):
+    contract_file = CONTRACT_FILE
+
+    def test_balances_observation_fetcher_returns_provided_observation(self):
+        observation = self.init_balances_observation(
+            dt=DEFAULT_DATE, balance_defs=[{"address": DEFAULT_ADDRESS, "net": "100"}]
+        )
+        mock_vault = self.create_mock(
+            balances_observation_fetchers_mapping={
+                "EFFECTIVE_DATE_BALANCES": observation
+            }
+        )
+
+        result = self.run_function("scheduled_code", mock_vault, "OBSERVE", DEFAULT_DATE)
+
+        self.assertEqual(result, Decimal("100"))
+        self.assertEqual(observation.value_datetime, DEFAULT_DATE)
+        mock_vault.get_balances_observation.assert_called_once_with(
+            fetcher_id="EFFECTIVE_DATE_BALANCES"
+        )
+
+    def test_balances_observation_fetcher_without_observation_raises(self):
+        mock_vault = self.create_mock()
+
+        with self.assertRaises(ValueError) as ctx:
+            self.run_function("scheduled_code", mock_vault, "OBSERVE", DEFAULT_DATE)
+
+        self.assertIn("EFFECTIVE_DATE_BALANCES", str(ctx.exception))
+
+    def test_balances_interval_fetcher_returns_provided_timeseries(self):
+        balance_ts = self.init_balances(
+            dt=DEFAULT_DATE, balance_defs=[{"address": DEFAULT_ADDRESS, "net": "50"}]
+        ) + self.init_balances(
+            dt=datetime(2019, 1, 1, 12),
+            balance_defs=[{"address": DEFAULT_ADDRESS, "net": "75"}],
+        )
+        mock_vault = self.create_mock(
+            balances_interval_fetchers_mapping={"ONE_DAY_BALANCES": balance_ts}
+        )
+
+        result = self.run_function(
+            "post_posting_code", mock_vault, [], datetime(2019, 1, 1, 6)
+        )
+
+        self.assertEqual(result, Decimal("50"))
@@ -0,0 +1,33 @@
+# A sample contract to test that optimised data fetchers
+# can be declared and read from the mock vault.
+display_name = "Data Fetchers Product"
+api = "3.12.0"
+version = "0.1.0"
+tside = Tside.LIABILITY
+supported_denominations = ["GBP"]
+parameters = []
+
+data_fetchers = [
+    BalancesObservationFetcher(
+        fetcher_id="EFFECTIVE_DATE_BALANCES",
+        at=DefinedDateTime.EFFECTIVE_TIME,
+    ),
+    BalancesIntervalFetcher(
+        fetcher_id="ONE_DAY_BALANCES",
+        start=RelativeDateTime(origin=DefinedDateTime.EFFECTIVE_TIME, shift=Shift(days=-1)),
+        end=DefinedDateTime.EFFECTIVE_TIME,
+    ),
+]
+
+
+@requires(event_type="OBSERVE", parameters=True)
+@fetch_account_data(event_type="OBSERVE", balances=["EFFECTIVE_DATE_BALANCES"])
+def scheduled_code(event_type, effective_date):
+    balances = vault.get_balances_observation(fetcher_id="EFFECTIVE_DATE_BALANCES").balances
+    return balances[(DEFAULT_ADDRESS, DEFAULT_ASSET, "GBP", Phase.COMMITTED)].net
+
+
+@fetch_account_data(balances=["ONE_DAY_BALANCES"])
+def post_posting_code(postings, effective_date):
+    balances = vault.get_balances_timeseries(fetcher_id="ONE_DAY_BALANCES").at(effective_date)
+    return balances[(DEFAULT_ADDRESS, DEFAULT_ASSET, "GBP", Phase.COMMITTED)].net
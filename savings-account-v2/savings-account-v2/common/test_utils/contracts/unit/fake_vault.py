@@ -0,0 +1,260 @@
+# Copyright @ 2021 Thought Machine Group Limited. All rights reserved.
+from typing import Any, List, Optional, Tuple
+from unittest.mock import DEFAULT, Mock, call
+
+# The vault object methods available to Smart Contracts
+VAULT_METHODS = (
+    "add_account_note",
+    "amend_schedule",
+    "get_account_creation_date",
+    "get_alias",
+    "get_balance_timeseries",
+    "get_balances_observation",
+    "get_balances_timeseries",
+    "get_calendar_events",
+    "get_client_transactions",
+    "get_flag_timeseries",
+    "get_hook_directives",
+    "get_hook_execution_id",
+    "get_last_execution_time",
+    "get_parameter_timeseries",
+    "get_permitted_denominations",
+    "get_posting_batches",
+    "get_postings",
+    "instruct_posting_batch",
+    "localize_datetime",
+    "make_internal_transfer_instructions",
+    "remove_schedule",
+    "start_workflow",
+    "update_event_type",
+)
+
+
+def _is_exception(side_effect: Any) -> bool:
+    return isinstance(side_effect, BaseException) or (
+        isinstance(side_effect, type) and issubclass(side_effect, BaseException)
+    )
+
+
+class VaultMethod:
+    """
+    A method of the FakeVault. Calls are handled like those of unittest.mock.Mock: a
+    `side_effect` exception is raised, a callable is called and an iterable returns its next
+    item. Otherwise, or if the callable returns DEFAULT, they return `return_value`, which is a
+    Mock unless set. Each call is recorded as an (args, kwargs) tuple and the assertions mirror
+    those of Mock, so tests can use either interchangeably.
+    """
+
+    __slots__ = ("name", "_side_effect", "_return_value", "_calls")
+
+    def __init__(
+        self,
+        name: str,
+        side_effect: Any = None,
+        return_value: Any = DEFAULT,
+    ) -> None:
+        self.name = name
+        self.side_effect = side_effect
+        self._return_value = return_value
+        self._calls: List[Tuple[tuple, dict]] = []
+
+    @property
+    def side_effect(self) -> Any:
+        return self._side_effect
+
+    @side_effect.setter
+    def side_effect(self, side_effect: Any) -> None:
+        if side_effect is not None and not callable(side_effect) and not _is_exception(
+            side_effect
+        ):
+            side_effect = iter(side_effect)
+        self._side_effect = side_effect
+
+    @property
+    def return_value(self) -> Any:
+        if self._return_value is DEFAULT:
+            self._return_value = Mock(name=f"{self.name}()")
+        return self._return_value
+
+    @return_value.setter
+    def return_value(self, return_value: Any) -> None:
+        self._return_value = return_value
+
+    def __call__(self, *args, **kwargs):
+        self._calls.append((args, kwargs))
+        side_effect = self._side_effect
+        if side_effect is None:
+            return self.return_value
+        if _is_exception(side_effect):
+            raise side_effect
+        if callable(side_effect):
+            result = side_effect(*args, **kwargs)
+        else:
+            result = next(side_effect)
+            if _is_exception(result):
+                raise result
+        if result is DEFAULT:
+            return self.return_value
+        return result
+
+    @property
+    def called(self) -> bool:
+        return bool(self._calls)
+
+    @property
+    def call_count(self) -> int:
+        return len(self._calls)
+
+    @property
+    def call_args(self) -> Optional[tuple]:
+        if not self._calls:
+            return None
+        args, kwargs = self._calls[-1]
+        return call(*args, **kwargs)
+
+    @property
+    def call_args_list(self) -> List[tuple]:
+        return [call(*args, **kwargs) for args, kwargs in self._calls]
+
+    def reset_mock(self) -> None:
+        self._calls.clear()
+
+    def assert_called(self) -> None:
+        if not self._calls:
+            raise AssertionError(f"Expected '{self.name}' to have been called.")
+
+    def assert_called_once(self) -> None:
+        if len(self._calls) != 1:
+            raise AssertionError(
+                f"Expected '{self.name}' to have been called once. "
+                f"Called {len(self._calls)} times.{self._format_calls()}"
+            )
+
+    def assert_not_called(self) -> None:
+        if self._calls:
+            raise AssertionError(
+                f"Expected '{self.name}' to not have been called. "
+                f"Called {len(self._calls)} times.{self._format_calls()}"
+            )
+
+    def assert_called_with(self, *args, **kwargs) -> None:
+        expected = call(*args, **kwargs)
+        if not self._calls:
+            raise AssertionError(
+                f"expected call not found.\nExpected: {self._format(expected)}\n"
+                f"Actual: not called."
+            )
+        if self.call_args != expected:
+            raise AssertionError(
+                f"expected call not found.\nExpected: {self._format(expected)}\n"
+                f"Actual: {self._format(self.call_args)}"
+            )
+
+    def assert_called_once_with(self, *args, **kwargs) -> None:
+        self.assert_called_once()
+        self.assert_called_with(*args, **kwargs)
+
+    def assert_any_call(self, *args, **kwargs) -> None:
+        expected = call(*args, **kwargs)
+        if expected not in self.call_args_list:
+            raise AssertionError(
+                f"{self._format(expected)} call not found.{self._format_calls()}"
+            )
+
+    def assert_has_calls(self, calls: List[tuple], any_order: bool = False) -> None:
+        expected = list(calls)
+        actual = self.call_args_list
+        if any_order:
+            missing = [
+                expected_call for expected_call in expected if expected_call not in actual
+            ]
+            if missing:
+                raise AssertionError(
+                    f"{missing} not all found in call list.{self._format_calls()}"
+                )
+            return
+
+        for start in range(len(actual) - len(expected) + 1):
+            if actual[start : start + len(expected)] == expected:
+                return
+        raise AssertionError(
+            f"Calls not found.\nExpected: {expected}{self._format_calls()}"
+        )
+
+    def assert_no_call(self, *args, **kwargs) -> None:
+        try:
+            self.assert_called_with(*args, **kwargs)
+        except AssertionError:
+            return
+        raise AssertionError(
+            f"Expected {self._format(call(*args, **kwargs))} not to have been called"
+        )
+
+    def _format(self, expected_call: tuple) -> str:
+        return f"{self.name}{str(expected_call)[4:]}"
+
+    def _format_calls(self) -> str:
+        if not self._calls:
+            return ""
+        return "\nCalls: " + ", ".join(
+            self._format(recorded_call) for recorded_call in self.call_args_list
+        )
+
+
+class FakeVault:
+    """
+    A lightweight stand-in for the vault object passed to Smart Contract hooks. Every vault API
+    method is a VaultMethod, configured through its `side_effect` or `return_value`. As with a
+    Mock, any other attribute can be set, and reading one that has not been set returns a Mock.
+    Those other attributes are kept in a dict created the first time one is used, so that
+    instances only pay for it when a test needs it.
+    """
+
+    __slots__ = ("account_id", "modules", "_extra_attributes") + VAULT_METHODS
+
+    def __init__(self, account_id: str = "Main account", modules: Any = None) -> None:
+        self.account_id = account_id
+        self.modules = modules
+        self._extra_attributes = None
+        for method_name in VAULT_METHODS:
+            setattr(self, method_name, VaultMethod(method_name))
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        if name in _FAKE_VAULT_SLOTS:
+            object.__setattr__(self, name, value)
+        else:
+            self._attributes()[name] = value
+
+    def __delattr__(self, name: str) -> None:
+        if name in _FAKE_VAULT_SLOTS:
+            object.__delattr__(self, name)
+        elif name in (self._extra_attributes or {}):
+            del self._extra_attributes[name]
+        else:
+            raise AttributeError(name)
+
+    def __getattr__(self, name: str) -> Any:
+        # Only called for attributes that have not been set
+        if name.startswith("__") or name in _FAKE_VAULT_SLOTS:
+            raise AttributeError(name)
+        attributes = self._attributes()
+        if name not in attributes:
+            attributes[name] = Mock(name=name)
+        return attributes[name]
+
+    def _attributes(self) -> dict:
+        if self._extra_attributes is None:
+            self._extra_attributes = {}
+        return self._extra_attributes
+
+    def reset_mock(self) -> None:
+        for method_name in VAULT_METHODS:
+            method = getattr(self, method_name)
+            if isinstance(method, VaultMethod):
+                method.reset_mock()
+        for attribute in (self._extra_attributes or {}).values():
+            if isinstance(attribute, Mock):
+                attribute.reset_mock()
+
+
+_FAKE_VAULT_SLOTS = frozenset(FakeVault.__slots__)
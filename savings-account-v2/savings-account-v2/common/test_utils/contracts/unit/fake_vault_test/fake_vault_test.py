@@ -0,0 +1,146 @@
+from datetime import datetime
+from decimal import Decimal
+from unittest import TestCase
+from unittest.mock import ANY, DEFAULT, Mock, call
+
+from common.test_utils.common.balance_timeseries import BalanceTimeseries
+from common.test_utils.contracts.unit.common import ContractTest
+from common.test_utils.contracts.unit.fake_vault import FakeVault
+
+CONTRACT_FILE = "common/test_utils/contracts/unit/run_cache_test/run_cache_test_contract.py"
+DEFAULT_DATE = datetime(2019, 1, 1)
+
+
+class FakeVaultTest(TestCase):
+    def test_side_effect_takes_precedence_over_return_value(self):
+        vault = FakeVault()
+        vault.get_alias.return_value = "casa"
+        vault.get_hook_execution_id.return_value = "MOCK_HOOK"
+        vault.get_hook_execution_id.side_effect = lambda: "SIDE_EFFECT"
+
+        self.assertEqual(vault.get_alias(), "casa")
+        self.assertEqual(vault.get_hook_execution_id(), "SIDE_EFFECT")
+
+    def test_calls_recorded_and_asserted_like_mock(self):
+        vault = FakeVault()
+
+        vault.instruct_posting_batch(posting_instructions=["a"], effective_date=DEFAULT_DATE)
+        vault.instruct_posting_batch(posting_instructions=["b"], effective_date=DEFAULT_DATE)
+
+        self.assertEqual(vault.instruct_posting_batch.call_count, 2)
+        self.assertEqual(
+            vault.instruct_posting_batch.call_args_list,
+            [
+                call(posting_instructions=["a"], effective_date=DEFAULT_DATE),
+                call(posting_instructions=["b"], effective_date=DEFAULT_DATE),
+            ],
+        )
+        vault.instruct_posting_batch.assert_called_with(
+            posting_instructions=["b"], effective_date=ANY
+        )
+        vault.instruct_posting_batch.assert_any_call(
+            posting_instructions=["a"], effective_date=DEFAULT_DATE
+        )
+        vault.instruct_posting_batch.assert_has_calls(
+            [call(posting_instructions=["b"], effective_date=DEFAULT_DATE)]
+        )
+        vault.instruct_posting_batch.assert_no_call(
+            posting_instructions=["a"], effective_date=DEFAULT_DATE
+        )
+        vault.start_workflow.assert_not_called()
+        with self.assertRaises(AssertionError):
+            vault.instruct_posting_batch.assert_called_once()
+        with self.assertRaises(AssertionError):
+            vault.instruct_posting_batch.assert_not_called()
+
+    def test_side_effect_handled_like_mock(self):
+        vault = FakeVault()
+        vault.get_hook_execution_id.side_effect = ["FIRST", ValueError("second"), "THIRD"]
+        vault.get_alias.side_effect = KeyError
+        vault.get_postings.side_effect = ValueError("postings")
+        vault.get_posting_batches.return_value = ["batch"]
+        vault.get_posting_batches.side_effect = lambda: DEFAULT
+
+        self.assertEqual(vault.get_hook_execution_id(), "FIRST")
+        with self.assertRaises(ValueError):
+            vault.get_hook_execution_id()
+        self.assertEqual(vault.get_hook_execution_id(), "THIRD")
+        with self.assertRaises(StopIteration):
+            vault.get_hook_execution_id()
+        with self.assertRaises(KeyError):
+            vault.get_alias()
+        with self.assertRaises(ValueError):
+            vault.get_postings()
+        self.assertEqual(vault.get_posting_batches(), ["batch"])
+        self.assertEqual(vault.get_hook_execution_id.call_count, 4)
+
+    def test_unconfigured_method_returns_same_mock(self):
+        vault = FakeVault()
+
+        localized = vault.localize_datetime(dt=DEFAULT_DATE)
+
+        self.assertIsInstance(localized, Mock)
+        self.assertIs(vault.localize_datetime(dt=DEFAULT_DATE), localized)
+        self.assertIsInstance(vault.get_permitted_denominations(), Mock)
+
+    def test_other_attributes_behave_like_mock(self):
+        vault = FakeVault()
+
+        vault.not_a_vault_attribute = 1
+        vault.not_a_vault_method.return_value = "value"
+
+        self.assertEqual(vault.not_a_vault_attribute, 1)
+        self.assertEqual(vault.not_a_vault_method(), "value")
+        vault.not_a_vault_method.assert_called_once_with()
+        vault.reset_mock()
+        vault.not_a_vault_method.assert_not_called()
+        del vault.not_a_vault_attribute
+        self.assertIsInstance(vault.not_a_vault_attribute, Mock)
+
+    def test_instances_have_no_dict(self):
+        vault = FakeVault()
+
+        self.assertFalse(hasattr(vault, "__dict__"))
+        self.assertIsNone(vault._extra_attributes)
+        vault.localize_datetime.return_value = DEFAULT_DATE
+        vault.account_id = "casa_1"
+        self.assertIsNone(vault._extra_attributes)
+        self.assertEqual(vault.localize_datetime(), DEFAULT_DATE)
+
+
+class CreateMockTest(ContractTest):
+    contract_file = CONTRACT_FILE
+
+    def test_create_mock_configures_fake_vault(self):
+        vault = self.create_mock(
+            account_id="casa_1",
+            creation_date=DEFAULT_DATE,
+            interest_rate=Decimal("0.01"),
+            DAILY_ACCRUE_INTEREST=DEFAULT_DATE,
+        )
+
+        self.assertIsInstance(vault, FakeVault)
+        self.assertEqual(vault.account_id, "casa_1")
+        self.assertEqual(vault.get_account_creation_date(), DEFAULT_DATE)
+        self.assertEqual(
+            vault.get_parameter_timeseries(name="interest_rate").latest(),
+            Decimal("0.01"),
+        )
+        self.assertEqual(
+            vault.get_last_execution_time(event_type="DAILY_ACCRUE_INTEREST"), DEFAULT_DATE
+        )
+        self.assertEqual(
+            vault.make_internal_transfer_instructions(client_transaction_id="ID"), ["ID"]
+        )
+        vault.get_parameter_timeseries.assert_called_once_with(name="interest_rate")
+        self.assert_no_side_effects(self.create_mock())
+
+    def test_create_mock_returns_balance_timeseries_as_is(self):
+        balance_ts = BalanceTimeseries()
+
+        vault = self.create_mock(balance_ts=balance_ts)
+
+        self.assertIs(vault.get_balance_timeseries(), balance_ts)
+        self.assertEqual(
+            self.run_function("pre_posting_code", vault, [], DEFAULT_DATE)[0], "Main account"
+        )
@@ -0,0 +1,371 @@
+# Copyright @ 2021 Thought Machine Group Limited. All rights reserved.
+"""
+Runs ContractTest and ContractModuleTest suites across a pool of worker processes.
+
+Test methods are sorted by id and split into CHUNKS_PER_WORKER contiguous chunks per worker, so
+that workers which finish early pick up more chunks. A test class runs its setUpClass once for
+each chunk its tests fall in, rather than once per test. Each worker compiles and executes the
+Smart Contracts and Contract Modules under test once, when it starts. When
+INCEPTION_UNIT_TEST_COVERAGE is set, each worker saves its coverage data and the reports are
+written once from the combined data.
+
+Any other tests found, e.g. SupervisorContractTest or plain TestCase tests, are run in the main
+process once the workers have finished.
+
+Run from the repository root, e.g.
+    python -m common.test_utils.contracts.unit.parallel casa/contracts/tests/unit --workers 4
+"""
+# standard libs
+import argparse
+import os
+import sys
+import time
+import unittest
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterable, List, Optional, Set, Tuple
+
+# third party
+import coverage
+
+# common
+import common.test_utils.contracts.unit.common as unit_common
+from common.test_utils.contracts.unit import CONTRACT_SANDBOX, compile_contract
+from common.test_utils.contracts.unit.common import ContractModuleTest, ContractTest
+from common.test_utils.contracts.unit.timing import (
+    TIMING_RECORDER,
+    ContractTestTiming,
+    slowest_summary,
+    write_timings,
+)
+
+TEST_FILE_PATTERNS = ("*_test.py", "test_*.py")
+CHUNKS_PER_WORKER = 4
+UNSUCCESSFUL_OUTCOMES = ("error", "failed", "unexpected success")
+
+
+@dataclass
+class TimingRecord:
+    test_id: str
+    outcome: str
+    duration: float
+    details: str = ""
+    # The test's setup, run and hook timings, as recorded by ContractTest
+    contract_timing: Optional[ContractTestTiming] = None
+
+
+class _TimingResult(unittest.TestResult):
+    """
+    Records the outcome and duration of each test it runs
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        # Hide the tests' own output, which would otherwise interleave across workers
+        self.buffer = True
+        self.timings: List[TimingRecord] = []
+        self._started_at = 0.0
+        self._outcome = ("passed", "")
+
+    def startTest(self, test):
+        super().startTest(test)
+        self._outcome = ("passed", "")
+        self._started_at = time.perf_counter()
+
+    def stopTest(self, test):
+        duration = time.perf_counter() - self._started_at
+        super().stopTest(test)
+        outcome, details = self._outcome
+        contract_timing = None
+        if TIMING_RECORDER.timings and TIMING_RECORDER.timings[-1].test_id == test.id():
+            contract_timing = TIMING_RECORDER.timings[-1]
+        self.timings.append(
+            TimingRecord(test.id(), outcome, duration, details, contract_timing)
+        )
+
+    def addError(self, test, err):
+        super().addError(test, err)
+        self._record("error", test, err)
+
+    def addFailure(self, test, err):
+        super().addFailure(test, err)
+        self._record("failed", test, err)
+
+    def addSubTest(self, test, subtest, err):
+        super().addSubTest(test, subtest, err)
+        if err is not None:
+            if issubclass(err[0], test.failureException):
+                self._record("failed", subtest, err)
+            else:
+                self._record("error", subtest, err)
+
+    def addSkip(self, test, reason):
+        super().addSkip(test, reason)
+        self._outcome = ("skipped", reason)
+
+    def addExpectedFailure(self, test, err):
+        super().addExpectedFailure(test, err)
+        self._outcome = ("expected failure", "")
+
+    def addUnexpectedSuccess(self, test):
+        super().addUnexpectedSuccess(test)
+        self._outcome = ("unexpected success", "")
+
+    def _record(self, outcome: str, test: unittest.TestCase, err) -> None:
+        details = self._exc_info_to_string(err, test)
+        if isinstance(test, unittest.TestCase):
+            self._outcome = (outcome, details)
+        else:
+            # Errors in setUpClass/tearDownClass are reported against a placeholder test
+            self.timings.append(TimingRecord(str(test), outcome, 0.0, details))
+
+
+def find_test_modules(paths: Iterable[str]) -> List[str]:
+    """
+    Lists the test modules under `paths`, which may be test files or directories to search.
+    Paths are relative to the repository root, which must be the working directory.
+    """
+    test_files = set()
+    for path in map(Path, paths):
+        if path.is_dir():
+            for pattern in TEST_FILE_PATTERNS:
+                test_files.update(path.rglob(pattern))
+        else:
+            test_files.add(path)
+    return sorted(
+        ".".join(test_file.with_suffix("").parts)
+        for test_file in test_files
+        if "__pycache__" not in test_file.parts
+    )
+
+
+def load_contract_tests(
+    test_modules: Iterable[str],
+) -> Tuple[List[ContractTest], List[unittest.TestCase], List[str]]:
+    """
+    Loads the tests defined in `test_modules`, separating the ContractTest tests that can be
+    sharded across workers from any others
+    :return: the ContractTest tests and the other tests, each sorted by id, and any errors raised
+    importing the modules
+    """
+    loader = unittest.TestLoader()
+    tests, other_tests, errors = [], [], []
+    for test_module in test_modules:
+        try:
+            suite = loader.loadTestsFromName(test_module)
+        except Exception as e:
+            errors.append(f"{test_module}: {e!r}")
+            continue
+        for test in _flatten(suite):
+            if isinstance(test, ContractTest):
+                tests.append(test)
+            else:
+                other_tests.append(test)
+    errors.extend(loader.errors)
+    return (
+        sorted(tests, key=lambda test: test.id()),
+        sorted(other_tests, key=lambda test: test.id()),
+        errors,
+    )
+
+
+def shard(test_ids: List[str], num_shards: int) -> List[List[str]]:
+    """
+    Splits the sorted `test_ids` into at most `num_shards` contiguous, similarly sized chunks
+    """
+    num_shards = max(1, min(num_shards, len(test_ids)))
+    chunk_size, remainder = divmod(len(test_ids), num_shards)
+    chunks, start = [], 0
+    for index in range(num_shards):
+        end = start + chunk_size + (1 if index < remainder else 0)
+        chunks.append(test_ids[start:end])
+        start = end
+    return [chunk for chunk in chunks if chunk]
+
+
+def source_files(tests: Iterable[ContractTest]) -> Set[str]:
+    """
+    The Smart Contract and Contract Module files the tests run against
+    """
+    files = set()
+    for test in tests:
+        if isinstance(test, ContractModuleTest):
+            files.add(test.contract_module_file)
+        else:
+            files.add(test.contract_file)
+    return {source_file for source_file in files if source_file}
+
+
+def run_tests(
+    test_modules: Iterable[str], workers: Optional[int] = None
+) -> Tuple[List[TimingRecord], List[str]]:
+    """
+    Runs the ContractTest tests in `test_modules` across `workers` processes, followed by any
+    other tests in this process
+    :return: the timing of each test, and any errors raised loading the tests
+    """
+    tests, other_tests, errors = load_contract_tests(test_modules)
+    timings = []
+    if tests:
+        timings.extend(_run_contract_tests(tests, workers))
+    if other_tests:
+        # Run after the workers, which would otherwise be forked with the tests' state
+        timings.extend(_run_suite(unittest.TestSuite(other_tests)))
+    return timings, errors
+
+
+def timing_report(timings: List[TimingRecord]) -> str:
+    """
+    Formats the timings as a table, slowest test first
+    """
+    width = max([len("Test")] + [len(timing.test_id) for timing in timings])
+    lines = [f"{'Test':<{width}} {'Outcome':<18} {'Duration (s)':>12}"]
+    for timing in sorted(timings, key=lambda timing: timing.duration, reverse=True):
+        lines.append(
+            f"{timing.test_id:<{width}} {timing.outcome:<18} {timing.duration:>12.3f}"
+        )
+    total = sum(timing.duration for timing in timings)
+    lines.append(f"{len(timings)} tests, {round(total, 2)}s in tests")
+    return "\n".join(lines)
+
+
+def _flatten(suite: unittest.TestSuite) -> Iterable[unittest.TestCase]:
+    for test in suite:
+        if isinstance(test, unittest.TestSuite):
+            yield from _flatten(test)
+        else:
+            yield test
+
+
+def _init_worker(files: List[str], coverage_enabled: bool) -> None:
+    """
+    Compiles and executes each contract once for the lifetime of the worker, so that tests only
+    bind per-call globals. Executing is left to the first test when coverage is enabled, so that
+    the contracts' module level lines are still covered.
+    """
+    unit_common.DEFER_COVERAGE_REPORTS = coverage_enabled
+    for source_file in files:
+        try:
+            with open(source_file, "r", encoding="utf-8") as content_file:
+                code = compile_contract(content_file.read(), source_file)
+            if not coverage_enabled:
+                CONTRACT_SANDBOX.execute(code)
+        except Exception:
+            # Leave the error to be reported by the tests that use the file
+            continue
+
+
+def _run_contract_tests(
+    tests: List[ContractTest], workers: Optional[int]
+) -> List[TimingRecord]:
+    workers = workers or os.cpu_count() or 1
+    files = sorted(source_files(tests))
+    coverage_enabled = bool(unit_common.ENABLE_COVERAGE)
+    if coverage_enabled:
+        _remove_coverage_data(files)
+
+    chunks = shard([test.id() for test in tests], workers * CHUNKS_PER_WORKER)
+    timings = []
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=_init_worker,
+        initargs=(files, coverage_enabled),
+    ) as executor:
+        for chunk_timings in executor.map(_run_chunk, chunks):
+            timings.extend(chunk_timings)
+
+    if coverage_enabled:
+        _combine_coverage(files)
+
+    return timings
+
+
+def _run_chunk(test_ids: List[str]) -> List[TimingRecord]:
+    return _run_suite(unittest.TestLoader().loadTestsFromNames(test_ids))
+
+
+def _run_suite(suite: unittest.TestSuite) -> List[TimingRecord]:
+    result = _TimingResult()
+    suite.run(result)
+    return result.timings
+
+
+def _remove_coverage_data(files: Iterable[str]) -> None:
+    for source_file in files:
+        data_dir = unit_common.coverage_report_path(source_file).parent
+        for data_file in data_dir.glob(".coverage*"):
+            data_file.unlink()
+
+
+def _combine_coverage(files: Iterable[str]) -> None:
+    for source_file in files:
+        data_dir = unit_common.coverage_report_path(source_file).parent
+        if not list(data_dir.glob(".coverage.*")):
+            continue
+        cov = coverage.Coverage(
+            data_file=str(data_dir / ".coverage"), include=[source_file]
+        )
+        cov.combine(data_paths=[str(data_dir)])
+        cov.save()
+        unit_common.write_coverage_report(cov, source_file)
+
+
+def process_args(args: list) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Runs ContractTest unit tests across a pool of worker processes."
+    )
+    parser.add_argument(
+        "paths",
+        nargs="+",
+        help="Test files, or directories to search for *_test.py and test_*.py files",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=os.cpu_count(),
+        help="Number of worker processes [Default: number of CPUs]",
+    )
+    parser.add_argument(
+        "--timing-report",
+        default=None,
+        help="File to also write the per-test timing report to",
+    )
+    parser.add_argument(
+        "--timing-json",
+        default=None,
+        help="File to write the tests' setup, run and hook timings to as JSON, which can be "
+        "compared against a baseline with common.test_utils.contracts.unit.timing",
+    )
+    return parser.parse_args(args)
+
+
+def main(args: list) -> int:
+    known_args = process_args(args)
+    timings, errors = run_tests(find_test_modules(known_args.paths), known_args.workers)
+
+    report = timing_report(timings)
+    print(report)
+    if known_args.timing_report:
+        Path(known_args.timing_report).write_text(report + "\n", encoding="utf-8")
+
+    contract_timings = [
+        timing.contract_timing for timing in timings if timing.contract_timing
+    ]
+    if known_args.timing_json:
+        write_timings(contract_timings, known_args.timing_json)
+        print(slowest_summary(contract_timings))
+
+    unsuccessful = [
+        timing for timing in timings if timing.outcome in UNSUCCESSFUL_OUTCOMES
+    ]
+    for timing in unsuccessful:
+        print(f"\n{timing.outcome.upper()}: {timing.test_id}\n{timing.details}")
+    for error in errors:
+        print(f"\nERROR loading tests:\n{error}")
+
+    return 1 if unsuccessful or errors or not timings else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
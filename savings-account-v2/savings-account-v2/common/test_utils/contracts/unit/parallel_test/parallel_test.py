@@ -0,0 +1,111 @@
+import unittest
+from unittest import TestCase, expectedFailure
+
+from common.test_utils.contracts.unit.parallel import (
+    TimingRecord,
+    _run_suite,
+    find_test_modules,
+    load_contract_tests,
+    run_tests,
+    shard,
+    timing_report,
+)
+
+RUN_CACHE_TEST_DIR = "common/test_utils/contracts/unit/run_cache_test"
+RUN_CACHE_TEST_MODULE = "common.test_utils.contracts.unit.run_cache_test.run_cache_test"
+FAKE_VAULT_TEST_MODULE = "common.test_utils.contracts.unit.fake_vault_test.fake_vault_test"
+
+
+class ParallelRunnerTest(TestCase):
+    def test_shard_splits_into_contiguous_chunks(self):
+        test_ids = [f"test_{index}" for index in range(7)]
+
+        chunks = shard(test_ids, 3)
+
+        self.assertEqual(
+            chunks,
+            [["test_0", "test_1", "test_2"], ["test_3", "test_4"], ["test_5", "test_6"]],
+        )
+        self.assertEqual(shard(test_ids[:2], 4), [["test_0"], ["test_1"]])
+
+    def test_find_test_modules_skips_contracts(self):
+        self.assertEqual(find_test_modules([RUN_CACHE_TEST_DIR]), [RUN_CACHE_TEST_MODULE])
+
+    def test_run_tests_across_workers(self):
+        timings, errors = run_tests([RUN_CACHE_TEST_MODULE], workers=2)
+
+        self.assertEqual(errors, [])
+        self.assertEqual(len(timings), 7)
+        self.assertTrue(all(timing.outcome == "passed" for timing in timings))
+        self.assertTrue(
+            all(timing.test_id.startswith(RUN_CACHE_TEST_MODULE) for timing in timings)
+        )
+        hooks = {
+            timing.test_id.rpartition(".")[2]: [
+                hook.function_name for hook in timing.contract_timing.hooks
+            ]
+            for timing in timings
+        }
+        self.assertEqual(
+            hooks["test_vault_not_left_in_cached_namespace"],
+            ["pre_posting_code", "_helper_account_id"],
+        )
+
+    def test_other_tests_run_in_main_process(self):
+        tests, other_tests, errors = load_contract_tests([FAKE_VAULT_TEST_MODULE])
+
+        timings, run_errors = run_tests([FAKE_VAULT_TEST_MODULE], workers=2)
+
+        self.assertEqual(errors + run_errors, [])
+        self.assertEqual({test.__class__.__name__ for test in tests}, {"CreateMockTest"})
+        self.assertEqual({test.__class__.__name__ for test in other_tests}, {"FakeVaultTest"})
+        self.assertEqual(
+            sorted(timing.test_id for timing in timings),
+            sorted(test.id() for test in tests + other_tests),
+        )
+        self.assertTrue(all(timing.outcome == "passed" for timing in timings))
+
+    def test_subtest_and_unexpected_success_outcomes_recorded(self):
+        class SubTestCase(TestCase):
+            def test_failing_subtest(self):
+                for value in (1, 2):
+                    with self.subTest(value=value):
+                        self.assertEqual(value, 1)
+
+            def test_erroring_subtest(self):
+                with self.subTest():
+                    raise KeyError("missing")
+
+            @expectedFailure
+            def test_unexpected_success(self):
+                pass
+
+        timings = _run_suite(
+            unittest.TestSuite(
+                SubTestCase(name)
+                for name in (
+                    "test_failing_subtest",
+                    "test_erroring_subtest",
+                    "test_unexpected_success",
+                )
+            )
+        )
+
+        self.assertEqual(
+            [(timing.test_id.rpartition(".")[2], timing.outcome) for timing in timings],
+            [
+                ("test_failing_subtest", "failed"),
+                ("test_erroring_subtest", "error"),
+                ("test_unexpected_success", "unexpected success"),
+            ],
+        )
+        self.assertIn("AssertionError", timings[0].details)
+
+    def test_timing_report_lists_slowest_first(self):
+        report = timing_report(
+            [TimingRecord("fast", "passed", 0.1), TimingRecord("slow", "failed", 0.5)]
+        ).splitlines()
+
+        self.assertTrue(report[1].startswith("slow"))
+        self.assertTrue(report[2].startswith("fast"))
+        self.assertEqual(report[3], "2 tests, 0.6s in tests")
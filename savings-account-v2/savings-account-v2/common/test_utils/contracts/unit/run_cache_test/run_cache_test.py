@@ -0,0 +1,68 @@
+from datetime import datetime
+
+from common.test_utils.contracts.unit import CONTRACT_SANDBOX, ContractModuleRunner, compile_contract
+from common.test_utils.contracts.unit.common import ContractTest
+
+CONTRACT_FILE = "common/test_utils/contracts/unit/run_cache_test/run_cache_test_contract.py"
+DEFAULT_DATE = datetime(2019, 1, 1)
+
+
+class RunCacheTest(ContractTest):
+    contract_file = CONTRACT_FILE
+
+    def test_contract_compiled_once_per_content_and_filename(self):
+        code = compile_contract(self.smart_contract, self.contract_file)
+
+        self.assertIs(code, compile_contract(self.smart_contract, self.contract_file))
+        self.assertIsNot(code, compile_contract(self.smart_contract, "other_file.py"))
+        self.assertEqual(code.co_filename, self.contract_file)
+
+    def test_contract_executed_once_and_vault_bound_per_call(self):
+        first_vault = self.create_mock(account_id="first")
+        second_vault = self.create_mock(account_id="second")
+
+        first = self.run_function("pre_posting_code", first_vault, [], DEFAULT_DATE)
+        second = self.run_function("pre_posting_code", second_vault, [], DEFAULT_DATE)
+
+        self.assertEqual(first, ("first", 1))
+        self.assertEqual(second, ("second", 1))
+
+    def test_vault_not_left_in_cached_namespace(self):
+        self.run_function("pre_posting_code", self.create_mock(), [], DEFAULT_DATE)
+
+        with self.assertRaises(NameError):
+            self.run_function("_helper_account_id", self.create_mock())
+
+    def test_fork_leaves_executed_namespace_untouched(self):
+        namespace = CONTRACT_SANDBOX.execute(self.smart_contract)
+
+        forked = CONTRACT_SANDBOX.fork(namespace, vault="vault")
+
+        self.assertEqual(forked["vault"], "vault")
+        self.assertNotIn("vault", namespace)
+        self.assertIs(CONTRACT_SANDBOX.execute(self.smart_contract), namespace)
+
+    def test_module_runner_binds_only_contract_functions(self):
+        runner = ContractModuleRunner(self.smart_contract)
+
+        self.assertTrue(callable(runner.pre_posting_code))
+        self.assertTrue(hasattr(runner, "_helper_account_id"))
+        self.assertFalse(hasattr(runner, "requires"))
+        self.assertFalse(hasattr(runner, "Tside"))
+
+    def test_same_code_under_another_filename_executed_separately(self):
+        code = compile_contract(self.smart_contract, self.contract_file)
+        other_code = compile_contract(self.smart_contract, "other_file.py")
+
+        self.assertIsNot(CONTRACT_SANDBOX.execute(code), CONTRACT_SANDBOX.execute(other_code))
+        self.assertIs(
+            CONTRACT_SANDBOX.execute(code),
+            CONTRACT_SANDBOX.execute(self.smart_contract, filename=self.contract_file),
+        )
+
+    def test_clear_executes_contract_again(self):
+        namespace = CONTRACT_SANDBOX.execute(self.smart_contract)
+
+        CONTRACT_SANDBOX.clear()
+
+        self.assertIsNot(CONTRACT_SANDBOX.execute(self.smart_contract), namespace)
@@ -0,0 +1,19 @@
+# A sample contract to test that the unit runner only executes
+# a contract once and binds vault per call.
+display_name = "Run Cache Product"
+api = "3.9.0"
+version = "0.1.0"
+tside = Tside.LIABILITY
+supported_denominations = ["GBP"]
+parameters = []
+
+executions = []
+executions.append(version)
+
+
+def pre_posting_code(postings, effective_date):
+    return vault.account_id, len(executions)
+
+
+def _helper_account_id():
+    return vault.account_id
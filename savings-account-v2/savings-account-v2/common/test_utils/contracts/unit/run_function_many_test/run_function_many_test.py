@@ -0,0 +1,106 @@
+from datetime import datetime
+from decimal import Decimal
+from unittest.mock import patch
+
+from common.test_utils.contracts.unit.common import ContractTest
+
+CONTRACT_FILE = (
+    "common/test_utils/contracts/unit/run_function_many_test/"
+    "run_function_many_test_contract.py"
+)
+DEFAULT_DATE = datetime(2019, 1, 1)
+
+
+class RunFunctionManyTest(ContractTest):
+    contract_file = CONTRACT_FILE
+
+    def test_side_effects_recorded_per_case(self):
+        cases = [
+            {"account_id": f"account_{fee}", "fee": Decimal(fee)} for fee in range(3)
+        ]
+
+        results = self.run_function_many(
+            "scheduled_code", self.create_mock, cases, "FEE", DEFAULT_DATE
+        )
+
+        self.assertEqual([result.case for result in results], cases)
+        self.assertEqual(
+            [result.result for result in results], [Decimal(0), Decimal(1), Decimal(2)]
+        )
+        self.assertEqual(results[0].side_effects, {})
+        self.assertEqual(
+            results[2].side_effects["instruct_posting_batch"],
+            [((), {"posting_instructions": ["FEE_account_2"], "effective_date": DEFAULT_DATE})],
+        )
+        self.assertEqual(
+            results[2].side_effects["make_internal_transfer_instructions"][0][1]["amount"],
+            Decimal(2),
+        )
+
+    def test_errors_recorded_per_case(self):
+        results = self.run_function_many(
+            "pre_posting_code",
+            self.create_mock,
+            [{"limit": Decimal(1)}, {"limit": Decimal(-1)}],
+            [],
+            DEFAULT_DATE,
+        )
+
+        self.assertIsNone(results[0].error)
+        self.assertEqual(results[1].error, "Rejected: Limit exceeded")
+
+    def test_cases_split_across_workers(self):
+        cases = [{"fee": Decimal(fee)} for fee in range(10)]
+
+        serial_results = self.run_function_many(
+            "scheduled_code", self.create_mock, cases, "FEE", DEFAULT_DATE
+        )
+        parallel_results = self.run_function_many(
+            "scheduled_code", self.create_mock, cases, "FEE", DEFAULT_DATE, workers=2
+        )
+
+        self.assertEqual(parallel_results, serial_results)
+
+    def test_unexpected_errors_raised(self):
+        cases = [{"fee": Decimal(1)}, {"fee": "not a number"}]
+
+        for workers in (None, 2):
+            with self.subTest(workers=workers):
+                with self.assertRaises(TypeError):
+                    self.run_function_many(
+                        "scheduled_code",
+                        self.create_mock,
+                        cases,
+                        "FEE",
+                        DEFAULT_DATE,
+                        workers=workers,
+                    )
+
+        results = self.run_function_many(
+            "scheduled_code",
+            self.create_mock,
+            cases,
+            "FEE",
+            DEFAULT_DATE,
+            expected_errors=(TypeError,),
+        )
+        self.assertIsNone(results[0].error)
+        self.assertTrue(results[1].error.startswith("TypeError: "))
+
+    def test_cases_run_in_process_without_fork(self):
+        cases = [{"fee": Decimal(fee)} for fee in range(4)]
+
+        with patch(
+            "common.test_utils.contracts.unit.batch.get_all_start_methods",
+            return_value=["spawn"],
+        ), patch(
+            "common.test_utils.contracts.unit.batch.ProcessPoolExecutor",
+            side_effect=AssertionError("Cases run in worker processes"),
+        ):
+            results = self.run_function_many(
+                "scheduled_code", self.create_mock, cases, "FEE", DEFAULT_DATE, workers=2
+            )
+
+        self.assertEqual(
+            [result.result for result in results], [Decimal(fee) for fee in range(4)]
+        )
@@ -0,0 +1,33 @@
+# A sample contract to test running a hook for many vault objects
+# in one run_function_many call.
+display_name = "Run Function Many Product"
+api = "3.9.0"
+version = "0.1.0"
+tside = Tside.LIABILITY
+supported_denominations = ["GBP"]
+parameters = []
+
+
+def pre_posting_code(postings, effective_date):
+    limit = vault.get_parameter_timeseries(name="limit").latest()
+    if limit < 0:
+        raise Rejected("Limit exceeded", reason_code=RejectedReason.AGAINST_TNC)
+
+
+def scheduled_code(event_type, effective_date):
+    fee = vault.get_parameter_timeseries(name="fee").latest()
+    if fee > 0:
+        posting_ins = vault.make_internal_transfer_instructions(
+            amount=fee,
+            denomination="GBP",
+            client_transaction_id=f"FEE_{vault.account_id}",
+            from_account_id=vault.account_id,
+            from_account_address="DEFAULT",
+            to_account_id="INTERNAL",
+            to_account_address="DEFAULT",
+            asset="COMMERCIAL_BANK_MONEY",
+        )
+        vault.instruct_posting_batch(
+            posting_instructions=posting_ins, effective_date=effective_date
+        )
+    return fee
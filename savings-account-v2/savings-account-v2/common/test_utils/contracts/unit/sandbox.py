@@ -0,0 +1,125 @@
+# Copyright @ 2021 Thought Machine Group Limited. All rights reserved.
+import builtins
+import hashlib
+from inspect import isfunction
+from types import CodeType, FunctionType
+from typing import Any, Callable, Dict, Hashable, Iterable, Optional, Tuple, Union
+
+# Compiled contracts keyed by (filename, content hash)
+_COMPILED_CONTRACTS: Dict[Tuple[str, str], CodeType] = {}
+# The id of each compiled contract's code object to its key in _COMPILED_CONTRACTS, which keeps
+# the code object alive so that its id is not reused
+_COMPILED_CONTRACT_KEYS: Dict[int, Tuple[str, str]] = {}
+
+
+def content_hash(code: str) -> str:
+    return hashlib.sha256(code.encode("utf-8")).hexdigest()
+
+
+def compile_contract(smart_contract_code: str, filename: str) -> CodeType:
+    """Compiles `smart_contract_code`, reusing the code object if the same contents have already
+    been compiled under `filename`.
+
+    Args:
+        smart_contract_code: The source code of the Smart Contract.
+        filename: The filename to compile the code under, which coverage reports against.
+    """
+    key = (filename, content_hash(smart_contract_code))
+    if key not in _COMPILED_CONTRACTS:
+        code = compile(smart_contract_code, filename, "exec")
+        _COMPILED_CONTRACTS[key] = code
+        _COMPILED_CONTRACT_KEYS[id(code)] = key
+    return _COMPILED_CONTRACTS[key]
+
+
+class ContractSandbox:
+    """
+    The restricted namespace that Smart Contracts, Contract Modules and Supervisor Contracts are
+    executed in:
+    - Only the whitelisted builtins are available.
+    - The given types and mock decorators are globally available.
+
+    The namespace is built once, when the sandbox is created. Each contract is executed into its
+    own fork of it the first time it is seen and the resulting namespace is reused, so running a
+    function only costs a shallow fork of the globals to bind per-call symbols such as `vault`.
+    Call clear() to have contracts executed again, e.g. once a coverage tracer is started so that
+    their module level lines are traced.
+    """
+
+    def __init__(
+        self,
+        types: Dict[str, Any],
+        whitelisted_builtins: Iterable[str],
+        decorators: Dict[str, Callable],
+    ) -> None:
+        self._base_namespace = {
+            "__builtins__": {
+                name: getattr(builtins, name) for name in whitelisted_builtins
+            },
+            **decorators,
+            **types,
+        }
+        self._executed_namespaces: Dict[Tuple[str, Hashable], dict] = {}
+
+    def fork(self, namespace: dict = None, **overlay: Any) -> dict:
+        """
+        Returns a shallow copy of `namespace`, or of the bare sandbox if none is given, with
+        `overlay` bound on top. The original namespace is left untouched.
+        """
+        return {**(self._base_namespace if namespace is None else namespace), **overlay}
+
+    def execute(self, code: Union[str, CodeType], filename: Optional[str] = None) -> dict:
+        """
+        Returns the namespace left by executing `code` in a fork of the sandbox, only executing
+        it the first time the same contents are seen for the same file. Namespaces are keyed by
+        (filename, content hash), which code objects from compile_contract are looked up by.
+        :param filename: the file source `code` was read from. Code objects use their own
+        """
+        key = self._key(code, filename)
+        if key not in self._executed_namespaces:
+            namespace = self.fork()
+            exec(code, namespace, namespace)
+            self._executed_namespaces[key] = namespace
+        return self._executed_namespaces[key]
+
+    def clear(self) -> None:
+        """
+        Forgets the executed namespaces, so each contract is executed again the next time it runs
+        """
+        self._executed_namespaces.clear()
+
+    @staticmethod
+    def _key(
+        code: Union[str, CodeType], filename: Optional[str]
+    ) -> Tuple[str, Hashable]:
+        if not isinstance(code, CodeType):
+            return filename or "<string>", content_hash(code)
+        key = _COMPILED_CONTRACT_KEYS.get(id(code))
+        if key is not None and _COMPILED_CONTRACTS[key] is code:
+            return key
+        # Code objects compare by content but not filename, so the filename is still needed
+        return code.co_filename, code
+
+    def defined_functions(self, namespace: dict) -> Dict[str, FunctionType]:
+        """
+        Returns the functions defined by the code executed into `namespace`, leaving out the
+        sandbox's own symbols.
+        """
+        return {
+            name: value
+            for name, value in namespace.items()
+            if name not in self._base_namespace and isfunction(value)
+        }
+
+    @staticmethod
+    def bind(func: FunctionType, function_globals: dict) -> FunctionType:
+        """
+        Returns a copy of `func` that resolves its globals in `function_globals`.
+        """
+        return FunctionType(
+            func.__code__,
+            function_globals,
+            func.__name__,
+            func.__defaults__,
+            func.__closure__,
+        )
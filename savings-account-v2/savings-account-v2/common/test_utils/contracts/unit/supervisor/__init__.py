@@ -1,7 +1,9 @@
 # Copyright @ 2021 Thought Machine Group Limited. All rights reserved.
-import builtins
-from types import FunctionType
+from types import CodeType
+from typing import Union
 from unittest.mock import Mock
+
+from common.test_utils.contracts.unit.sandbox import ContractSandbox
 from .types_extension import _ALL_TYPES, _WHITELISTED_BUILTINS, _SUPPORTED_HOOK_NAMES
 
 
@@ -21,8 +23,16 @@ def _mock_requires_decorator(
     return inner
 
 
+# The sandbox Supervisor Contracts run in, built once per process
+SUPERVISOR_CONTRACT_SANDBOX = ContractSandbox(
+    types=_ALL_TYPES,
+    whitelisted_builtins=_WHITELISTED_BUILTINS,
+    decorators={"requires": _mock_requires_decorator},
+)
+
+
 def run(
-    supervisor_contract_code: str,
+    supervisor_contract_code: Union[str, CodeType],
     function_name: str,
     vault_object: Mock,
     *args,
@@ -47,15 +57,7 @@ def run(
     """
     # The function we will execute will only have access to symbols defined in the sandbox and the
     # symbols defined by the Supervisor Contract itself.
-    sandbox = {
-        "__builtins__": {
-            name: getattr(builtins, name) for name in _WHITELISTED_BUILTINS
-        },
-        "requires": _mock_requires_decorator,
-        **_ALL_TYPES,
-    }
-
-    exec(supervisor_contract_code, sandbox, sandbox)
+    sandbox = SUPERVISOR_CONTRACT_SANDBOX.execute(supervisor_contract_code)
 
     func = sandbox.get(function_name)
     if func is None:
@@ -66,16 +68,9 @@ def run(
     # Make sure `vault` is only accessible to `function_name` if it is a known hook, and not any
     # function it calls or non-hook functions. That is why we don't put it directly in the sandbox
     # and do this checking here.
-    function_globals = {**sandbox}
     if function_name in _SUPPORTED_HOOK_NAMES:
-        function_globals["vault"] = vault_object
-
-    func = FunctionType(
-        func.__code__,
-        function_globals,
-        func.__name__,
-        func.__defaults__,
-        func.__closure__,
-    )
+        function_globals = SUPERVISOR_CONTRACT_SANDBOX.fork(sandbox, vault=vault_object)
+    else:
+        function_globals = SUPERVISOR_CONTRACT_SANDBOX.fork(sandbox)
 
-    return func(*args, **kwargs)
+    return SUPERVISOR_CONTRACT_SANDBOX.bind(func, function_globals)(*args, **kwargs)
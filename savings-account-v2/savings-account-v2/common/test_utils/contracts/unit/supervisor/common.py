@@ -13,7 +13,9 @@ from common.test_utils.contracts.unit.common import (
     mock_posting_instruction,
     mock_posting_instruction_batch,
 )
+from common.test_utils.contracts.unit.fake_vault import FakeVault
 from common.test_utils.contracts.unit.supervisor import run
+from common.test_utils.contracts.unit.timing import TIMING_RECORDER
 from common.test_utils.contracts.unit.supervisor.types_extension import (
     DEFAULT_ADDRESS,
     DEFAULT_ASSET,
@@ -208,8 +210,10 @@ class SupervisorContractTest(TestCase):
 
     def setUp(self):
         self._started_at = time.time()
+        TIMING_RECORDER.start_test(self.id())
 
     def tearDown(self):
+        TIMING_RECORDER.stop_test()
         self._elapsed_time = time.time() - self._started_at
         print(
             "{} ({}s)".format(
@@ -228,7 +232,7 @@ class SupervisorContractTest(TestCase):
         hook_directives: Optional[List[Any]] = None,
         tside: Tside = None,
         **kwargs,
-    ) -> Mock:
+    ) -> FakeVault:
         """
         Create mock Vault object for supervisee using base unit test create_mock.
         """
@@ -272,7 +276,8 @@ class SupervisorContractTest(TestCase):
         return mock_supervisor_vault
 
     def run_function(self, function_name: str, vault_object, *args, **kwargs):
-        return run(self.smart_contract, function_name, vault_object, *args, **kwargs)
+        with TIMING_RECORDER.time_hook(function_name):
+            return run(self.smart_contract, function_name, vault_object, *args, **kwargs)
 
     @staticmethod
     def assert_no_side_effects(mock_vault):
@@ -0,0 +1,233 @@
+# Copyright @ 2021 Thought Machine Group Limited. All rights reserved.
+"""
+Structured timings of contract unit tests and the hook invocations they make.
+
+Each test's time is split into run time, spent in run_function, and setup time, which is the
+rest, e.g. building vault mocks. Set INCEPTION_UNIT_TEST_TIMING_FILE to write the timings of a
+test process to that file as JSON when it exits. The parallel runner writes the same format with
+--timing-json.
+
+Compare timings against a baseline, failing on regressions, with
+    python -m common.test_utils.contracts.unit.timing timings.json --baseline baseline.json
+"""
+# standard libs
+import argparse
+import atexit
+import json
+import sys
+import time
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from os import getenv
+from typing import Dict, Iterator, List, Optional
+
+DEFAULT_THRESHOLD = 2.0
+DEFAULT_SLOWEST = 10
+# Tests quicker than this in the baseline are mostly noise, so they are not compared
+DEFAULT_MIN_DURATION = 0.001
+
+TIMING_FILE = getenv("INCEPTION_UNIT_TEST_TIMING_FILE")
+
+
+@dataclass
+class HookTiming:
+    function_name: str
+    duration: float
+
+
+@dataclass
+class ContractTestTiming:
+    test_id: str
+    setup: float = 0.0
+    run: float = 0.0
+    hooks: List[HookTiming] = field(default_factory=list)
+
+    @property
+    def total(self) -> float:
+        return self.setup + self.run
+
+    def to_dict(self) -> Dict:
+        return {**asdict(self), "total": self.total}
+
+    @classmethod
+    def from_dict(cls, timing: Dict) -> "ContractTestTiming":
+        return cls(
+            test_id=timing["test_id"],
+            setup=timing["setup"],
+            run=timing["run"],
+            hooks=[HookTiming(**hook) for hook in timing["hooks"]],
+        )
+
+
+class TimingRecorder:
+    """
+    Records the timing of each test between start_test and stop_test, and of each hook it runs
+    """
+
+    def __init__(self) -> None:
+        self.timings: List[ContractTestTiming] = []
+        self._current: Optional[ContractTestTiming] = None
+        self._started_at = 0.0
+
+    def start_test(self, test_id: str) -> None:
+        self._current = ContractTestTiming(test_id=test_id)
+        self._started_at = time.perf_counter()
+
+    def stop_test(self) -> Optional[ContractTestTiming]:
+        timing, self._current = self._current, None
+        if timing is None:
+            return None
+        timing.setup = max(0.0, time.perf_counter() - self._started_at - timing.run)
+        self.timings.append(timing)
+        return timing
+
+    @contextmanager
+    def time_hook(self, function_name: str) -> Iterator[None]:
+        """
+        Times a hook invocation, if it is made by a test that is being timed
+        """
+        started_at = time.perf_counter()
+        try:
+            yield
+        finally:
+            if self._current is not None:
+                duration = time.perf_counter() - started_at
+                self._current.run += duration
+                self._current.hooks.append(HookTiming(function_name, duration))
+
+    def write(self, path: str) -> None:
+        if self.timings:
+            write_timings(self.timings, path)
+
+
+TIMING_RECORDER = TimingRecorder()
+if TIMING_FILE:
+    atexit.register(TIMING_RECORDER.write, TIMING_FILE)
+
+
+def write_timings(timings: List[ContractTestTiming], path: str) -> None:
+    with open(path, "w", encoding="utf-8") as timing_file:
+        json.dump(
+            {"tests": [timing.to_dict() for timing in timings]},
+            timing_file,
+            indent=2,
+        )
+        timing_file.write("\n")
+
+
+def load_timings(path: str) -> List[ContractTestTiming]:
+    with open(path, "r", encoding="utf-8") as timing_file:
+        return [ContractTestTiming.from_dict(timing) for timing in json.load(timing_file)["tests"]]
+
+
+def slowest_summary(timings: List[ContractTestTiming], count: int = DEFAULT_SLOWEST) -> str:
+    """
+    Formats the `count` slowest tests, with their setup, run and slowest hook times
+    """
+    slowest = sorted(timings, key=lambda timing: timing.total, reverse=True)[:count]
+    if not slowest:
+        return "No test timings"
+    width = max(len(timing.test_id) for timing in slowest)
+    lines = [
+        f"{'test':<{width}}  {'total s':>8}  {'setup s':>8}  {'run s':>8}  {'hooks':>5}  "
+        "slowest hook"
+    ]
+    for timing in slowest:
+        slowest_hook = max(timing.hooks, key=lambda hook: hook.duration, default=None)
+        slowest_hook_description = (
+            f"{slowest_hook.function_name} ({slowest_hook.duration:.3f}s)"
+            if slowest_hook
+            else ""
+        )
+        lines.append(
+            f"{timing.test_id:<{width}}  {timing.total:>8.3f}  {timing.setup:>8.3f}  "
+            f"{timing.run:>8.3f}  {len(timing.hooks):>5}  {slowest_hook_description}"
+        )
+    return "\n".join(lines)
+
+
+def compare_to_baseline(
+    timings: List[ContractTestTiming],
+    baseline: List[ContractTestTiming],
+    threshold: float = DEFAULT_THRESHOLD,
+    min_duration: float = DEFAULT_MIN_DURATION,
+) -> List[str]:
+    """
+    Returns a description of every test whose total time exceeds the baseline by more than
+    `threshold` times. Tests missing from the baseline, or quicker than `min_duration` in it,
+    are ignored.
+    """
+    baseline_totals = {timing.test_id: timing.total for timing in baseline}
+    regressions = []
+    for timing in timings:
+        baseline_total = baseline_totals.get(timing.test_id)
+        if baseline_total is None or baseline_total < min_duration:
+            continue
+        if timing.total > baseline_total * threshold:
+            regressions.append(
+                f"{timing.test_id}: {timing.total:.3f}s is "
+                f"{timing.total / baseline_total:.2f}x the baseline {baseline_total:.3f}s"
+            )
+    return regressions
+
+
+def process_args(args: list) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Summarises contract unit test timings and compares them against a "
+        "stored baseline."
+    )
+    parser.add_argument("timings", help="Timings file written by a test run")
+    parser.add_argument("--baseline", default=None, help="Baseline timings file")
+    parser.add_argument(
+        "--update-baseline",
+        action="store_true",
+        help="Store the timings as the new baseline instead of comparing against it",
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=DEFAULT_THRESHOLD,
+        help="Ratio to the baseline above which a test is reported as a regression "
+        f"[Default: {DEFAULT_THRESHOLD}]",
+    )
+    parser.add_argument(
+        "--min-duration",
+        type=float,
+        default=DEFAULT_MIN_DURATION,
+        help="Tests quicker than this many seconds in the baseline are not compared "
+        f"[Default: {DEFAULT_MIN_DURATION}]",
+    )
+    parser.add_argument(
+        "--slowest",
+        type=int,
+        default=DEFAULT_SLOWEST,
+        help=f"Number of slowest tests to list [Default: {DEFAULT_SLOWEST}]",
+    )
+    return parser.parse_args(args)
+
+
+def main(args: list) -> int:
+    known_args = process_args(args)
+    timings = load_timings(known_args.timings)
+    print(slowest_summary(timings, known_args.slowest))
+
+    if not known_args.baseline:
+        return 0
+    if known_args.update_baseline:
+        write_timings(timings, known_args.baseline)
+        print(f"Baseline written to {known_args.baseline}")
+        return 0
+
+    regressions = compare_to_baseline(
+        timings,
+        load_timings(known_args.baseline),
+        known_args.threshold,
+        known_args.min_duration,
+    )
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
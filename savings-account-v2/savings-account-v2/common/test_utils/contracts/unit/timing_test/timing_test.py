@@ -0,0 +1,75 @@
+import os
+import time
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+
+from common.test_utils.contracts.unit.timing import (
+    ContractTestTiming,
+    HookTiming,
+    TimingRecorder,
+    compare_to_baseline,
+    load_timings,
+    slowest_summary,
+    write_timings,
+)
+
+
+class TimingTest(TestCase):
+    def test_recorder_splits_setup_and_hook_run_time(self):
+        recorder = TimingRecorder()
+
+        with recorder.time_hook("untimed_hook"):
+            pass
+        recorder.start_test("test_a")
+        time.sleep(0.01)
+        with recorder.time_hook("scheduled_code"):
+            time.sleep(0.01)
+        timing = recorder.stop_test()
+
+        self.assertEqual(recorder.timings, [timing])
+        self.assertEqual([hook.function_name for hook in timing.hooks], ["scheduled_code"])
+        self.assertEqual(timing.run, timing.hooks[0].duration)
+        self.assertGreaterEqual(timing.run, 0.01)
+        self.assertGreaterEqual(timing.setup, 0.01)
+        self.assertIsNone(recorder.stop_test())
+
+    def test_timings_round_trip_through_json(self):
+        timings = [ContractTestTiming("test_a", 0.1, 0.2, [HookTiming("pre_posting_code", 0.2)])]
+
+        with TemporaryDirectory() as timing_dir:
+            path = os.path.join(timing_dir, "timings.json")
+            write_timings(timings, path)
+            self.assertEqual(load_timings(path), timings)
+
+    def test_slowest_summary_lists_slowest_tests_first(self):
+        summary = slowest_summary(
+            [
+                ContractTestTiming("fast", 0.1, 0.0),
+                ContractTestTiming("slow", 0.1, 0.4, [HookTiming("scheduled_code", 0.4)]),
+                ContractTestTiming("medium", 0.2, 0.0),
+            ],
+            count=2,
+        ).splitlines()
+
+        self.assertEqual(len(summary), 3)
+        self.assertTrue(summary[1].startswith("slow"))
+        self.assertTrue(summary[1].endswith("scheduled_code (0.400s)"))
+        self.assertTrue(summary[2].startswith("medium"))
+
+    def test_compare_to_baseline_reports_regressions_past_threshold(self):
+        baseline = [
+            ContractTestTiming("regressed", 0.1, 0.1),
+            ContractTestTiming("within_threshold", 0.1, 0.1),
+            ContractTestTiming("too_quick", 0.0001, 0.0),
+        ]
+        timings = [
+            ContractTestTiming("regressed", 0.1, 0.4),
+            ContractTestTiming("within_threshold", 0.1, 0.2),
+            ContractTestTiming("too_quick", 0.1, 0.0),
+            ContractTestTiming("new", 1.0, 1.0),
+        ]
+
+        regressions = compare_to_baseline(timings, baseline, threshold=2.0)
+
+        self.assertEqual(len(regressions), 1)
+        self.assertTrue(regressions[0].startswith("regressed: 0.500s is 2.50x"))
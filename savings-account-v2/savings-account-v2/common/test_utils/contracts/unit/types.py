@@ -106,6 +106,8 @@ class AccountIdShape:
 
 
 class Balance:
+    __slots__ = ("credit", "debit", "net")
+
     def __init__(self, credit=None, debit=None, net=None):
         self.credit = credit
         self.debit = debit
@@ -1,5 +1,4 @@
 from collections import defaultdict
-from copy import deepcopy
 from common.test_utils.contracts.unit.types import *
 from decimal import Decimal
 from unittest.mock import Mock
@@ -7,6 +6,8 @@ from .types import _ALL_TYPES, _WHITELISTED_BUILTINS, _SUPPORTED_HOOK_NAMES
 
 
 class Balance(Balance):
+    __slots__ = ()
+
     def __init__(self, credit=Decimal(0), debit=Decimal(0), net=Decimal(0)):
         super().__init__(credit, debit, net)
 
@@ -18,6 +19,18 @@ class Balance(Balance):
         if net:
             self.net += net
 
+    def add(self, credit=Decimal(0), debit=Decimal(0), net=Decimal(0)):
+        """
+        Adds the amounts to this balance in place and returns it
+        """
+        self.credit += credit
+        self.debit += debit
+        self.net += net
+        return self
+
+    def copy(self):
+        return self.__class__(credit=self.credit, debit=self.debit, net=self.net)
+
     def __add__(self, other):
         return self.__class__(
             credit=self.credit + other.credit,
@@ -29,10 +42,17 @@ class Balance(Balance):
         return self.__add__(other)
 
     def __iadd__(self, other):
-        self.credit += other.credit
-        self.debit += other.debit
-        self.net += other.net
-        return self
+        return self.add(credit=other.credit, debit=other.debit, net=other.net)
+
+    def __sub__(self, other):
+        return self.__class__(
+            credit=self.credit - other.credit,
+            debit=self.debit - other.debit,
+            net=self.net - other.net,
+        )
+
+    def __isub__(self, other):
+        return self.add(credit=-other.credit, debit=-other.debit, net=-other.net)
 
     def __repr__(self):
         return f"{self.net}"
@@ -48,25 +68,42 @@ class BalanceDefaultDict(defaultdict):
         super(BalanceDefaultDict, self).__init__(*args, **kwargs)
 
     def __add__(self, other):
-        aggregated_balance_dict = deepcopy(self)
-        for balance_key, balance in other.items():
-            if balance_key in aggregated_balance_dict:
-                aggregated_balance_dict[balance_key] = (
-                    aggregated_balance_dict[balance_key] + balance
-                )
-            else:
-                aggregated_balance_dict[balance_key] = balance
-
-        return aggregated_balance_dict
+        aggregated_balance_dict = self.__class__(
+            self.default_factory,
+            {balance_key: self._new_balance(balance) for balance_key, balance in self.items()},
+        )
+        return aggregated_balance_dict.accumulate(other)
 
     def __radd__(self, other):
         return self.__add__(other)
 
     def __iadd__(self, other):
+        return self.accumulate(other)
+
+    def accumulate(self, other):
+        """
+        Adds `other`'s balances to this dict's balances in place, without creating new Balance
+        objects for dimensions already present. Dimensions only in `other` get a copy of its
+        balance, so `other` is never changed through this dict. Balances this dict shares with
+        another dict are changed in both, so only use on dicts that own their balances.
+        """
         for balance_key, balance in other.items():
-            self[balance_key] = self.get(balance_key, Balance()) + balance
+            existing_balance = self.get(balance_key)
+            if existing_balance is None:
+                self[balance_key] = self._new_balance(balance)
+            else:
+                existing_balance.credit += balance.credit
+                existing_balance.debit += balance.debit
+                existing_balance.net += balance.net
         return self
 
+    def _new_balance(self, balance):
+        """
+        A new Balance with `balance`'s amounts. Dicts may hold the base Balance type, which has no
+        copy() or arithmetic, so the new Balance is built from the amounts.
+        """
+        return self._balance(credit=balance.credit, debit=balance.debit, net=balance.net)
+
 
 class BalanceTimeseries(BalanceTimeseries):
     def __init__(self, iterable=None):
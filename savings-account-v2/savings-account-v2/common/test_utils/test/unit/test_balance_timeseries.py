@@ -0,0 +1,113 @@
+# standard libs
+from datetime import datetime, timedelta
+from decimal import Decimal
+from unittest import TestCase
+
+# common
+from common.test_utils.common.balance_helpers import Balance, BalanceDimensions
+from common.test_utils.common.balance_timeseries import BalanceTimeseries
+
+DEFAULT = BalanceDimensions()
+ACCRUED = BalanceDimensions(address="ACCRUED_INCOMING_INTEREST")
+DAY_1 = datetime(2021, 1, 1)
+DAY_2 = datetime(2021, 1, 2)
+DAY_4 = datetime(2021, 1, 4)
+
+
+class BalanceTimeseriesTest(TestCase):
+    def setUp(self):
+        self.balance_timeseries = BalanceTimeseries.from_timeseries(
+            [
+                (DAY_1, {DEFAULT: Balance(net=Decimal("100"), credit=Decimal("100"))}),
+                (
+                    DAY_2,
+                    {
+                        DEFAULT: Balance(net=Decimal("100"), credit=Decimal("100")),
+                        ACCRUED: Balance(net=Decimal("1")),
+                    },
+                ),
+                (DAY_4, {DEFAULT: Balance(net=Decimal("40"), credit=Decimal("40"))}),
+            ]
+        )
+
+    def test_only_balance_changes_are_stored(self):
+        self.assertEqual(
+            self.balance_timeseries.values(DEFAULT), [Decimal("100"), Decimal("40")]
+        )
+        self.assertEqual(
+            self.balance_timeseries.values(ACCRUED), [Decimal("1"), Decimal("0")]
+        )
+
+    def test_point_lookups(self):
+        self.assertEqual(
+            self.balance_timeseries.balance_at(DEFAULT, DAY_2 + timedelta(hours=1)),
+            Balance(net=Decimal("100"), credit=Decimal("100")),
+        )
+        self.assertEqual(
+            self.balance_timeseries.balance_at(DEFAULT, DAY_1, inclusive=False), Balance()
+        )
+        self.assertEqual(self.balance_timeseries.at(DAY_2)[ACCRUED].net, Decimal("1"))
+        self.assertEqual(self.balance_timeseries.before(DAY_2)[ACCRUED].net, Decimal("0"))
+        self.assertEqual(self.balance_timeseries.latest()[DEFAULT].net, Decimal("40"))
+        self.assertEqual(
+            [timestamp for timestamp, _ in self.balance_timeseries.all()],
+            [DAY_1, DAY_2, DAY_4],
+        )
+
+    def test_window_aggregations_sample_daily(self):
+        start = DAY_1 - timedelta(days=1)
+        end = DAY_4 + timedelta(days=1)
+
+        self.assertEqual(
+            self.balance_timeseries.sample(DEFAULT, start, end),
+            [Decimal("0"), Decimal("100"), Decimal("100"), Decimal("100"), Decimal("40")],
+        )
+        self.assertEqual(self.balance_timeseries.mean(DEFAULT, start, end), Decimal("68"))
+        self.assertEqual(self.balance_timeseries.min(DEFAULT, DAY_1, end), Decimal("40"))
+        self.assertEqual(
+            self.balance_timeseries.max(DEFAULT, DAY_1, end, field="credit"),
+            Decimal("100"),
+        )
+
+    def test_invalid_windows_and_updates_raise(self):
+        with self.assertRaises(ValueError):
+            self.balance_timeseries.mean(DEFAULT, DAY_4, DAY_1)
+        with self.assertRaises(ValueError):
+            self.balance_timeseries.sample(DEFAULT, DAY_1, DAY_4, field="amount")
+        with self.assertRaises(ValueError):
+            self.balance_timeseries.update(DAY_1, {DEFAULT: Balance(net=Decimal("1"))})
+
+    def test_window_aggregations_match_sampling_every_interval(self):
+        # Updates between samples, several between two samples and one on a sample time
+        balance_timeseries = BalanceTimeseries.from_deltas(
+            (DAY_1 + timedelta(hours=hours), DEFAULT, Balance(net=Decimal(net)))
+            for hours, net in ((5, "10"), (30, "-20"), (31, "50"), (48, "-5"), (100, "7"))
+        )
+        windows = [
+            (DAY_1, DAY_4, timedelta(days=1)),
+            (DAY_1 + timedelta(hours=6), DAY_4 + timedelta(hours=3), timedelta(hours=7)),
+            (DAY_2, DAY_2 + timedelta(hours=1), timedelta(days=1)),
+            (DAY_1 - timedelta(days=2), DAY_2, timedelta(hours=12)),
+        ]
+
+        for start, end, interval in windows:
+            with self.subTest(start=start, end=end, interval=interval):
+                expected = []
+                sample_time = start
+                while sample_time < end:
+                    expected.append(balance_timeseries.balance_at(DEFAULT, sample_time).net)
+                    sample_time += interval
+
+                self.assertEqual(
+                    balance_timeseries.sample(DEFAULT, start, end, interval), expected
+                )
+                self.assertEqual(
+                    balance_timeseries.mean(DEFAULT, start, end, interval),
+                    sum(expected) / len(expected),
+                )
+                self.assertEqual(
+                    balance_timeseries.min(DEFAULT, start, end, interval), min(expected)
+                )
+                self.assertEqual(
+                    balance_timeseries.max(DEFAULT, start, end, interval), max(expected)
+                )
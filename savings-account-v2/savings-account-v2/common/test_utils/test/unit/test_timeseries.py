@@ -0,0 +1,116 @@
+# standard libs
+from datetime import datetime
+from unittest import TestCase
+
+# common
+from common.test_utils.common.timeseries import TimeSeries
+
+DAY_1 = datetime(2021, 1, 1)
+DAY_2 = datetime(2021, 1, 2)
+DAY_3 = datetime(2021, 1, 3)
+
+
+def reverse_scan(entries, timestamp, inclusive=True, return_on_empty="x"):
+    """
+    The lookup TimeSeries made before it was indexed
+    """
+    for entry_timestamp, value in reversed(entries):
+        if entry_timestamp < timestamp or (inclusive and entry_timestamp == timestamp):
+            return value
+    return return_on_empty
+
+
+class TimeSeriesTest(TestCase):
+    def test_at_returns_latest_entry_at_or_before_timestamp(self):
+        timeseries = TimeSeries([(DAY_1, "a"), (DAY_3, "c")])
+
+        self.assertEqual(timeseries.at(DAY_1), "a")
+        self.assertEqual(timeseries.at(DAY_2), "a")
+        self.assertEqual(timeseries.at(DAY_3), "c")
+        self.assertEqual(timeseries.before(DAY_3), "a")
+        self.assertEqual(timeseries.latest(), "c")
+
+    def test_at_with_equal_timestamps_returns_last_entry(self):
+        timeseries = TimeSeries([(DAY_1, "a"), (DAY_2, "b"), (DAY_2, "b2")])
+
+        self.assertEqual(timeseries.at(DAY_2), "b2")
+        self.assertEqual(timeseries.before(DAY_2), "a")
+
+    def test_at_before_first_entry(self):
+        self.assertEqual(TimeSeries([(DAY_2, "b")], return_on_empty="x").at(DAY_1), "x")
+        with self.assertRaises(ValueError):
+            TimeSeries([(DAY_2, "b")]).at(DAY_1)
+        with self.assertRaises(ValueError):
+            TimeSeries([]).latest()
+
+    def test_unordered_entries_looked_up_like_reverse_scan(self):
+        entries = [(DAY_1, "a"), (DAY_3, "c"), (DAY_2, "b"), (DAY_1, "a2")]
+        timeseries = TimeSeries(entries, return_on_empty="x")
+
+        for timestamp in (DAY_1, DAY_2, DAY_3):
+            for inclusive in (True, False):
+                with self.subTest(timestamp=timestamp, inclusive=inclusive):
+                    self.assertEqual(
+                        timeseries.at(timestamp, inclusive=inclusive),
+                        reverse_scan(entries, timestamp, inclusive),
+                    )
+        self.assertEqual(timeseries.latest(), "a2")
+        self.assertEqual(timeseries.all(), entries)
+        self.assertEqual(list(timeseries), entries)
+
+    def test_index_rebuilt_after_every_mutation(self):
+        mutations = {
+            "append": lambda timeseries: timeseries.append((DAY_2, "b")),
+            "extend": lambda timeseries: timeseries.extend([(DAY_2, "b")]),
+            "insert": lambda timeseries: timeseries.insert(1, (DAY_2, "b")),
+            "pop": lambda timeseries: timeseries.pop(),
+            "remove": lambda timeseries: timeseries.remove((DAY_3, "c")),
+            "clear": lambda timeseries: timeseries.clear(),
+            "sort": lambda timeseries: timeseries.sort(reverse=True),
+            "reverse": lambda timeseries: timeseries.reverse(),
+            "setitem": lambda timeseries: timeseries.__setitem__(1, (DAY_2, "b")),
+            "setslice": lambda timeseries: timeseries.__setitem__(slice(1, 2), [(DAY_2, "b")]),
+            "delitem": lambda timeseries: timeseries.__delitem__(0),
+            "iadd": lambda timeseries: timeseries.__iadd__([(DAY_2, "b")]),
+            "imul": lambda timeseries: timeseries.__imul__(2),
+        }
+
+        for description, mutate in mutations.items():
+            with self.subTest(description):
+                timeseries = TimeSeries([(DAY_1, "a"), (DAY_3, "c")], return_on_empty="x")
+                timeseries.at(DAY_3)
+
+                mutate(timeseries)
+
+                entries = list(timeseries)
+                for timestamp in (DAY_1, DAY_2, DAY_3):
+                    self.assertEqual(
+                        timeseries.at(timestamp), reverse_scan(entries, timestamp)
+                    )
+
+    def test_range_is_start_inclusive_and_end_exclusive(self):
+        timeseries = TimeSeries(
+            [(DAY_1, "a"), (DAY_2, "b"), (DAY_3, "c")], return_on_empty="x"
+        )
+
+        window = timeseries.range(DAY_2, DAY_3)
+
+        self.assertEqual(window, [(DAY_2, "b")])
+        self.assertEqual(window.at(DAY_1), "x")
+        self.assertEqual(timeseries.range(DAY_3, DAY_1), [])
+
+    def test_range_of_unordered_entries_keeps_list_order(self):
+        entries = [(DAY_3, "c"), (DAY_1, "a"), (DAY_2, "b"), (DAY_2, "b2"), (DAY_1, "a2")]
+        timeseries = TimeSeries(entries)
+
+        for start, end in ((DAY_1, DAY_3), (DAY_2, DAY_3), (DAY_1, datetime(2021, 1, 4))):
+            with self.subTest(start=start, end=end):
+                self.assertEqual(
+                    timeseries.range(start, end),
+                    [entry for entry in entries if start <= entry[0] < end],
+                )
+
+        timeseries.append((DAY_2, "b3"))
+        self.assertEqual(
+            timeseries.range(DAY_2, DAY_3), [(DAY_2, "b"), (DAY_2, "b2"), (DAY_2, "b3")]
+        )
@@ -0,0 +1,70 @@
+# standard libs
+import json
+from typing import Dict, List
+
+# common
+from common.test_utils.contracts.unit import CONTRACT_SANDBOX
+
+CASA_CONTRACT_FILE = "casa/contracts/casa.py"
+
+
+def internal_account_shard_ids(internal_account_id: str, num_shards: int) -> List[str]:
+    """
+    Builds the IDs of the internal account shards for an internal account
+    :param internal_account_id: the internal account the shards replace
+    :param num_shards: how many shards to create
+    :return: the shard IDs, e.g. ["Internal account_SHARD_0", "Internal account_SHARD_1"]
+    """
+    return [f"{internal_account_id}_SHARD_{shard}" for shard in range(num_shards)]
+
+
+def internal_account_shards_param(shard_ids: List[str]) -> str:
+    """
+    Formats shard IDs as the value of the CASA internal_account_shards template parameter
+    :param shard_ids: the internal account shard IDs
+    :return: JSON list of the shard IDs
+    """
+    return json.dumps(shard_ids)
+
+
+def e2e_internal_account_shards_param(
+    shard_ids: List[str], internal_account_id_to_uploaded_id: Dict[str, str]
+) -> str:
+    """
+    Formats shard IDs as the internal_account_shards parameter of an end-to-end product,
+    where internal accounts are created under unique e2e IDs
+    :param shard_ids: the internal account shard IDs
+    :param internal_account_id_to_uploaded_id: mapping of original internal account id to the
+    uploaded id, i.e. endtoend.testhandle.internal_account_id_to_uploaded_id
+    :return: JSON list of the uploaded shard IDs
+    """
+    return internal_account_shards_param(
+        [internal_account_id_to_uploaded_id[shard_id] for shard_id in shard_ids]
+    )
+
+
+def required_internal_account_shards(
+    shard_ids: List[str], tside: str = "TSIDE_ASSET"
+) -> Dict[str, List[str]]:
+    """
+    Lists the shards in the format of endtoend.testhandle.TSIDE_TO_INTERNAL_ACCOUNT_ID, so
+    that standard_setup creates them
+    :param shard_ids: the internal account shard IDs
+    :param tside: internal product the shards are created from
+    :return: dict of internal product to internal account IDs
+    """
+    return {tside: list(shard_ids)}
+
+
+def internal_account_shard_for_account(account_id: str, shard_ids: List[str]) -> str:
+    """
+    The shard a CASA account posts against, picked with the contract's own _account_hash so
+    tests can find the shard holding an account's postings. Paths are relative to the
+    repository root, which must be the working directory.
+    :param account_id: the customer account ID
+    :param shard_ids: the internal account shard IDs, in the order given to the parameter
+    :return: the shard ID
+    """
+    with open(CASA_CONTRACT_FILE, "r", encoding="utf-8") as contract_file:
+        contract = CONTRACT_SANDBOX.execute(contract_file.read(), filename=CASA_CONTRACT_FILE)
+    return shard_ids[contract["_account_hash"](account_id) % len(shard_ids)]